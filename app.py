@@ -1,18 +1,42 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash, send_file
 import json
 import os
-import requests
 import secrets
 import hashlib
 import base64
-from urllib.parse import urlencode, parse_qs
+from urllib.parse import urlencode, parse_qs, urlsplit
 import threading
+import asyncio
 import time
 from datetime import datetime, timedelta
-from fuzzywuzzy import fuzz, process
-import re
 from flask_socketio import SocketIO, emit
-import uuid
+from concurrent.futures import ThreadPoolExecutor
+from match_cache import MatchCache, MATCH_CACHE_FILE, series_key
+from rate_limit import limiter_from_config, DEFAULT_REQUESTS_PER_SECOND, DEFAULT_BURST
+from http_client import default_client as transport
+from mal_list import iter_anime_list, ListStatusLookup, MAL_API_BASE_URL, MAL_AUTH_BASE_URL
+from catalog_index import CatalogIndex, CATALOG_FILE
+from title_matching import TitleScorer, WEB_WEIGHTS
+from title_normalizer import clean_title
+from single_flight import SingleFlight, search_key
+from sync_state import SyncState, SYNC_STATE_FILE
+from checkpoints import CheckpointStore, CHECKPOINT_FILE, RETRYABLE_OUTCOMES
+from retry_queue import (RetryQueue, RetryWorker, RETRY_QUEUE_FILE, DEFAULT_MAX_ATTEMPTS,
+                         DEFAULT_RETRY_BASE_SECONDS, DEFAULT_RETRY_POLL_SECONDS, failure_reason)
+from response_cache import ResponseCache, RESPONSE_CACHE_FILE, DEFAULT_MAX_MB
+from sonarr_feed import stream_series, StreamStats
+from job_scheduler import JobScheduler, DEFAULT_MAX_CONCURRENT_JOBS
+from sync_plan import (PlanStore, PLAN_FILE, PLAN_VERSION, library_fingerprint, list_fingerprint,
+                       unapplied_list_fingerprint)
+from sonarr_webhook import WebhookQueue, DEFAULT_DEBOUNCE_SECONDS, DEFAULT_MAX_DELAY_SECONDS
+from token_manager import TokenManager
+from metrics import default_metrics as metrics
+from profiling import Profiler, PROFILE_DIR, trace_span, trace_title, in_session
+from auto_sync import AutoSync, AUTO_SYNC_FILE, DEFAULT_SYNC_INTERVAL_HOURS, DEFAULT_JITTER_MINUTES
+from progress_events import ProgressBatcher, DEFAULT_PROGRESS_INTERVAL_MS
+from session_store import SessionStore, SESSION_FILE, DEFAULT_MAX_SESSIONS, DEFAULT_SESSION_TTL_HOURS
+from async_engine import (AsyncHttpClient, AsyncSyncEngine, SeriesMatcher, LoopThread, ENGINES,
+                          DEFAULT_CONCURRENCY, aiohttp)
 
 app = Flask(__name__)
 app.secret_key = secrets.token_hex(16)
@@ -22,13 +46,48 @@ socketio = SocketIO(app, cors_allowed_origins="*")
 CONFIG_FILE = 'config.json'
 TOKEN_FILE = 'mal_token.json'
 
-# Store active sync sessions
-active_syncs = {}
+# Jobs on the async engine all share one event loop thread
+async_jobs = LoopThread()
 
 class MALSonarrSync:
     def __init__(self):
         self.config = self.load_config()
         self.tokens = self.load_tokens()
+        self.match_cache = MatchCache(
+            self.config.get('sync', {}).get('match_cache_file', MATCH_CACHE_FILE)
+        )
+        self.limiter = limiter_from_config(self.config.get('sync', {}))
+        transport.configure(self.config.get('http'))
+        transport.set_limiter(urlsplit(self.mal_api_url).netloc, self.limiter)
+        # One in-memory token for every worker, refreshed ahead of expiry
+        self.token_manager = TokenManager(self.tokens, self.request_token_refresh,
+                                          on_refresh=self.save_tokens)
+        transport.set_auth(urlsplit(self.mal_api_url).netloc, self.token_manager)
+        self.token_manager.start()
+        self.scorer = TitleScorer(clean_title, WEB_WEIGHTS)
+        self.sync_state = SyncState(self.config.get('sync', {}).get('state_file', SYNC_STATE_FILE))
+        self.last_feed_stats = {}
+        self.checkpoints = CheckpointStore(
+            self.config.get('sync', {}).get('checkpoint_file', CHECKPOINT_FILE)
+        )
+        self.catalog = CatalogIndex.open_if_exists(
+            self.config.get('sync', {}).get('catalog_file', CATALOG_FILE)
+        )
+        self.plans = PlanStore(self.config.get('sync', {}).get('plan_file', PLAN_FILE))
+        self.retry_queue = RetryQueue(
+            self.config.get('sync', {}).get('retry_queue_file', RETRY_QUEUE_FILE),
+            self.config.get('sync', {}).get('retry_max_attempts', DEFAULT_MAX_ATTEMPTS),
+            self.config.get('sync', {}).get('retry_base_seconds', DEFAULT_RETRY_BASE_SECONDS)
+        )
+        # MAL search and detail responses, shared by every job and both engines
+        self.response_cache = ResponseCache(
+            self.config.get('sync', {}).get('response_cache_file', RESPONSE_CACHE_FILE),
+            self.config.get('sync', {}).get('response_cache_max_mb', DEFAULT_MAX_MB),
+            self.config.get('sync', {}).get('response_cache_ttls'),
+            self.config.get('sync', {}).get('response_cache_mode', 'use')
+        )
+        transport.set_cache(urlsplit(self.mal_api_url).netloc, self.response_cache)
+        self._async_client = None
         
     def load_config(self):
         """Load configuration from config.json"""
@@ -37,11 +96,32 @@ class MALSonarrSync:
                 return json.load(f)
         return {}
     
+    @property
+    def mal_api_url(self):
+        """Base URL of the MAL v2 API"""
+        return self.config.get('mal', {}).get('api_base_url', MAL_API_BASE_URL).rstrip('/')
+    
+    @property
+    def mal_auth_url(self):
+        """Base URL of the MAL OAuth2 endpoints"""
+        return self.config.get('mal', {}).get('auth_base_url', MAL_AUTH_BASE_URL).rstrip('/')
+    
     def save_config(self, config):
         """Save configuration to config.json"""
         with open(CONFIG_FILE, 'w') as f:
             json.dump(config, f, indent=4)
         self.config = config
+        # A new limiter picks up the rate settings; adaptation restarts from the configured rate
+        self.limiter = limiter_from_config(config.get('sync', {}))
+        transport.set_limiter(urlsplit(self.mal_api_url).netloc, self.limiter)
+        if self._async_client is not None:
+            self._async_client.set_limiter(urlsplit(self.mal_api_url).netloc, self.limiter)
+        transport.configure(config.get('http'))
+        self.retry_queue.configure(config.get('sync', {}).get('retry_max_attempts'),
+                                   config.get('sync', {}).get('retry_base_seconds'))
+        self.response_cache.configure(config.get('sync', {}).get('response_cache_max_mb'),
+                                      config.get('sync', {}).get('response_cache_ttls'),
+                                      config.get('sync', {}).get('response_cache_mode'))
     
     def load_tokens(self):
         """Load OAuth tokens from mal_token.json"""
@@ -80,7 +160,7 @@ class MALSonarrSync:
             'redirect_uri': self.config['mal']['redirect_uri']
         }
         
-        return f"https://myanimelist.net/v1/oauth2/authorize?{urlencode(params)}"
+        return f"{self.mal_auth_url}/authorize?{urlencode(params)}"
     
     def exchange_code_for_token(self, code):
         """Exchange authorization code for access token"""
@@ -93,93 +173,62 @@ class MALSonarrSync:
             'redirect_uri': self.config['mal']['redirect_uri']
         }
         
-        response = requests.post('https://myanimelist.net/v1/oauth2/token', data=token_data)
+        response = transport.post(f'{self.mal_auth_url}/token', data=token_data)
         
         if response.status_code == 200:
             tokens = response.json()
             tokens['expires_at'] = time.time() + tokens['expires_in']
             self.save_tokens(tokens)
+            self.token_manager.set_tokens(tokens)
             return True
         return False
     
-    def refresh_token(self):
-        """Refresh the access token"""
-        if not self.tokens.get('refresh_token'):
-            return False
-            
+    def request_token_refresh(self, refresh_token):
+        """Exchange a refresh token for new tokens; used by the token manager"""
         token_data = {
             'client_id': self.config['mal']['client_id'],
             'client_secret': self.config['mal']['client_secret'],
             'grant_type': 'refresh_token',
-            'refresh_token': self.tokens['refresh_token']
+            'refresh_token': refresh_token
         }
         
-        response = requests.post('https://myanimelist.net/v1/oauth2/token', data=token_data)
-        
-        if response.status_code == 200:
-            tokens = response.json()
-            tokens['expires_at'] = time.time() + tokens['expires_in']
-            self.save_tokens(tokens)
-            return True
-        return False
+        response = transport.post(f'{self.mal_auth_url}/token', data=token_data)
+        response.raise_for_status()
+        return response.json()
+    
+    def refresh_token(self):
+        """Refresh the access token (joining a refresh already in flight)"""
+        return self.token_manager.refresh() is not None
     
     def get_valid_token(self):
-        """Get a valid access token, refreshing if necessary"""
-        if not self.tokens.get('access_token'):
-            return None
-        
-        expires_at = self.tokens.get('expires_at', 0)
-        # Handle ISO string or float
-        if isinstance(expires_at, str):
-            try:
-                expires_at_dt = datetime.fromisoformat(expires_at)
-                expires_at_ts = expires_at_dt.timestamp()
-            except Exception:
-                # fallback: treat as 0 if parsing fails
-                expires_at_ts = 0
-        else:
-            expires_at_ts = float(expires_at)
-        
-        if time.time() >= expires_at_ts:
-            if not self.refresh_token():
-                return None
-        return self.tokens['access_token']
+        """Get a valid access token, refreshing if it is about to expire"""
+        return self.token_manager.access_token()
     
     def get_sonarr_anime(self):
-        """Fetch anime series from Sonarr"""
+        """Fetch anime series from Sonarr, filtering the series feed as it streams in"""
         if not self.config.get('sonarr', {}).get('api_url'):
             print("Sonarr API URL not configured")
             return []
-            
-        headers = {'X-Api-Key': self.config['sonarr']['api_key']}
         
         try:
             print(f"Fetching series from Sonarr: {self.config['sonarr']['api_url']}")
-            response = requests.get(self.config['sonarr']['api_url'], headers=headers)
+            stats = StreamStats()
             
-            if response.status_code == 200:
-                series = response.json()
-                print(f"Found {len(series)} total series in Sonarr")
-                
-                # Filter for anime series
-                anime_series = []
-                for show in series:
-                    if self.is_anime_series(show):
-                        anime_series.append({
-                            'title': show.get('title', ''),
-                            'year': show.get('year'),
-                            'status': show.get('status', ''),
-                            'overview': show.get('overview', ''),
-                            'sonarr_id': show.get('id'),
-                            'path': show.get('path', ''),
-                            'tags': show.get('tags', [])
-                        })
-                
-                print(f"Identified {len(anime_series)} anime series")
-                return anime_series
-            else:
-                print(f"Sonarr API returned status code: {response.status_code}")
-                print(f"Response content: {response.text}")
+            # Filter for anime series
+            anime_series = []
+            with metrics.phase('fetch'), trace_span('fetch_sonarr'):
+                for show in stream_series(self.config['sonarr']['api_url'],
+                                          self.config['sonarr']['api_key'],
+                                          client=transport, stats=stats):
+                    record = self.anime_record(show)
+                    if record:
+                        stats.series_kept += 1
+                        anime_series.append(record)
+            
+            print(f"Found {stats.series_seen} total series in Sonarr")
+            print(f"Identified {len(anime_series)} anime series")
+            self.last_feed_stats = stats.as_dict()
+            return anime_series
                 
         except Exception as e:
             print(f"Error fetching Sonarr data: {str(e)}")
@@ -187,6 +236,38 @@ class MALSonarrSync:
         
         return []
     
+    def get_sonarr_series(self, series_ids):
+        """Fetch single Sonarr series by id, keeping those that are anime"""
+        anime_series = []
+        for series_id in series_ids:
+            try:
+                with metrics.phase('fetch'), trace_span('fetch_sonarr'):
+                    response = transport.get(f"{self.config['sonarr']['api_url'].rstrip('/')}/{series_id}",
+                                             headers={'X-Api-Key': self.config['sonarr']['api_key']})
+                response.raise_for_status()
+                record = self.anime_record(response.json())
+                if record:
+                    anime_series.append(record)
+            except Exception as e:
+                print(f"Error fetching Sonarr series {series_id}: {e}")
+        return anime_series
+    
+    def anime_record(self, show):
+        """Return the record kept for a Sonarr series, or None if it is not anime"""
+        if not self.is_anime_series(show):
+            return None
+        return {
+            'title': show.get('title', ''),
+            'year': show.get('year'),
+            'status': show.get('status', ''),
+            'overview': show.get('overview', ''),
+            'sonarr_id': show.get('id'),
+            'tvdb_id': show.get('tvdbId'),
+            'series_type': show.get('seriesType', ''),
+            'path': show.get('path', ''),
+            'tags': show.get('tags', [])
+        }
+    
     def is_anime_series(self, series):
         """Determine if a series is anime"""
         # Check if the series has tags
@@ -223,15 +304,6 @@ class MALSonarrSync:
         ]
         return any(indicator in title for indicator in anime_indicators)
     
-    def clean_title(self, title):
-        """Clean title for better matching"""
-        # Remove year, season numbers, and common suffixes
-        title = re.sub(r'\(\d{4}\)', '', title)  # Remove year
-        title = re.sub(r'Season \d+', '', title, flags=re.IGNORECASE)
-        title = re.sub(r'S\d+', '', title)  # Remove season markers
-        title = re.sub(r'\bOVA\b|\bONA\b|\bSpecial\b', '', title, flags=re.IGNORECASE)
-        return title.strip()
-    
     def search_mal_anime(self, title, limit=10):
         """Search for anime on MyAnimeList"""
         token = self.get_valid_token()
@@ -246,110 +318,166 @@ class MALSonarrSync:
         }
         
         try:
-            response = requests.get('https://api.myanimelist.net/v2/anime', 
-                                  headers=headers, params=params)
+            with trace_span('search', query=title):
+                response = transport.get(f'{self.mal_api_url}/anime',
+                                         headers=headers, params=params)
             if response.status_code == 200:
                 return response.json().get('data', [])
+            if failure_reason(response.status_code):
+                response.raise_for_status()
         except Exception as e:
+            if failure_reason(e):
+                # Worth retrying later; the sync job hands the series to the retry queue
+                raise
             print(f"Error searching MAL: {e}")
         
         return []
     
     def find_best_match(self, sonarr_title, mal_results):
-        """Find the best matching anime using fuzzy matching"""
+        """Find the best matching anime using fuzzy matching
+        
+        Scores the main title, synonyms, English and Japanese titles of every
+        result, weighting token sort ratio double as it's more reliable.
+        """
         if not mal_results:
             return None, 0
         
-        cleaned_sonarr = self.clean_title(sonarr_title)
-        best_match = None
-        best_score = 0
+        return self.scorer.best_match(sonarr_title, mal_results)
+    
+    def match_anime(self, anime, rematch=False, searches=None):
+        """Return (best_match, score) for a Sonarr series, using the match cache when possible
+        
+        With `searches`, the run's SingleFlight, series with the same title
+        share one live MAL search.
+        """
+        key = series_key(anime, anime['title'])
+        min_score = self.config.get('sync', {}).get('minimum_match_score', 75)
+        cached = self.match_cache.get(key, anime['title'], refresh=rematch, min_score=min_score)
+        if cached:
+            best_match = {
+                'id': cached['mal_id'],
+                'title': cached['mal_title'],
+                'start_date': cached['start_date']
+            }
+            return best_match, cached['score']
         
-        for anime in mal_results:
-            anime_data = anime['node']
-            titles_to_check = [anime_data['title']]
-            
-            # Add alternative titles
-            alt_titles = anime_data.get('alternative_titles', {})
-            titles_to_check.extend(alt_titles.get('synonyms', []))
-            if alt_titles.get('en'):
-                titles_to_check.append(alt_titles['en'])
-            if alt_titles.get('ja'):
-                titles_to_check.append(alt_titles['ja'])
-            
-            # Calculate fuzzy match scores
-            for title in titles_to_check:
-                if not title:
-                    continue
-                    
-                cleaned_mal = self.clean_title(title)
-                
-                # Use multiple fuzzy matching algorithms
-                ratio_score = fuzz.ratio(cleaned_sonarr.lower(), cleaned_mal.lower())
-                partial_score = fuzz.partial_ratio(cleaned_sonarr.lower(), cleaned_mal.lower())
-                token_score = fuzz.token_sort_ratio(cleaned_sonarr.lower(), cleaned_mal.lower())
-                
-                # Weight token sort ratio higher as it's more reliable
-                combined_score = (ratio_score + partial_score + token_score * 2) / 4
-                
-                if combined_score > best_score:
-                    best_score = combined_score
-                    best_match = anime_data
+        best_match, score = None, 0
         
-        return best_match, best_score
+        # Try the local catalog first; the live search is only a fallback
+        if self.catalog:
+            with trace_span('catalog_search'):
+                candidates = self.catalog.search(self.scorer.normalize(anime['title']))
+            best_match, score = self.find_best_match(anime['title'], candidates)
+            if best_match and score >= min_score:
+                self.catalog.record_resolved()
+        
+        if not best_match or score < min_score:
+            searches = searches or SingleFlight()
+            mal_results = searches.do(search_key(anime['title']),
+                                      lambda: self.search_mal_anime(anime['title']))
+            api_match, api_score = self.find_best_match(anime['title'], mal_results)
+            if api_score > score:
+                best_match, score = api_match, api_score
+        
+        if best_match:
+            self.match_cache.put(key, anime['title'], best_match['id'], best_match['title'],
+                                 best_match.get('start_date'), score)
+        return best_match, score
+    
+    def series_matcher(self, rematch=False):
+        """Matcher for the async engine, with the same cache and catalog as match_anime"""
+        return SeriesMatcher(self.scorer, self.match_cache, self.catalog,
+                             self.config.get('sync', {}).get('minimum_match_score', 75),
+                             refresh=rematch, clean_query=False)
+    
+    def async_client(self):
+        """The aiohttp client shared by every async job; only used on the job loop"""
+        if self._async_client is None:
+            self._async_client = AsyncHttpClient(
+                self.config.get('http'),
+                self.config.get('sync', {}).get('concurrency', DEFAULT_CONCURRENCY)
+            )
+            self._async_client.set_limiter(urlsplit(self.mal_api_url).netloc, self.limiter)
+            self._async_client.set_auth(urlsplit(self.mal_api_url).netloc, self.token_manager)
+            self._async_client.set_cache(urlsplit(self.mal_api_url).netloc, self.response_cache)
+        return self._async_client
     
     def get_user_anime_list(self):
-        """Get user's anime list from MAL"""
+        """Get user's whole anime list from MAL, following every page; None if it could not be fetched"""
         token = self.get_valid_token()
         if not token:
-            return []
-        
-        headers = {'Authorization': f'Bearer {token}'}
-        params = {
-            'fields': 'list_status',
-            'limit': 1000
-        }
+            return None
         
         try:
-            response = requests.get('https://api.myanimelist.net/v2/users/@me/animelist', 
-                                  headers=headers, params=params)
-            if response.status_code == 200:
-                return response.json().get('data', [])
+            with metrics.phase('fetch'), trace_span('fetch_mal_list'):
+                return list(iter_anime_list(token, client=transport, base_url=self.mal_api_url))
         except Exception as e:
             print(f"Error fetching user anime list: {e}")
         
-        return []
+        return None
+    
+    def get_user_list_index(self):
+        """Get the user's MAL list as {anime_id: list_status}, or None if it could not be fetched"""
+        entries = self.get_user_anime_list()
+        if entries is None:
+            return None
+        return {entry['node']['id']: entry.get('list_status') or {} for entry in entries}
     
     def add_anime_to_list(self, anime_id, status='plan_to_watch'):
-        """Add anime to user's MAL list"""
+        """Add anime to user's MAL list; returns (added, the status code or exception on failure)"""
         token = self.get_valid_token()
         if not token:
-            return False
+            return False, RuntimeError('Not authenticated with MyAnimeList')
         
         headers = {'Authorization': f'Bearer {token}'}
         data = {'status': status}
         
         try:
-            response = requests.put(f'https://api.myanimelist.net/v2/anime/{anime_id}/my_list_status',
-                                  headers=headers, data=data)
-            return response.status_code == 200
+            with metrics.phase('write'), trace_span('update', status=status):
+                response = transport.put(f'{self.mal_api_url}/anime/{anime_id}/my_list_status',
+                                         headers=headers, data=data)
+            if response.status_code == 200:
+                return True, None
+            return False, response.status_code
         except Exception as e:
             print(f"Error adding anime to list: {e}")
-            return False
+            return False, e
 
 # Initialize the sync class
 sync = MALSonarrSync()
 
+# Jobs still marked running were cut short by a restart; they can be resumed
+sync.checkpoints.mark_interrupted('web')
+
+# Sync sessions: live ones in memory, finished result sets spilled to disk
+active_syncs = SessionStore(
+    sync.config.get('sync', {}).get('session_file', SESSION_FILE),
+    sync.config.get('sync', {}).get('max_sessions', DEFAULT_MAX_SESSIONS),
+    sync.config.get('sync', {}).get('session_ttl_hours', DEFAULT_SESSION_TTL_HOURS)
+)
+
+# Progress events are coalesced into at most one per session per interval
+progress_events = ProgressBatcher(
+    lambda payload: socketio.emit('sync_progress', payload),
+    sync.config.get('sync', {}).get('progress_interval_ms', DEFAULT_PROGRESS_INTERVAL_MS)
+)
+
 @app.route('/')
 def index():
     """Main dashboard"""
     return render_template('index.html', 
                          config_exists=bool(sync.config),
-                         authenticated=bool(sync.tokens.get('access_token')))
+                         authenticated=(bool(sync.tokens.get('access_token'))
+                                        and not sync.token_manager.needs_reauth))
 
 @app.route('/config')
 def config():
     """Configuration page"""
-    return render_template('config.html', config=sync.config)
+    return render_template('config.html', config=sync.config, auto_sync_status=auto_sync.status())
+
+@app.template_filter('timestamp')
+def format_timestamp(value):
+    return datetime.fromtimestamp(value).strftime('%Y-%m-%d %H:%M')
 
 @app.route('/about')
 def about():
@@ -360,24 +488,38 @@ def about():
 def save_config():
     """Save configuration"""
     config_data = {
+        # Sections without form fields (e.g. 'http') are kept as they are
+        **sync.config,
         'sonarr': {
             'api_url': request.form.get('sonarr_url', '').rstrip('/') + '/api/v3/series',
             'api_key': request.form.get('sonarr_key', '')
         },
         'mal': {
+            **sync.config.get('mal', {}),
             'client_id': request.form.get('mal_client_id', ''),
             'client_secret': request.form.get('mal_client_secret', ''),
             'redirect_uri': request.url_root.rstrip('/') + '/callback'
         },
-        'sync': {
-            'default_status': request.form.get('default_status', 'completed'),
-            'minimum_match_score': int(request.form.get('match_score', 75)),
-            'auto_sync': request.form.get('auto_sync') == 'on',
-            'sync_interval_hours': int(request.form.get('sync_interval', 24))
-        }
+        # Start from the current sync settings so keys without a form field survive
+        'sync': dict(sync.config.get('sync', {}))
     }
+    config_data['sync'].update({
+        'default_status': request.form.get('default_status', 'completed'),
+        'minimum_match_score': int(request.form.get('match_score', 75)),
+        'auto_sync': request.form.get('auto_sync') == 'on',
+        'sync_interval_hours': int(request.form.get('sync_interval', 24)),
+        'workers': int(request.form.get('workers', 1)),
+        'requests_per_second': float(request.form.get('requests_per_second', DEFAULT_REQUESTS_PER_SECOND)),
+        'burst': int(request.form.get('burst', DEFAULT_BURST)),
+        'engine': request.form.get('engine', 'threads'),
+        'concurrency': int(request.form.get('concurrency', DEFAULT_CONCURRENCY))
+    })
     
     sync.save_config(config_data)
+    active_syncs.configure(config_data['sync'].get('max_sessions'),
+                           config_data['sync'].get('session_ttl_hours'))
+    scheduler.configure(config_data['sync'].get('max_concurrent_jobs', DEFAULT_MAX_CONCURRENT_JOBS))
+    auto_sync.configure(config_data['sync']['auto_sync'], config_data['sync']['sync_interval_hours'])
     flash('Configuration saved successfully!', 'success')
     return redirect(url_for('config'))
 
@@ -410,19 +552,36 @@ def api_sonarr_anime():
 
 @app.route('/api/sync_preview')
 def api_sync_preview():
-    """API endpoint to preview sync without making changes"""
-    sonarr_anime = sync.get_sonarr_anime()
-    user_list = sync.get_user_anime_list()
+    """API endpoint to preview sync without making changes
     
-    # Get IDs of anime already in user's list
-    existing_ids = {anime['node']['id'] for anime in user_list}
+    The matches and intended statuses are saved as a sync plan; POST its
+    plan_id to /api/sync to apply it without searching again.
+    """
+    sonarr_anime = sync.get_sonarr_anime()
+    # IDs of anime already in user's list
+    existing_ids = sync.get_user_list_index()
+    if existing_ids is None:
+        # A plan built without the list would treat every series as not in it
+        return jsonify({'error': 'Could not fetch your MAL list; try the preview again later'}), 503
     
     preview_results = []
+    plan_items = []
     min_score = sync.config.get('sync', {}).get('minimum_match_score', 75)
+    default_status = sync.config.get('sync', {}).get('default_status', 'completed')
+    
+    rematch = request.args.get('rematch', 'false').lower() == 'true'
+    searches = SingleFlight(metrics)
     
     for anime in sonarr_anime:
-        mal_results = sync.search_mal_anime(anime['title'])
-        best_match, score = sync.find_best_match(anime['title'], mal_results)
+        try:
+            best_match, score = sync.match_anime(anime, rematch=rematch, searches=searches)
+        except Exception as e:
+            print(f"Error searching MAL: {e}")
+            best_match, score = None, 0
+        in_list = best_match is not None and best_match['id'] in existing_ids
+        planned, mal_status = plan_anime(anime, best_match, score, in_list, {}, min_score,
+                                         default_status)
+        plan_items.append({'anime': anime, 'result': planned, 'mal_status': mal_status})
         
         result = {
             'sonarr_title': anime['title'],
@@ -439,136 +598,760 @@ def api_sync_preview():
         
         preview_results.append(result)
     
-    return jsonify(preview_results)
+    plan_id = sync.plans.create(plan_items, library_fingerprint(sonarr_anime),
+                                list_fingerprint(existing_ids), {'rematch': rematch})
+    return jsonify({'plan_id': plan_id, 'version': PLAN_VERSION, 'results': preview_results})
 
-@app.route('/api/sync', methods=['POST'])
-def api_sync():
-    """API endpoint to perform actual sync with real-time progress updates"""
-    dry_run = request.json.get('dry_run', False)
-    session_id = str(uuid.uuid4())
+def plan_anime(anime, best_match, score, in_list, options, min_score, default_status):
+    """Decide what to do with one matched Sonarr series.
     
-    # Store session info
-    active_syncs[session_id] = {
-        'status': 'starting',
-        'current_item': 0,
-        'total_items': 0,
-        'results': []
+    Returns (result, mal_status); mal_status is set when the series still
+    has to be added to MAL with that status.
+    """
+    # Determine result status for filtering
+    if not best_match:
+        result_status = 'error'  # No match found
+    elif score < min_score:
+        result_status = 'warning'  # Match score too low
+    elif in_list:
+        result_status = 'success'  # Already in list (considered success)
+    else:
+        result_status = 'success'  # Will be added/was added successfully
+    
+    result = {
+        'sonarr_title': anime['title'],
+        'success': False,
+        'message': '',
+        'match_score': score,
+        'status': result_status,
+        'outcome': '',
+        'mal_title': best_match['title'] if best_match else '',
+        'mal_id': best_match['id'] if best_match else None
     }
     
-    def sync_worker():
+    mal_status = None
+    if not best_match:
+        result['message'] = 'No match found'
+        result['outcome'] = 'no_match'
+    elif score < min_score:
+        result['message'] = f'Match score too low ({score:.1f}% < {min_score}%)'
+        result['outcome'] = 'low_score'
+        result['mal_title'] = best_match['title']
+    elif in_list:
+        result['message'] = 'Already in MAL list'
+        result['outcome'] = 'already_in_list'
+        result['success'] = True
+    elif options.get('dry_run'):
+        result['message'] = f'Would add: {best_match["title"]} (Score: {score:.1f}%)'
+        result['outcome'] = 'would_add'
+        result['success'] = True
+    else:
+        # Map Sonarr status to MAL status
+        mal_status = default_status
+        if anime['status'].lower() == 'continuing':
+            mal_status = 'watching'
+        elif anime['status'].lower() in ['ended', 'completed']:
+            mal_status = 'completed'
+    
+    return result, mal_status
+
+def apply_add_result(result, added, mal_status, error=None):
+    """Record the outcome of adding a planned series to MAL in its result"""
+    if added:
+        result['message'] = f'Added: {result["mal_title"]} as {mal_status}'
+        result['outcome'] = 'updated'
+        result['success'] = True
+    else:
+        result['message'] = f'Failed to add to MAL: {error}' if error is not None else 'Failed to add to MAL'
+        result['outcome'] = 'failed'
+        result['status'] = 'error'
+    return result
+
+def search_failed_result(anime, error):
+    """Result of a series whose MAL search (or list lookup) failed"""
+    result, _ = plan_anime(anime, None, 0, False, {}, 0, None)
+    result['message'] = f'MAL search failed: {error}'
+    result['outcome'] = 'failed'
+    return result
+
+def process_anime(anime, existing_ids, options, min_score, default_status, searches=None):
+    """Match one Sonarr series and add it to MAL if needed; returns (result, error)"""
+    with trace_title(anime['title']):
         try:
-            sonarr_anime = sync.get_sonarr_anime()
-            user_list = sync.get_user_anime_list()
-            
-            # Get IDs of anime already in user's list
-            existing_ids = {anime['node']['id'] for anime in user_list}
-            
-            total_items = len(sonarr_anime)
-            active_syncs[session_id]['total_items'] = total_items
-            
-            sync_results = []
-            min_score = sync.config.get('sync', {}).get('minimum_match_score', 75)
-            default_status = sync.config.get('sync', {}).get('default_status', 'completed')
-            
-            for i, anime in enumerate(sonarr_anime):
-                current_item = i + 1
-                active_syncs[session_id]['current_item'] = current_item
-                
-                # Emit progress update
-                socketio.emit('sync_progress', {
-                    'session_id': session_id,
-                    'title': anime['title'],
-                    'current': current_item,
-                    'total': total_items,
-                    'status': 'processing'
-                })
-                
-                mal_results = sync.search_mal_anime(anime['title'])
-                best_match, score = sync.find_best_match(anime['title'], mal_results)
-                
-                # Determine result status for filtering
-                if not best_match:
-                    result_status = 'error'  # No match found
-                elif score < min_score:
-                    result_status = 'warning'  # Match score too low
-                elif best_match['id'] in existing_ids:
-                    result_status = 'success'  # Already in list (considered success)
-                else:
-                    result_status = 'success'  # Will be added/was added successfully
-                
-                result = {
-                    'sonarr_title': anime['title'],
-                    'success': False,
-                    'message': '',
-                    'match_score': score,
-                    'status': result_status,
-                    'mal_title': best_match['title'] if best_match else '',
-                    'mal_id': best_match['id'] if best_match else None
-                }
-                
-                if not best_match:
-                    result['message'] = 'No match found'
-                elif score < min_score:
-                    result['message'] = f'Match score too low ({score:.1f}% < {min_score}%)'
-                    result['mal_title'] = best_match['title']
-                elif best_match['id'] in existing_ids:
-                    result['message'] = 'Already in MAL list'
-                    result['success'] = True
-                else:
-                    if dry_run:
-                        result['message'] = f'Would add: {best_match["title"]} (Score: {score:.1f}%)'
-                        result['success'] = True
-                    else:
-                        # Map Sonarr status to MAL status
-                        mal_status = default_status
-                        if anime['status'].lower() == 'continuing':
-                            mal_status = 'watching'
-                        elif anime['status'].lower() in ['ended', 'completed']:
-                            mal_status = 'completed'
-                        
-                        if sync.add_anime_to_list(best_match['id'], mal_status):
-                            result['message'] = f'Added: {best_match["title"]} as {mal_status}'
-                            result['success'] = True
-                        else:
-                            result['message'] = 'Failed to add to MAL'
-                            result['status'] = 'error'
-                
-                sync_results.append(result)
-                active_syncs[session_id]['results'] = sync_results
-                
-                # Add delay to respect rate limits
-                if not dry_run:
-                    time.sleep(1)
-            
-            # Emit completion
-            socketio.emit('sync_complete', {
-                'session_id': session_id,
-                'results': sync_results
-            })
-            
-            active_syncs[session_id]['status'] = 'completed'
-            
+            best_match, score = sync.match_anime(anime, rematch=options.get('rematch', False),
+                                                 searches=searches)
+            in_list = best_match is not None and best_match['id'] in existing_ids
         except Exception as e:
-            socketio.emit('sync_error', {
-                'session_id': session_id,
-                'error': str(e)
+            return search_failed_result(anime, e), e
+        result, mal_status = plan_anime(anime, best_match, score, in_list, options, min_score,
+                                        default_status)
+        error = None
+        if mal_status:
+            added, error = sync.add_anime_to_list(best_match['id'], mal_status)
+            apply_add_result(result, added, mal_status, error)
+    return result, error
+
+def prepare_sync_job(session_id, options, sonarr_anime, resume=False):
+    """Register the fetched series with a job and drop those it does not need to process.
+    
+    Returns (sonarr_anime, sync_results) where sync_results already holds
+    the results restored from checkpoints and unchanged series.
+    """
+    total_items = len(sonarr_anime)
+    active_syncs[session_id]['total_items'] = total_items
+    active_syncs[session_id]['status'] = 'running'
+    sync.checkpoints.update_job(session_id, status='running', total=total_items)
+    # The job's summary reports the response cache hits since here
+    active_syncs[session_id]['response_cache_baseline'] = sync.response_cache.snapshot()
+    
+    sync_results = []
+    if resume:
+        # Items the job already finished are restored instead of redone
+        done = {key: item for key, item in sync.checkpoints.committed_items(session_id).items()
+                if item['outcome'] not in RETRYABLE_OUTCOMES}
+        sync_results = [item['result'] for item in done.values() if item['result']]
+        sonarr_anime = [anime for anime in sonarr_anime
+                        if series_key(anime, anime['title']) not in done]
+    
+    if options.get('incremental'):
+        # Series unchanged since their last successful sync are skipped
+        sonarr_anime, unchanged = sync.sync_state.partition(sonarr_anime)
+        for anime in unchanged:
+            state = sync.sync_state.get(anime)
+            sync_results.append({
+                'sonarr_title': anime['title'],
+                'success': True,
+                'message': f'Unchanged since last sync ({state["outcome"]})',
+                'match_score': state['score'] or 0,
+                'status': 'skipped',
+                'outcome': 'unchanged',
+                'mal_title': state['mal_title'] or '',
+                'mal_id': state['mal_id']
             })
-            active_syncs[session_id]['status'] = 'error'
+        active_syncs[session_id]['skipped_unchanged'] = len(unchanged)
+    active_syncs[session_id]['current_item'] = len(sync_results)
+    active_syncs[session_id]['results'] = sync_results
+    return sonarr_anime, sync_results
+
+def record_sync_result(session_id, anime, result, sync_results, dry_run=False, error=None):
+    """Report, checkpoint and remember the result of one finished series
+    
+    A failed series goes to the retry queue with its error; any other
+    outcome clears it from the queue.
+    """
+    current_item = report_sync_result(session_id, anime, result, sync_results)
+    store_sync_result(session_id, anime, result, current_item, dry_run, error)
+
+def report_sync_result(session_id, anime, result, sync_results):
+    """Add a finished series to the job's results and progress; returns its position"""
+    sync_results.append(result)
+    current_item = len(sync_results)
+    active_syncs[session_id]['current_item'] = current_item
+    
+    # Progress is batched; clients fetch the new results with ?since=<cursor>
+    progress_events.update(session_id, {
+        'session_id': session_id,
+        'title': anime['title'],
+        'current': current_item,
+        'total': active_syncs[session_id]['total_items'],
+        'cursor': current_item,
+        'status': 'processing'
+    })
+    return current_item
+
+def store_sync_result(session_id, anime, result, current_item, dry_run=False, error=None):
+    """Write a finished series to the checkpoints, sync state and retry queue"""
+    sync.checkpoints.commit_item(session_id, series_key(anime, anime['title']),
+                                 current_item, result['outcome'], result)
+    metrics.record_item(result['outcome'])
+    
+    # Remember successful outcomes for later incremental syncs
+    if result['success'] and not dry_run:
+        sync.sync_state.record(anime, result['outcome'], result['mal_id'],
+                               result['mal_title'], result['match_score'])
+    if dry_run:
+        return
+    if result['outcome'] == 'failed':
+        sync.retry_queue.push(anime, 'update' if result['mal_id'] else 'search', error,
+                              result['mal_id'], result['mal_title'])
+    else:
+        sync.retry_queue.resolve(anime)
+
+def summarize_results(sync_results):
+    """Count results by status and by outcome"""
+    summary = {'total': len(sync_results), 'by_status': {}, 'by_outcome': {}}
+    for result in sync_results:
+        for field, counts in (('status', summary['by_status']), ('outcome', summary['by_outcome'])):
+            value = result.get(field) or 'unknown'
+            counts[value] = counts.get(value, 0) + 1
+    return summary
+
+def finish_sync_job(session_id, sync_results, error=None, searches=None):
+    """Mark a job completed (or failed with error) and tell the clients
+    
+    The completion event carries a summary and the URL of the full result
+    set rather than the results themselves. With the job's `searches`, the
+    summary counts the MAL searches saved by coalescing.
+    """
+    progress_events.close(session_id)
+    if error is not None:
+        socketio.emit('sync_error', {
+            'session_id': session_id,
+            'error': str(error)
+        })
+        active_syncs[session_id]['status'] = 'error'
+        active_syncs[session_id]['error'] = str(error)
+        sync.checkpoints.update_job(session_id, status='error')
+        active_syncs.finish(session_id)
+        scheduler.job_finished(session_id)
+        return
     
-    # Start sync in background thread
-    thread = threading.Thread(target=sync_worker)
+    summary = summarize_results(sync_results)
+    summary['response_cache'] = sync.response_cache.since(
+        active_syncs[session_id].pop('response_cache_baseline', None))
+    if searches is not None:
+        summary['searches'] = searches.stats()
+    active_syncs[session_id]['status'] = 'completed'
+    active_syncs[session_id]['summary'] = summary
+    sync.checkpoints.update_job(session_id, status='completed')
+    active_syncs.finish(session_id)
+    
+    # Emit completion
+    socketio.emit('sync_complete', {
+        'session_id': session_id,
+        'summary': summary,
+        'results_url': f'/api/sync_status/{session_id}?since=0'
+    })
+    scheduler.job_finished(session_id)
+
+def run_sync_job(session_id, options, resume=False):
+    """Run a sync job, checkpointing every finished item so it can be resumed"""
+    workers = options.get('workers', 1)
+    sync_results = []
+    try:
+        series_ids = options.get('series_ids')
+        sonarr_anime = sync.get_sonarr_series(series_ids) if series_ids else sync.get_sonarr_anime()
+        sonarr_anime, sync_results = prepare_sync_job(session_id, options, sonarr_anime, resume)
+        
+        if series_ids:
+            # A few series from a webhook: look each match up instead of paging the whole list
+            existing_ids = ListStatusLookup(sync.get_valid_token(), transport, sync.mal_api_url)
+        else:
+            # IDs of anime already in user's list, fetched once for the whole run
+            existing_ids = sync.get_user_list_index() if sonarr_anime else {}
+            if existing_ids is None:
+                # Without the whole list, each match's status is looked up on its own
+                existing_ids = ListStatusLookup(sync.get_valid_token(), transport, sync.mal_api_url)
+        
+        min_score = sync.config.get('sync', {}).get('minimum_match_score', 75)
+        default_status = sync.config.get('sync', {}).get('default_status', 'completed')
+        # Series with the same title share one MAL search per job
+        searches = SingleFlight(metrics)
+        
+        # Workers share sync.limiter, so MAL traffic stays within the configured rate
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(
+                in_session(lambda anime: process_anime(anime, existing_ids, options, min_score,
+                                                       default_status, searches)),
+                sonarr_anime
+            )
+            for anime, (result, error) in zip(sonarr_anime, results):
+                record_sync_result(session_id, anime, result, sync_results,
+                                   options.get('dry_run', False), error)
+        
+        finish_sync_job(session_id, sync_results, searches=searches)
+        
+    except Exception as e:
+        finish_sync_job(session_id, sync_results, error=e)
+
+def run_plan_job(session_id, options, resume=False):
+    """Apply a saved sync plan: only the list updates it decided on are sent to MAL"""
+    plan_id = options['plan_id']
+    sync_results = []
+    try:
+        plan = sync.plans.get(plan_id)
+        if plan is None:
+            raise RuntimeError(f'Sync plan {plan_id} not found')
+        planned = {series_key(item['anime'], item['anime']['title']): item for item in plan['items']}
+        sonarr_anime, sync_results = prepare_sync_job(
+            session_id, options, [item['anime'] for item in plan['items']], resume
+        )
+        
+        def apply(anime):
+            item = planned[series_key(anime, anime['title'])]
+            result = dict(item['result'])
+            error = None
+            if item['mal_status']:
+                with trace_title(anime['title']):
+                    added, error = sync.add_anime_to_list(result['mal_id'], item['mal_status'])
+                apply_add_result(result, added, item['mal_status'], error)
+            return result, error
+        
+        with ThreadPoolExecutor(max_workers=options.get('workers', 1)) as pool:
+            for anime, (result, error) in zip(sonarr_anime, pool.map(in_session(apply), sonarr_anime)):
+                record_sync_result(session_id, anime, result, sync_results, error=error)
+        
+        failed = any(result.get('outcome') == 'failed' for result in sync_results)
+        sync.plans.update_status(plan_id, 'failed' if failed else 'applied')
+        finish_sync_job(session_id, sync_results)
+    
+    except Exception as e:
+        # A plan nothing was written from can be applied again; otherwise it has to pass the staleness check
+        sync.plans.update_status(plan_id, 'failed' if sync_results else 'ready')
+        finish_sync_job(session_id, sync_results, error=e)
+
+async def run_sync_job_async(session_id, options, resume=False):
+    """run_sync_job on the asyncio engine: the job is a coroutine on the shared job loop.
+    
+    Up to the configured concurrency of series are in flight at once; all
+    async jobs share one aiohttp client and the MAL rate limiter.
+    """
+    sync_results = []
+    try:
+        token = await asyncio.to_thread(sync.get_valid_token)
+        if not token:
+            raise RuntimeError('Not authenticated with MyAnimeList')
+        concurrency = options.get('concurrency') or sync.async_client().concurrency
+        engine = AsyncSyncEngine(sync.async_client(), sync.mal_api_url, token,
+                                 sync.series_matcher(options.get('rematch', False)), concurrency)
+        
+        stats = StreamStats()
+        sonarr_anime = await engine.fetch_series(sync.config['sonarr']['api_url'],
+                                                 sync.config['sonarr']['api_key'],
+                                                 sync.anime_record, stats)
+        sync.last_feed_stats = stats.as_dict()
+        # SQLite reads and writes run in a worker thread so the loop's other requests keep going
+        sonarr_anime, sync_results = await asyncio.to_thread(prepare_sync_job, session_id, options,
+                                                             sonarr_anime, resume)
+        
+        list_index = {}
+        if sonarr_anime:
+            try:
+                list_index = await engine.list_index()
+            except Exception as e:
+                # As in run_sync_job: look up each matched title's list status instead
+                print(f"Error fetching user anime list: {e}")
+                list_index = None
+        min_score = sync.config.get('sync', {}).get('minimum_match_score', 75)
+        default_status = sync.config.get('sync', {}).get('default_status', 'completed')
+        
+        def plan(anime, best_match, score, current_status):
+            return plan_anime(anime, best_match, score, current_status is not None, options,
+                              min_score, default_status)
+        
+        async def finish(anime, result, update):
+            error = None
+            if update is not None:
+                mal_status, added, error = update
+                if result is None:
+                    result = search_failed_result(anime, error)
+                else:
+                    apply_add_result(result, added, mal_status, None if added else error)
+            current_item = report_sync_result(session_id, anime, result, sync_results)
+            await asyncio.to_thread(store_sync_result, session_id, anime, result, current_item,
+                                    options.get('dry_run', False), None if result['success'] else error)
+        
+        await engine.run(sonarr_anime, plan, finish, list_index)
+        await asyncio.to_thread(finish_sync_job, session_id, sync_results, searches=engine.searches)
+    
+    except Exception as e:
+        await asyncio.to_thread(finish_sync_job, session_id, sync_results, error=e)
+
+def start_sync_job(session_id, options, resume=False):
+    """Start a scheduled job on its engine: run_sync_job in a thread or run_sync_job_async on the job loop"""
+    # Store session info
+    active_syncs.create(session_id, new_session('starting', options))
+    if not resume:
+        sync.checkpoints.create_job(session_id, 'web', options)
+    
+    if options.get('engine') == 'async':
+        job = run_sync_job_async(session_id, options, resume)
+        async_jobs.submit(profiled_async(session_id, job) if options.get('profile') else job)
+        return
+    
+    target = run_plan_job if options.get('plan_id') else run_sync_job
+    if options.get('profile'):
+        target = profiled(session_id, target)
+    thread = threading.Thread(target=target, args=(session_id, options, resume))
     thread.daemon = True
     thread.start()
+
+def job_profiler(session_id):
+    """Profiling session for a web job; its dumps are served by /api/sync_profile/<session_id>"""
+    return Profiler(sync.config.get('sync', {}).get('profile_dir', PROFILE_DIR), f'sync-{session_id}')
+
+def profiled(session_id, target):
+    """Wrap a threaded job so it runs (with its worker pools) under a profiler"""
+    def run(*args):
+        with job_profiler(session_id):
+            target(*args)
+    return run
+
+async def profiled_async(session_id, job):
+    """Await an async job under a profiler; other jobs on the job loop show up in its pstats, not its trace"""
+    with job_profiler(session_id):
+        await job
+
+def new_session(status, options):
+    return {
+        'status': status,
+        'current_item': 0,
+        'total_items': 0,
+        'workers': options.get('workers', 1),
+        'engine': options.get('engine', 'threads'),
+        'incremental': options.get('incremental', False),
+        'profile': options.get('profile', False),
+        'skipped_unchanged': 0,
+        'results': []
+    }
+
+def job_queued(job):
+    """Give a queued job a session so its status can be polled before it starts"""
+    session = new_session('queued', job['options'])
+    session['priority'] = job['priority']
+    active_syncs.create(job['session_id'], session)
+
+def job_cancelled(job):
+    active_syncs[job['session_id']]['status'] = 'cancelled'
+    active_syncs.finish(job['session_id'])
+    socketio.emit('sync_cancelled', {'session_id': job['session_id']})
+
+# All web sync jobs (manual and resumed) go through one queue
+scheduler = JobScheduler(
+    start_sync_job,
+    sync.config.get('sync', {}).get('max_concurrent_jobs', DEFAULT_MAX_CONCURRENT_JOBS),
+    on_queued=job_queued,
+    on_cancelled=job_cancelled
+)
+
+def run_auto_sync():
+    """Run an incremental sync through the job queue and wait for it; returns its item counts"""
+    sync_config = sync.config.get('sync', {})
+    engine = sync_config.get('engine', 'threads')
+    options = {
+        'dry_run': False,
+        'rematch': False,
+        'incremental': True,
+        'workers': max(1, int(sync_config.get('workers', 1))),
+        'engine': engine if engine in ENGINES and (engine != 'async' or aiohttp) else 'threads',
+        'concurrency': max(1, int(sync_config.get('concurrency', DEFAULT_CONCURRENCY)))
+    }
+    job, _ = scheduler.submit(options, source='auto')
+    scheduler.wait(job['session_id'])
+    session = active_syncs.get(job['session_id']) or {}
+    if session.get('status') != 'completed':
+        raise RuntimeError(session.get('error') or f"Sync job {job['session_id']} did not complete")
+    summary = session.get('summary') or {}
+    return {
+        'session_id': job['session_id'],
+        'total': summary.get('total', 0),
+        'skipped_unchanged': session.get('skipped_unchanged', 0),
+        'by_outcome': summary.get('by_outcome', {})
+    }
+
+metrics.gauge('active_jobs', lambda: len(scheduler.snapshot()['running']), 'Sync jobs running')
+metrics.gauge('queued_jobs', lambda: len(scheduler.snapshot()['queued']), 'Sync jobs waiting to start')
+metrics.gauge('retry_queue_pending', lambda: sync.retry_queue.stats()['pending'], 'Failed items waiting for a retry')
+metrics.gauge('dead_letters', lambda: sync.retry_queue.stats()['dead_letters'], 'Failed items that are no longer retried')
+metrics.gauge('response_cache_bytes', lambda: sync.response_cache.stats()['bytes'],
+              'Compressed size of the stored MAL responses')
+metrics.gauge('mal_requests_per_second', lambda: sync.limiter.rate, 'Current MAL request rate allowed by the limiter')
+
+# Periodic incremental syncs; a run that comes due during another sync is postponed
+auto_sync = AutoSync(
+    run_auto_sync,
+    sync.config.get('sync', {}).get('sync_interval_hours', DEFAULT_SYNC_INTERVAL_HOURS),
+    enabled=sync.config.get('sync', {}).get('auto_sync', False),
+    jitter_minutes=sync.config.get('sync', {}).get('auto_sync_jitter_minutes', DEFAULT_JITTER_MINUTES),
+    path=sync.config.get('sync', {}).get('auto_sync_file', AUTO_SYNC_FILE),
+    is_busy=lambda: scheduler.is_busy() or bool(sync.checkpoints.active_jobs())
+)
+def retry_failed_item(entry):
+    """Retry one queued series through the normal match-and-add path; returns None once it is settled"""
+    anime = entry['series']
+    existing_ids = ListStatusLookup(sync.get_valid_token(), transport, sync.mal_api_url)
+    result, error = process_anime(anime, existing_ids, {},
+                                  sync.config.get('sync', {}).get('minimum_match_score', 75),
+                                  sync.config.get('sync', {}).get('default_status', 'completed'))
+    if result['outcome'] == 'failed':
+        return error if error is not None else RuntimeError(result['message'])
+    if result['success']:
+        sync.sync_state.record(anime, result['outcome'], result['mal_id'],
+                               result['mal_title'], result['match_score'])
+    return None
+
+# Failed searches and updates are retried in the background between sync jobs
+retry_worker = RetryWorker(
+    sync.retry_queue,
+    retry_failed_item,
+    sync.config.get('sync', {}).get('retry_poll_seconds', DEFAULT_RETRY_POLL_SECONDS),
+    # Without a MAL token every retry would fail, so the queue waits for one too
+    is_busy=lambda: (scheduler.is_busy() or bool(sync.checkpoints.active_jobs())
+                     or not sync.token_manager.current())
+)
+# Under the debug reloader only the child process that serves requests runs the schedule
+if __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+    auto_sync.start()
+    retry_worker.start()
+
+def sync_webhook_series(series_ids):
+    """Queue an incremental sync of the series a burst of Sonarr events touched"""
+    options = {
+        'dry_run': False,
+        'rematch': False,
+        'incremental': True,
+        'series_ids': series_ids,
+        'workers': max(1, int(sync.config.get('sync', {}).get('workers', 1))),
+        'engine': 'threads'
+    }
+    job, deduplicated = scheduler.submit(options, source='webhook')
+    print(f"Sonarr webhook: syncing {len(series_ids)} series in job {job['session_id']}"
+          f"{' (already queued)' if deduplicated else ''}")
+
+webhook_events = WebhookQueue(
+    sync_webhook_series,
+    forget_series=sync.sync_state.forget,
+    debounce_seconds=sync.config.get('sonarr', {}).get('webhook_debounce_seconds', DEFAULT_DEBOUNCE_SECONDS),
+    max_delay_seconds=sync.config.get('sonarr', {}).get('webhook_max_delay_seconds', DEFAULT_MAX_DELAY_SECONDS)
+)
+
+def scheduled_response(job, deduplicated, **extra):
+    return jsonify({
+        'session_id': job['session_id'],
+        'state': job['state'],
+        'deduplicated': deduplicated,
+        'position': scheduler.position(job['session_id']),
+        **extra
+    })
+
+@app.route('/api/sync', methods=['POST'])
+def api_sync():
+    """API endpoint to perform actual sync with real-time progress updates"""
+    options = {
+        'dry_run': request.json.get('dry_run', False),
+        'rematch': request.json.get('rematch', False),
+        'incremental': request.json.get('incremental', False),
+        'workers': max(1, int(request.json.get('workers', sync.config.get('sync', {}).get('workers', 1)))),
+        'engine': request.json.get('engine', sync.config.get('sync', {}).get('engine', 'threads')),
+        'concurrency': max(1, int(request.json.get('concurrency', sync.config.get('sync', {}).get('concurrency', DEFAULT_CONCURRENCY)))),
+        'profile': bool(request.json.get('profile', False))
+    }
+    if options['engine'] not in ENGINES:
+        return jsonify({'error': f"Unknown engine '{options['engine']}'"}), 400
+    if options['engine'] == 'async' and aiohttp is None:
+        return jsonify({'error': 'The async engine needs aiohttp (pip install aiohttp)'}), 400
+    try:
+        priority = int(request.json.get('priority', 0))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'priority must be an integer'}), 400
     
-    return jsonify({'session_id': session_id})
+    plan_id = request.json.get('plan_id')
+    if plan_id:
+        conflict = plan_conflict(plan_id)
+        if conflict:
+            return conflict
+        # The plan's writes are sent from worker threads whichever engine is configured
+        options.update(plan_id=plan_id, dry_run=False, incremental=False, engine='threads')
+    
+    # Equivalent requests (double-clicks, other tabs) attach to the same job
+    job, deduplicated = scheduler.submit(options, priority=priority)
+    if plan_id and not deduplicated:
+        sync.plans.update_status(plan_id, 'applying', applied_by=job['session_id'])
+    return scheduled_response(job, deduplicated)
+
+def plan_conflict(plan_id):
+    """Return the error response if a plan cannot be applied now, else None"""
+    plan = sync.plans.get(plan_id)
+    if not plan:
+        return jsonify({'error': 'Plan not found'}), 404
+    if plan['status'] in ('applied', 'stale'):
+        return jsonify({'error': f"Plan is {plan['status']}; run the preview again"}), 409
+    # Any plan not yet applied (including a half-applied one) must still match Sonarr and MAL;
+    # only the Sonarr feed and MAL list are fetched to check that
+    list_index = sync.get_user_list_index()
+    if list_index is None:
+        return jsonify({'error': 'Could not fetch your MAL list to check the plan; try again later'}), 503
+    stale = sync.plans.stale_reasons(plan, library_fingerprint(sync.get_sonarr_anime()),
+                                     unapplied_list_fingerprint(plan, list_index))
+    if stale:
+        sync.plans.update_status(plan_id, 'stale')
+        return jsonify({'error': 'Sonarr or your MAL list changed since the preview; '
+                                 'run the preview again', 'stale': stale}), 409
+    return None
+
+@app.route('/api/sync/resume/<session_id>', methods=['POST'])
+def api_sync_resume(session_id):
+    """Resume an interrupted sync job from its last committed item"""
+    job = sync.checkpoints.get_job(session_id)
+    if not job or job['source'] != 'web':
+        return jsonify({'error': 'Job not found'}), 404
+    if job['status'] == 'completed':
+        return jsonify({'error': 'Job already completed'}), 409
+    if (active_syncs.get(session_id) or {}).get('status') in ('starting', 'running'):
+        return jsonify({'error': 'Job is still running'}), 409
+    plan_id = job['options'].get('plan_id')
+    if plan_id:
+        # A resumed plan job goes through the same checks as applying the plan
+        conflict = plan_conflict(plan_id)
+        if conflict:
+            return conflict
+    
+    scheduled, deduplicated = scheduler.submit(job['options'], priority=request.args.get('priority', 0, type=int),
+                                               resume_session_id=session_id)
+    if plan_id and not deduplicated:
+        sync.plans.update_status(plan_id, 'applying', applied_by=scheduled['session_id'])
+    return scheduled_response(scheduled, deduplicated, resumed_from=job['cursor'])
+
+@app.route('/api/sync/cancel/<session_id>', methods=['POST'])
+def api_sync_cancel(session_id):
+    """Cancel a queued sync job (running jobs are not interrupted)"""
+    if not scheduler.cancel(session_id):
+        return jsonify({'error': 'Job is not queued'}), 409
+    return jsonify({'session_id': session_id, 'state': 'cancelled'})
+
+@app.route('/api/queue')
+def api_queue():
+    """Running and queued sync jobs, in the order they will start"""
+    return jsonify(scheduler.snapshot())
+
+@app.route('/api/webhook/sonarr', methods=['GET', 'POST'])
+def api_webhook_sonarr():
+    """Receive Sonarr Connect/Webhook events; GET reports event and batch counters
+    
+    SeriesAdd and Download events queue their series for a debounced
+    single-series sync; SeriesDelete forgets the series' sync state. With
+    sonarr.webhook_token set, requests must carry it as ?token= or as the
+    Basic auth password.
+    """
+    expected = sync.config.get('sonarr', {}).get('webhook_token')
+    if expected:
+        given = request.args.get('token') or (request.authorization.password
+                                              if request.authorization else '')
+        if not secrets.compare_digest(str(given or ''), str(expected)):
+            return jsonify({'error': 'Invalid webhook token'}), 401
+    if request.method == 'GET':
+        return jsonify(webhook_events.stats())
+    return jsonify(webhook_events.add(request.get_json(silent=True)))
+
+@app.route('/api/auto_sync')
+def api_auto_sync():
+    """Auto sync settings, next run time and the last run's duration and item counts"""
+    return jsonify(auto_sync.status())
+
+@app.route('/api/jobs')
+def api_jobs():
+    """List recent sync jobs with their checkpoint cursor"""
+    return jsonify(sync.checkpoints.list_jobs('web'))
 
 @app.route('/api/sync_status/<session_id>')
 def api_sync_status(session_id):
-    """Get current sync status"""
-    if session_id in active_syncs:
-        return jsonify(active_syncs[session_id])
-    else:
-        return jsonify({'error': 'Session not found'}), 404
+    """Get current sync status: live jobs from memory, finished ones from disk
+    
+    With ?since=<cursor> only results after that position are returned;
+    pass the returned `cursor` on the next poll.
+    """
+    since = max(0, request.args.get('since', 0, type=int))
+    status = active_syncs.status(session_id, since)
+    if status:
+        return jsonify(status)
+    
+    # Jobs from before a restart are served from their checkpoints
+    job = sync.checkpoints.get_job(session_id)
+    if job:
+        results = [item['result'] for item in sync.checkpoints.committed_items(session_id).values()
+                   if item['result']]
+        return jsonify({
+            'status': job['status'],
+            'current_item': job['cursor'],
+            'total_items': job['total'],
+            'results': results[since:],
+            'cursor': len(results),
+            'since': since
+        })
+    return jsonify({'error': 'Session not found'}), 404
+
+@app.route('/api/sessions')
+def api_sessions():
+    """Sync session store statistics: sessions and results held in memory and on disk"""
+    return jsonify(dict(active_syncs.stats(), progress_events=progress_events.stats()))
+
+@app.route('/api/match_cache', methods=['GET', 'DELETE'])
+def api_match_cache():
+    """Get match cache statistics, or clear the cache with DELETE"""
+    if request.method == 'DELETE':
+        removed = sync.match_cache.clear()
+        return jsonify({'cleared': removed, 'stats': sync.match_cache.stats()})
+    return jsonify(sync.match_cache.stats())
+
+@app.route('/api/retry_queue')
+def api_retry_queue():
+    """Failed items waiting for a retry, the dead-letter list and the last background drain"""
+    limit = request.args.get('limit', 100, type=int)
+    return jsonify({
+        'stats': sync.retry_queue.stats(),
+        'pending': sync.retry_queue.pending(limit),
+        'dead_letters': sync.retry_queue.dead_letters(limit),
+        'last_drain': retry_worker.last_drain
+    })
+
+@app.route('/api/retry_queue/dead_letters', methods=['POST', 'DELETE'])
+def api_dead_letters():
+    """Requeue dead letters with POST, or discard them with DELETE; ?item_key= limits it to one"""
+    item_key = request.args.get('item_key')
+    if request.method == 'DELETE':
+        return jsonify({'discarded': sync.retry_queue.discard(item_key)})
+    requeued = sync.retry_queue.requeue(item_key)
+    retry_worker.wake()
+    return jsonify({'requeued': requeued})
+
+@app.route('/api/catalog')
+def api_catalog():
+    """Local MAL catalog statistics"""
+    if not sync.catalog:
+        return jsonify({'error': 'No local catalog imported'}), 404
+    return jsonify(sync.catalog.stats())
+
+@app.route('/api/http_stats')
+def api_http_stats():
+    """Per-host request counts and connection reuse of the shared HTTP transport"""
+    return jsonify(transport.stats())
+
+@app.route('/api/rate_limit')
+def api_rate_limit():
+    """Current MAL request rate, throttling and AIMD adjustments of the shared limiter"""
+    return jsonify(sync.limiter.stats())
+
+@app.route('/api/response_cache', methods=['GET', 'DELETE'])
+def api_response_cache():
+    """Response cache size and hit ratio; DELETE empties it"""
+    if request.method == 'DELETE':
+        removed = sync.response_cache.clear()
+        return jsonify({'cleared': removed, 'stats': sync.response_cache.stats()})
+    return jsonify(sync.response_cache.stats())
+
+@app.route('/api/sync_profile/<session_id>')
+def api_sync_profile(session_id):
+    """Download a profiled job's Chrome trace (?format=trace, default) or cProfile dump (?format=pstats)"""
+    session = active_syncs.get(session_id)
+    if not session or not session.get('profile'):
+        return jsonify({'error': 'No profile for this session'}), 404
+    paths = job_profiler(session_id).paths
+    path = paths.get(request.args.get('format', 'trace'))
+    if path is None:
+        return jsonify({'error': "format must be 'trace' or 'pstats'"}), 400
+    if not os.path.exists(path):
+        return jsonify({'error': 'The profile has not been written yet'}), 404
+    return send_file(os.path.abspath(path), as_attachment=True)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Request, phase, rate-limit and throughput metrics in the Prometheus text format"""
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/sonarr_feed_stats')
+def api_sonarr_feed_stats():
+    """Size and peak memory of the last streamed Sonarr series feed"""
+    return jsonify(sync.last_feed_stats)
 
 @app.route('/api/test_connection')
 def api_test_connection():
@@ -583,7 +1366,7 @@ def api_test_connection():
     try:
         if sync.config.get('sonarr', {}).get('api_url'):
             headers = {'X-Api-Key': sync.config['sonarr']['api_key']}
-            response = requests.get(sync.config['sonarr']['api_url'], headers=headers, timeout=10)
+            response = transport.get(sync.config['sonarr']['api_url'], headers=headers, timeout=10)
             results['sonarr'] = response.status_code == 200
             results['messages']['sonarr'] = 'Connected' if results['sonarr'] else f'Error: {response.status_code}'
         else:
@@ -596,7 +1379,7 @@ def api_test_connection():
         token = sync.get_valid_token()
         if token:
             headers = {'Authorization': f'Bearer {token}'}
-            response = requests.get('https://api.myanimelist.net/v2/users/@me', headers=headers, timeout=10)
+            response = transport.get(f'{sync.mal_api_url}/users/@me', headers=headers, timeout=10)
             results['mal'] = response.status_code == 200
             results['messages']['mal'] = 'Authenticated' if results['mal'] else f'Error: {response.status_code}'
         else:
@@ -0,0 +1,452 @@
+"""
+asyncio sync engine.
+
+Runs the Sonarr fetch -> MAL search -> match -> list update flow on a single
+event loop with an aiohttp client instead of a thread per worker. In-flight
+requests are bounded by semaphores and every MAL request still waits on the
+shared token bucket, so hundreds of titles (and several users' jobs) can be
+in flight at once while staying within the configured rate.
+"""
+
+import asyncio
+import codecs
+import inspect
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+try:
+    import aiohttp
+except ImportError:  # Only needed for the async engine
+    aiohttp = None
+
+from http_client import DEFAULT_HTTP_SETTINGS
+from match_cache import series_key
+from metrics import default_metrics
+from profiling import trace_span, trace_title, trace_wait
+from rate_limit import THROTTLE_STATUSES, retry_after_seconds
+from retry_queue import failure_reason
+from single_flight import AsyncSingleFlight, search_key
+from sonarr_feed import CHUNK_SIZE, JsonArrayParser
+
+ENGINES = ('threads', 'async')
+DEFAULT_CONCURRENCY = 32
+RETRY_STATUSES = (500, 502, 504)
+SEARCH_FIELDS = "id,title,alternative_titles,start_date,media_type"
+
+
+def require_aiohttp():
+    """Raise a helpful error when the async engine is used without aiohttp installed."""
+    if aiohttp is None:
+        raise RuntimeError("The async engine needs aiohttp (pip install aiohttp)")
+
+
+class AsyncHttpError(Exception):
+    """A request answered with an HTTP error status."""
+
+    def __init__(self, status, url):
+        super().__init__(f"{status} error for url: {url}")
+        self.status = status
+        self.url = url
+
+
+def decode_json(body):
+    """Decode a JSON response body; an empty body is None."""
+    body = body.strip()
+    return json.loads(body) if body else None
+
+
+class AsyncHttpClient:
+    """aiohttp counterpart of HttpClient: one pooled session, timeouts, retries and per-host limiters.
+
+    The session is created on first use, inside the event loop that uses it.
+    """
+
+    def __init__(self, settings=None, concurrency=DEFAULT_CONCURRENCY, metrics=None):
+        require_aiohttp()
+        self.metrics = metrics if metrics is not None else default_metrics
+        self.settings = dict(DEFAULT_HTTP_SETTINGS)
+        self.settings.update(settings or {})
+        self.concurrency = max(1, int(concurrency))
+        self._session = None
+        self._semaphore = None
+        self._limiters = {}
+        self._auth = {}
+        self._caches = {}
+        self._stats = {}
+
+    def set_limiter(self, host, limiter):
+        """Make every request to host wait on limiter first."""
+        self._limiters[host] = limiter
+
+    def set_auth(self, host, tokens):
+        """Send requests to host that carry an Authorization header with tokens' current token."""
+        self._auth[host] = tokens
+
+    def set_cache(self, host, cache):
+        """Answer cacheable GETs to host from a ResponseCache, and tell it about list writes."""
+        self._caches[host] = cache
+
+    def _session_for(self, host):
+        if self._session is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency),
+                timeout=aiohttp.ClientTimeout(sock_connect=self.settings["connect_timeout"],
+                                              sock_read=self.settings["read_timeout"]),
+                headers={"Accept-Encoding": "gzip, deflate"}
+            )
+        return self._stats.setdefault(host, {"requests": 0, "errors": 0, "retries": 0,
+                                             "auth_retries": 0, "throttled": 0})
+
+    async def request(self, method, url, **kwargs):
+        """Send a request and return its decoded JSON body.
+
+        Connection errors and 5xx responses are retried with exponential
+        backoff, throttled ones (429/503) once the host's rate limiter allows
+        or after their Retry-After; other error statuses raise
+        AsyncHttpError. A 401 from a host with a token manager is retried
+        once with a refreshed token. With a response cache for the host, a
+        fresh cached response is returned without touching the network.
+        """
+        host = urlsplit(url).netloc
+        cache = self._caches.get(host)
+        key = cache.key_for(method, url, kwargs.get("params")) if cache is not None else None
+        # The cache is SQLite; its disk I/O runs on a worker thread so it does not stall the loop
+        if key is not None:
+            hit = await asyncio.to_thread(cache.get, key)
+            if hit is not None:
+                self.metrics.inc("response_cache_total", result="hit")
+                return decode_json(hit[1])
+            self.metrics.inc("response_cache_total", result="miss")
+        content_type, body = await self._authorized(host, method, url, **kwargs)
+        if key is not None:
+            await asyncio.to_thread(cache.put, key, url, content_type, body)
+        elif cache is not None and method.upper() != "GET":
+            await asyncio.to_thread(cache.written, method, url)
+        return decode_json(body)
+
+    async def _authorized(self, host, method, url, **kwargs):
+        """Send with the host's current token; returns (content type, body)."""
+        auth = self._auth.get(host)
+        headers = kwargs.get("headers") or {}
+        if auth is None or "Authorization" not in headers:
+            return await self._request(host, method, url, **kwargs)
+
+        # The token manager refreshes ahead of expiry, so its current token is used as is
+        token = auth.current()
+        if token:
+            kwargs["headers"] = headers = dict(headers, Authorization=f"Bearer {token}")
+        try:
+            return await self._request(host, method, url, **kwargs)
+        except AsyncHttpError as e:
+            if e.status != 401:
+                raise
+            # Concurrent 401s share one refresh; it runs off the loop
+            fresh = await asyncio.to_thread(auth.refresh, headers["Authorization"].split(" ", 1)[-1])
+            if not fresh:
+                raise
+            self._stats[host]["auth_retries"] += 1
+            kwargs["headers"] = dict(headers, Authorization=f"Bearer {fresh}")
+            return await self._request(host, method, url, **kwargs)
+
+    async def _request(self, host, method, url, **kwargs):
+        stats = self._session_for(host)
+        limiter = self._limiters.get(host)
+        retries = self.settings["retries"]
+        backoff = self.settings["backoff_factor"]
+        attempt = throttled = 0
+        delay = 0
+        while True:
+            if delay:
+                with trace_span('backoff_sleep', attempt=attempt + throttled):
+                    await asyncio.sleep(delay)
+                delay = 0
+            async with self._semaphore:
+                if limiter is not None:
+                    waited = await limiter.acquire_async()
+                    self.metrics.record_wait(waited, "limiter")
+                    trace_wait("rate_limit_wait", waited)
+                stats["requests"] += 1
+                start = time.perf_counter()
+                try:
+                    async with self._session.request(method, url, **kwargs) as response:
+                        self.metrics.record_request(method, url, response.status,
+                                                    time.perf_counter() - start)
+                        retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+                        if limiter is not None:
+                            limiter.record_response(response.status, retry_after)
+                        if response.status in THROTTLE_STATUSES and \
+                                throttled < self.settings["throttle_retries"]:
+                            throttled += 1
+                            stats["throttled"] += 1
+                            # A limiter applies a Retry-After pause on the next acquire; without one, back off here
+                            if limiter is None or not retry_after:
+                                delay = retry_after if retry_after is not None else backoff * (2 ** (throttled - 1))
+                                self.metrics.record_wait(delay, "retry_after")
+                            continue
+                        if response.status in RETRY_STATUSES and attempt < retries:
+                            attempt += 1
+                            stats["retries"] += 1
+                            delay = backoff * (2 ** (attempt - 1))
+                            continue
+                        if response.status >= 400:
+                            stats["errors"] += 1
+                            raise AsyncHttpError(response.status, url)
+                        return response.content_type, await response.read()
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    self.metrics.record_request(method, url, "error", time.perf_counter() - start)
+                    if attempt == retries:
+                        stats["errors"] += 1
+                        raise
+                    attempt += 1
+                    stats["retries"] += 1
+                    delay = backoff * (2 ** (attempt - 1))
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def put(self, url, **kwargs):
+        return await self.request("PUT", url, **kwargs)
+
+    async def stream_json_array(self, url, stats=None, **kwargs):
+        """Yield the elements of a JSON array response as they are parsed off the socket."""
+        host = urlsplit(url).netloc
+        host_stats = self._session_for(host)
+        host_stats["requests"] += 1
+        start = time.perf_counter()
+        async with self._session.get(url, **kwargs) as response:
+            # Timed to the response headers, like a streamed requests call
+            self.metrics.record_request("GET", url, response.status, time.perf_counter() - start)
+            if response.status >= 400:
+                host_stats["errors"] += 1
+                raise AsyncHttpError(response.status, url)
+            decoder = codecs.getincrementaldecoder(response.charset or 'utf-8')()
+            parser = JsonArrayParser(stats)
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                if stats:
+                    stats.bytes_read += len(chunk)
+                for value in parser.feed(decoder.decode(chunk)):
+                    yield value
+                if parser.done:
+                    return
+            for value in parser.close():
+                yield value
+
+    def stats(self):
+        """Return per-host request, retry and error counts."""
+        return {host: dict(counters) for host, counters in self._stats.items()}
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class SeriesMatcher:
+    """The local half of matching a Sonarr series: the match cache, then the offline catalog.
+
+    Only when neither gives a match of at least `min_score` does the engine
+    run the live MAL search, with the queries from `queries()`.
+    """
+
+    def __init__(self, scorer, match_cache, catalog=None, min_score=75, refresh=False,
+                 clean_query=True):
+        self.scorer = scorer
+        self.match_cache = match_cache
+        self.catalog = catalog
+        self.min_score = min_score
+        self.refresh = refresh
+        self.clean_query = clean_query
+
+    def local(self, anime):
+        """Return (best, score, settled); settled means no live search is needed."""
+        title = anime['title']
+        cached = self.match_cache.get(series_key(anime, title), title, refresh=self.refresh,
+                                      min_score=self.min_score)
+        if cached:
+            best = {'id': cached['mal_id'], 'title': cached['mal_title'],
+                    'start_date': cached['start_date']}
+            return best, cached['score'], True
+
+        best, score = None, 0
+        if self.catalog:
+            with trace_span('catalog_search'):
+                candidates = self.catalog.search(self.scorer.normalize(title))
+            best, score = self.scorer.best_match(title, candidates)
+            if best and score >= self.min_score:
+                self.catalog.record_resolved()
+                self.remember(anime, best, score)
+                return best, score, True
+        return best, score, False
+
+    def queries(self, title):
+        """Live-search queries to try in order until one returns results."""
+        if self.clean_query:
+            return [self.scorer.normalize(title), title]
+        return [title]
+
+    def settle(self, anime, best, score, results):
+        """Pick the better of the local and live-search matches and cache it."""
+        api_match, api_score = self.scorer.best_match(anime['title'], results)
+        if api_score > score:
+            best, score = api_match, api_score
+        if best:
+            self.remember(anime, best, score)
+        return best, score
+
+    def remember(self, anime, best, score):
+        self.match_cache.put(series_key(anime, anime['title']), anime['title'], best['id'],
+                             best['title'], best.get('start_date'), score)
+
+
+class AsyncSyncEngine:
+    """The Sonarr fetch -> MAL search -> match -> list update flow as coroutines.
+
+    An engine serves one run: identical live-search queries of its series
+    share one MAL request through `searches`.
+    """
+
+    def __init__(self, client, mal_api_url, access_token, matcher, concurrency=DEFAULT_CONCURRENCY):
+        self.client = client
+        self.mal_api_url = mal_api_url
+        self.headers = {"Authorization": f"Bearer {access_token}"}
+        self.matcher = matcher
+        self.concurrency = max(1, int(concurrency))
+        self.searches = AsyncSingleFlight(client.metrics)
+
+    async def fetch_series(self, url, api_key, keep, stats=None):
+        """Stream Sonarr's series feed and return keep(series) for every series it accepts."""
+        kept = []
+        with self.client.metrics.phase('fetch'), trace_span('fetch_sonarr'):
+            async for series in self.client.stream_json_array(url, stats, headers={"X-Api-Key": api_key}):
+                record = keep(series)
+                if record is not None:
+                    kept.append(record)
+                    if stats:
+                        stats.series_kept += 1
+        return kept
+
+    async def search(self, query, limit=10):
+        data = await self.client.get(f"{self.mal_api_url}/anime", headers=self.headers,
+                                     params={"q": query, "limit": limit, "fields": SEARCH_FIELDS})
+        return data.get('data', [])
+
+    async def list_index(self):
+        """Return {anime_id: list_status} for the user's whole MAL list, page by page."""
+        index = {}
+        url = f"{self.mal_api_url}/users/@me/animelist"
+        params = {"fields": "list_status", "limit": 1000, "nsfw": "true"}
+        with self.client.metrics.phase('fetch'), trace_span('fetch_mal_list'):
+            while url:
+                page = await self.client.get(url, headers=self.headers, params=params)
+                for entry in page.get('data', []):
+                    index[entry['node']['id']] = entry.get('list_status') or {}
+                url = page.get('paging', {}).get('next')
+                params = None
+        return index
+
+    async def list_status(self, anime_id):
+        try:
+            with trace_span('status_check'):
+                data = await self.client.get(f"{self.mal_api_url}/anime/{anime_id}",
+                                             headers=self.headers, params={"fields": "my_list_status"})
+            return data.get('my_list_status')
+        except Exception:
+            return None
+
+    async def update_status(self, anime_id, status):
+        """Add or update an anime in the user's list; returns (success, response or the exception)."""
+        try:
+            with self.client.metrics.phase('write'), trace_span('update', status=status):
+                data = await self.client.put(f"{self.mal_api_url}/anime/{anime_id}/my_list_status",
+                                             headers=self.headers, data={"status": status})
+            return True, data
+        except Exception as e:
+            return False, e
+
+    async def resolve(self, anime):
+        """Return (best, score) for a Sonarr series: cache, catalog, then the live search.
+
+        A live search that fails in a way worth retrying later raises.
+        """
+        # The match cache and catalog are SQLite, so the matcher runs on a worker thread
+        best, score, settled = await asyncio.to_thread(self.matcher.local, anime)
+        if settled:
+            return best, score
+        async def search(query, span):
+            with trace_span(span, query=query):
+                return await self.search(query)
+
+        try:
+            results = []
+            for attempt, query in enumerate(self.matcher.queries(anime['title'])):
+                span = 'fallback_search' if attempt else 'search'
+                results = await self.searches.do(search_key(query), lambda: search(query, span))
+                if results:
+                    break
+            return await asyncio.to_thread(self.matcher.settle, anime, best, score, results)
+        except Exception as e:
+            if failure_reason(e):
+                raise
+            print(f"Error searching MAL for '{anime['title']}': {e}")
+            return best, score
+
+    async def run(self, anime_list, plan, finish, list_index=None, lookup_status=True):
+        """Process every series with at most `concurrency` in flight.
+
+        plan(anime, best, score, current_status) returns (item, mal_status);
+        when mal_status is set the series is added to the list with it.
+        current_status comes from list_index, else from a lookup per title
+        (skipped when lookup_status is false).
+        finish(anime, item, update) is called as each series completes, with
+        update None or (mal_status, success, detail); its return values are
+        returned in input order. When the search itself failed, finish gets
+        item None and update (None, False, error). A coroutine finish is
+        awaited, so it can hand blocking writes to a thread.
+        """
+        limit = asyncio.Semaphore(self.concurrency)
+
+        async def process(anime):
+            async with limit:
+                # Each series runs as its own task, so its spans land on its own trace lane
+                with trace_title(anime['title']):
+                    try:
+                        best, score = await self.resolve(anime)
+                    except Exception as e:
+                        return await _finished(finish(anime, None, (None, False, e)))
+                    current_status = None
+                    if best and list_index is not None:
+                        current_status = list_index.get(best['id'])
+                    elif best and lookup_status:
+                        current_status = await self.list_status(best['id'])
+                    item, mal_status = plan(anime, best, score, current_status)
+                    update = None
+                    if mal_status:
+                        update = (mal_status,) + await self.update_status(best['id'], mal_status)
+                return await _finished(finish(anime, item, update))
+
+        return await asyncio.gather(*(process(anime) for anime in anime_list))
+
+
+async def _finished(result):
+    """Await a coroutine finish callback's result; plain results pass through."""
+    return await result if inspect.isawaitable(result) else result
+
+
+class LoopThread:
+    """A background event loop that async sync jobs from any thread are submitted to."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+
+    def submit(self, coroutine):
+        """Schedule coroutine on the loop, starting it on first use; returns a Future."""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+                thread.start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
@@ -0,0 +1,151 @@
+"""
+Periodic incremental syncs.
+
+AutoSync runs a sync every `interval_hours`, plus a random delay of up to
+`jitter_minutes` so instances started together don't hit MAL at the same
+moment. The next run time and a report of the last run are persisted, so a
+restart keeps the schedule instead of syncing straight away. A run that
+finds another sync in progress is postponed rather than overlapping it.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+
+AUTO_SYNC_FILE = "auto_sync.json"
+DEFAULT_SYNC_INTERVAL_HOURS = 24
+DEFAULT_JITTER_MINUTES = 15
+# How long a run that found another sync in progress waits before trying again
+BUSY_RETRY_SECONDS = 300
+
+
+class AutoSync:
+    """Runs `run()` on an interval with jitter, skipping while `is_busy()` is true.
+
+    `run()` performs one sync and returns a dict of item counts for the
+    report; an exception marks the run as failed. The schedule is driven by
+    start() (background thread, web app) or serve_forever() (CLI daemon).
+    """
+
+    def __init__(self, run, interval_hours=DEFAULT_SYNC_INTERVAL_HOURS, enabled=True,
+                 jitter_minutes=DEFAULT_JITTER_MINUTES, path=AUTO_SYNC_FILE, is_busy=None):
+        self._run = run
+        self._is_busy = is_busy
+        self.path = path
+        self.enabled = bool(enabled)
+        self.interval = max(0.1, float(interval_hours)) * 3600
+        self.jitter = max(0, float(jitter_minutes)) * 60
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+        self.running = False
+        self.state = {'next_run_at': None, 'last_run': None, 'runs': 0, 'postponed': 0}
+        self.state.update(self._load())
+        if self.enabled and self.state['next_run_at'] is None:
+            self._schedule(time.time())
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not read {self.path}, starting a new schedule: {e}")
+            return {}
+
+    def _save(self):
+        # Written to a temporary file first so a crash never leaves a truncated schedule
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(temp_path, self.path)
+
+    def _schedule(self, start, delay=None):
+        """Set the next run `delay` seconds after start (default: the interval plus jitter)."""
+        if delay is None:
+            delay = self.interval + random.uniform(0, self.jitter)
+        self.state['next_run_at'] = start + delay
+        self._save()
+
+    def configure(self, enabled=None, interval_hours=None, jitter_minutes=None):
+        """Apply new settings; a shorter interval pulls the next run forward."""
+        with self._lock:
+            if jitter_minutes is not None:
+                self.jitter = max(0, float(jitter_minutes)) * 60
+            if interval_hours is not None:
+                self.interval = max(0.1, float(interval_hours)) * 3600
+            if enabled is not None:
+                self.enabled = bool(enabled)
+            next_run = self.state['next_run_at']
+            if self.enabled and (next_run is None or next_run > time.time() + self.interval + self.jitter):
+                self._schedule(time.time())
+        self._wake.set()
+
+    def run_due(self):
+        """Run the sync if it is due and nothing else is syncing. Returns True if it ran."""
+        with self._lock:
+            next_run = self.state['next_run_at']
+            if not self.enabled or self.running or next_run is None or next_run > time.time():
+                return False
+            if self._is_busy and self._is_busy():
+                print("⏸️  Auto sync postponed: another sync is in progress")
+                self.state['postponed'] += 1
+                self._schedule(time.time(), BUSY_RETRY_SECONDS)
+                return False
+            self.running = True
+
+        started = time.time()
+        report = {'started_at': started, 'status': 'completed', 'counts': None, 'error': None}
+        try:
+            report['counts'] = self._run()
+        except Exception as e:
+            print(f"❌ Auto sync failed: {e}")
+            report.update(status='error', error=str(e))
+        finished = time.time()
+        report.update(finished_at=finished, duration_seconds=round(finished - started, 1))
+
+        with self._lock:
+            self.running = False
+            self.state['last_run'] = report
+            self.state['runs'] += 1
+            self._schedule(finished)
+        print(f"⏰ Next auto sync at {time.strftime('%Y-%m-%d %H:%M', time.localtime(self.state['next_run_at']))}")
+        return True
+
+    def _seconds_until_due(self):
+        with self._lock:
+            if not self.enabled or self.state['next_run_at'] is None:
+                return None
+            return max(0.0, self.state['next_run_at'] - time.time())
+
+    def serve_forever(self):
+        """Run syncs as they fall due until stop() is called."""
+        while not self._stopped:
+            self.run_due()
+            self._wake.wait(self._seconds_until_due())
+            self._wake.clear()
+
+    def start(self):
+        """Serve the schedule on a daemon thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+
+    def status(self):
+        """Return the settings, next run time and the report of the last run."""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'interval_hours': self.interval / 3600,
+                'jitter_minutes': self.jitter / 60,
+                'running': self.running,
+                **self.state
+            }
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: per-title fuzzy scoring time, per-pair loop vs batched scorer.
+
+Usage:
+    python benchmarks/bench_scoring.py [--titles 500] [--results 10] [--repeat 3]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from fuzzywuzzy import fuzz as legacy_fuzz
+except ImportError:
+    from rapidfuzz import fuzz as legacy_fuzz
+
+from title_matching import TitleScorer, CLI_WEIGHTS
+from title_normalizer import clean_title
+
+WORDS = [
+    "shingeki", "kyojin", "attack", "titan", "fullmetal", "alchemist", "brotherhood",
+    "sword", "art", "online", "boku", "hero", "academia", "kimetsu", "yaiba", "demon",
+    "slayer", "jujutsu", "kaisen", "spy", "family", "chainsaw", "man", "frieren",
+    "sousou", "no", "one", "piece", "naruto", "shippuden", "bleach", "gintama"
+]
+SUFFIXES = ["", " Season 2", " (2019)", " Part 2", " 2nd Season", " [TV]", " Cour 2", " S3"]
+
+
+def random_title(rng):
+    words = rng.sample(WORDS, rng.randint(2, 5))
+    return " ".join(w.capitalize() for w in words) + rng.choice(SUFFIXES)
+
+
+def make_results(rng, count):
+    results = []
+    for anime_id in range(count):
+        results.append({'node': {
+            'id': anime_id,
+            'title': random_title(rng),
+            'alternative_titles': {
+                'en': random_title(rng),
+                'ja': "",
+                'synonyms': [random_title(rng) for _ in range(rng.randint(0, 3))]
+            }
+        }})
+    return results
+
+
+def legacy_best_match(title, results):
+    """The original per-pair loop: re-cleans and re-lowercases every pair."""
+    cleaned_title = clean_title.__wrapped__(title)
+    best_match, best_score = None, 0
+    for result in results:
+        anime = result['node']
+        titles_to_check = [anime['title']]
+        alt_titles = anime.get('alternative_titles', {})
+        if alt_titles.get('en'):
+            titles_to_check.append(alt_titles['en'])
+        if alt_titles.get('ja'):
+            titles_to_check.append(alt_titles['ja'])
+        if alt_titles.get('synonyms'):
+            titles_to_check.extend(alt_titles['synonyms'])
+        for check_title in titles_to_check:
+            cleaned_check_title = clean_title.__wrapped__(check_title)
+            ratio_score = legacy_fuzz.ratio(cleaned_title.lower(), cleaned_check_title.lower())
+            partial_score = legacy_fuzz.partial_ratio(cleaned_title.lower(), cleaned_check_title.lower())
+            token_score = legacy_fuzz.token_sort_ratio(cleaned_title.lower(), cleaned_check_title.lower())
+            combined_score = (ratio_score * 0.3 + partial_score * 0.3 + token_score * 0.4)
+            if combined_score > best_score:
+                best_score = combined_score
+                best_match = anime
+    return best_match, best_score
+
+
+def run(label, fn, workload, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for title, results in workload:
+            fn(title, results)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    per_title_us = best / len(workload) * 1e6
+    print(f"{label:<28} {best * 1000:9.1f} ms total  {per_title_us:9.1f} us/title")
+    return per_title_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-title fuzzy scoring")
+    parser.add_argument("--titles", type=int, default=500, help="Sonarr titles to score")
+    parser.add_argument("--results", type=int, default=10, help="MAL results per search")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per variant (best is reported)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # MAL results repeat across runs (preview, dry run, sync), so reuse a pool of them
+    pool = [make_results(rng, args.results) for _ in range(50)]
+    workload = [(random_title(rng), rng.choice(pool)) for _ in range(args.titles)]
+
+    print(f"Scoring {args.titles} titles against {args.results} MAL results each")
+    before = run("per-pair loop (before)", legacy_best_match, workload, args.repeat)
+    scorer = TitleScorer(clean_title, CLI_WEIGHTS)
+    cold = run("batched, cold cache", scorer.best_match, workload, 1)
+    warm = run("batched, warm cache", scorer.best_match, workload, args.repeat)
+    print(f"Speed-up: {before / cold:.1f}x cold, {before / warm:.1f}x warm")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark: full CLI and web syncs against local stand-in servers.
+
+Starts the Sonarr/MAL stand-ins from mock_servers.py, runs each sync in a
+child process (its own working directory, config and databases) and reports
+throughput, per-title latency percentiles, MAL calls per title and peak RSS.
+A second run (--runs 2) shows the warm path, with the match cache filled.
+
+Usage:
+    python benchmarks/bench_sync.py [--sizes 100,1000] [--targets cli,web]
+                                    [--latency-ms 20] [--rate-429 0.0]
+                                    [--workers 4] [--rate 1000] [--runs 2]
+                                    [--engine async --concurrency 64]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from mock_servers import MockServers
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[index]
+
+
+def write_workdir(workdir, target, servers, args):
+    """Write config.json and a valid mal_token.json for one child."""
+    config = {
+        "sonarr": {"api_url": servers.sonarr_url, "api_key": "bench"},
+        "mal": {
+            "client_id": "bench",
+            "client_secret": "bench",
+            "redirect_uri": "http://localhost:8765/callback",
+            "api_base_url": servers.mal_api_url,
+            "auth_base_url": servers.mal_auth_url
+        },
+        "sync": {
+            "default_status": "completed",
+            "minimum_match_score": 75,
+            "workers": args.workers,
+            "requests_per_second": args.rate,
+            "burst": args.burst,
+            "concurrency": args.concurrency
+        }
+    }
+    with open(os.path.join(workdir, "config.json"), "w") as f:
+        json.dump(config, f, indent=4)
+
+    # The CLI stores an ISO timestamp, the web app a UNIX time
+    if target == "cli":
+        expires_at = (datetime.now() + timedelta(days=30)).isoformat()
+    else:
+        expires_at = time.time() + 30 * 86400
+    with open(os.path.join(workdir, "mal_token.json"), "w") as f:
+        json.dump({"access_token": "bench-access", "refresh_token": "bench-refresh",
+                   "expires_in": 2678400, "expires_at": expires_at}, f)
+
+
+def time_async_engine():
+    """Time every title on the async engine; returns a callable producing the latencies."""
+    from async_engine import AsyncSyncEngine
+
+    resolve_times = []
+    update_times = {}
+    resolve = AsyncSyncEngine.resolve
+    update_status = AsyncSyncEngine.update_status
+
+    async def timed_resolve(self, anime):
+        start = time.perf_counter()
+        match = await resolve(self, anime)
+        resolve_times.append((match[0]['id'] if match[0] else None, time.perf_counter() - start))
+        return match
+
+    async def timed_update(self, anime_id, *a, **kw):
+        start = time.perf_counter()
+        try:
+            return await update_status(self, anime_id, *a, **kw)
+        finally:
+            update_times[anime_id] = time.perf_counter() - start
+
+    AsyncSyncEngine.resolve = timed_resolve
+    AsyncSyncEngine.update_status = timed_update
+    return lambda: [seconds + update_times.get(mal_id, 0.0) for mal_id, seconds in resolve_times]
+
+
+def run_cli_child(workers, engine):
+    """Run sync_mal_sonarr.main() non-interactively, timing every title."""
+    import sync_mal_sonarr as cli
+
+    if engine == "async":
+        latencies = time_async_engine()
+        sys.argv = ["sync_mal_sonarr.py", "--non-interactive", "--engine", "async"]
+        start = time.perf_counter()
+        cli.main()
+        return time.perf_counter() - start, latencies()
+
+    resolve_times = []
+    update_times = {}
+    resolve_anime = cli.resolve_anime
+    update_mal_list = cli.update_mal_list
+
+    def timed_resolve(anime, *a, **kw):
+        start = time.perf_counter()
+        match = resolve_anime(anime, *a, **kw)
+        resolve_times.append((match[0], time.perf_counter() - start))
+        return match
+
+    def timed_update(anime_id, *a, **kw):
+        start = time.perf_counter()
+        try:
+            return update_mal_list(anime_id, *a, **kw)
+        finally:
+            update_times[anime_id] = time.perf_counter() - start
+
+    cli.resolve_anime = timed_resolve
+    cli.update_mal_list = timed_update
+    sys.argv = ["sync_mal_sonarr.py", "--non-interactive", "--workers", str(workers)]
+
+    start = time.perf_counter()
+    cli.main()
+    elapsed = time.perf_counter() - start
+    # A title's latency is its lookup plus its list update, if it needed one
+    latencies = [seconds + update_times.get(mal_id, 0.0) for mal_id, seconds in resolve_times]
+    return elapsed, latencies
+
+
+def run_web_child(workers, engine):
+    """POST /api/sync through the Flask test client and wait for the job to finish."""
+    import app as web
+
+    latencies = []
+    async_latencies = time_async_engine() if engine == "async" else None
+    process_anime = web.process_anime
+
+    def timed_process(*a, **kw):
+        start = time.perf_counter()
+        try:
+            return process_anime(*a, **kw)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    web.process_anime = timed_process
+    client = web.app.test_client()
+
+    start = time.perf_counter()
+    session_id = client.post("/api/sync", json={"workers": workers, "engine": engine}).get_json()["session_id"]
+    while True:
+        status = client.get(f"/api/sync_status/{session_id}").get_json()["status"]
+        if status in ("completed", "error"):
+            break
+        time.sleep(0.02)
+    elapsed = time.perf_counter() - start
+    if status == "error":
+        raise RuntimeError("web sync job failed")
+    return elapsed, async_latencies() if async_latencies else latencies
+
+
+def child_main(args):
+    os.chdir(args.workdir)
+    sys.path.insert(0, REPO_DIR)
+    from sonarr_feed import peak_rss_mb
+
+    runner = run_cli_child if args.child == "cli" else run_web_child
+    # The sync's own progress output is not part of the measurement
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        elapsed, latencies = runner(args.workers, args.engine)
+
+    with open(args.result, "w") as f:
+        json.dump({"elapsed": elapsed, "latencies": latencies, "peak_rss_mb": peak_rss_mb()}, f)
+
+
+def run_target(target, servers, workdir, args):
+    servers.state.reset_counters()
+    result_path = os.path.join(workdir, "bench_result.json")
+    command = [sys.executable, os.path.abspath(__file__), "--child", target,
+               "--workdir", workdir, "--result", result_path, "--workers", str(args.workers),
+               "--engine", args.engine]
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+    subprocess.run(command, check=True, env=env)
+    with open(result_path) as f:
+        result = json.load(f)
+
+    calls = servers.state.calls
+    titles = len(result["latencies"]) or 1
+    mal_calls = sum(count for endpoint, count in calls.items() if endpoint.startswith("mal/"))
+    return {
+        "seconds": result["elapsed"],
+        "titles": len(result["latencies"]),
+        "titles_per_second": len(result["latencies"]) / result["elapsed"] if result["elapsed"] else 0.0,
+        "p50_ms": percentile(result["latencies"], 50) * 1000,
+        "p90_ms": percentile(result["latencies"], 90) * 1000,
+        "p99_ms": percentile(result["latencies"], 99) * 1000,
+        "mal_calls_per_title": mal_calls / titles,
+        "throttled": sum(servers.state.throttled.values()),
+        "peak_rss_mb": result["peak_rss_mb"],
+        "calls": dict(calls)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="100", help="Comma-separated library sizes (e.g. 100,1000,10000)")
+    parser.add_argument("--targets", default="cli,web", help="Comma-separated targets: cli, web")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Added latency per mock request")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of MAL requests answered with 429")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--engine", choices=["threads", "async"], default="threads")
+    parser.add_argument("--concurrency", type=int, default=32, help="In-flight series with --engine async")
+    parser.add_argument("--rate", type=float, default=1000.0, help="MAL requests per second allowed")
+    parser.add_argument("--burst", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=1, help="Runs per target; later runs are warm")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--child", choices=["cli", "web"], help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child_main(args)
+        return
+
+    rows = []
+    for size in [int(s) for s in args.sizes.split(",")]:
+        for target in args.targets.split(","):
+            servers = MockServers(size, latency_ms=args.latency_ms, rate_429=args.rate_429)
+            workdir = tempfile.mkdtemp(prefix=f"bench_sync_{target}_")
+            try:
+                write_workdir(workdir, target, servers, args)
+                for run in range(1, args.runs + 1):
+                    row = run_target(target, servers, workdir, args)
+                    row.update(target=target, size=size, run=run)
+                    rows.append(row)
+            finally:
+                servers.shutdown()
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    workers = f"concurrency {args.concurrency}" if args.engine == "async" else f"{args.workers} workers"
+    print(f"{args.engine} engine, latency {args.latency_ms:g} ms/request, 429 rate {args.rate_429:g}, "
+          f"{workers}, {args.rate:g} req/s")
+    print(f"{'target':<6} {'size':>6} {'run':>3} {'seconds':>8} {'titles/s':>9} "
+          f"{'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'MAL/title':>9} {'429s':>5} {'RSS MB':>7}")
+    for row in rows:
+        print(f"{row['target']:<6} {row['size']:>6} {row['run']:>3} {row['seconds']:>8.2f} "
+              f"{row['titles_per_second']:>9.1f} {row['p50_ms']:>8.1f} {row['p90_ms']:>8.1f} "
+              f"{row['p99_ms']:>8.1f} {row['mal_calls_per_title']:>9.2f} {row['throttled']:>5} "
+              f"{row['peak_rss_mb'] or 0:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Local stand-in Sonarr and MyAnimeList servers for benchmarks.
+
+Implements the endpoints the sync uses with a synthetic library, optional
+per-request latency and random 429 injection, and counts every call.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+WORDS = [
+    "shingeki", "kyojin", "fullmetal", "alchemist", "sword", "online", "boku", "hero",
+    "kimetsu", "yaiba", "jujutsu", "kaisen", "spy", "family", "chainsaw", "frieren",
+    "sousou", "piece", "naruto", "bleach", "gintama", "haikyuu", "mushoku", "tensei",
+    "overlord", "konosuba", "steins", "gate", "monogatari", "evangelion", "bebop", "trigun"
+]
+SUFFIXES = ["", "", "", " Season 2", " (2019)", " Part 2", " 2nd Season"]
+
+
+def synthetic_title(index):
+    """Return a unique, word-based title for index."""
+    words = []
+    value = index
+    for _ in range(3):
+        words.append(WORDS[value % len(WORDS)])
+        value //= len(WORDS)
+    words.append(WORDS[(index * 7 + 3) % len(WORDS)])
+    if value:
+        words.append(WORDS[value % len(WORDS)])
+    return " ".join(w.capitalize() for w in words)
+
+
+def normalize_query(query):
+    query = query.lower()
+    query = re.sub(r'\(\d{4}\)|\b(season|part|cour)\s+\d+|\b\d+(st|nd|rd|th)\s+season', '', query)
+    return re.sub(r'\s+', ' ', query).strip()
+
+
+class MockLibrary:
+    """Synthetic Sonarr library, MAL catalog and MAL user list of `size` series."""
+
+    def __init__(self, size, seed=42, in_list_ratio=0.3):
+        rng = random.Random(seed)
+        self.series = []
+        self.catalog = {}
+        self.by_title = {}
+        self.user_list = {}
+        for i in range(size):
+            base = synthetic_title(i)
+            mal_id = 1000 + i
+            self.catalog[mal_id] = {
+                'id': mal_id,
+                'title': base,
+                'alternative_titles': {'en': base, 'ja': '', 'synonyms': []},
+                'start_date': f"{2000 + i % 24}-04-01",
+                'media_type': 'tv'
+            }
+            self.by_title[normalize_query(base)] = mal_id
+            self.series.append({
+                'id': i + 1,
+                'tvdbId': 50000 + i,
+                'title': base + rng.choice(SUFFIXES),
+                'year': 2000 + i % 24,
+                'status': rng.choice(['continuing', 'ended']),
+                'seriesType': 'anime',
+                'path': f"/tv/anime/{base}",
+                'tags': [1],
+                # Bulk that real Sonarr responses carry and the sync ignores
+                'overview': "Lorem ipsum dolor sit amet. " * 12,
+                'images': [{'coverType': t, 'url': f"/MediaCover/{i}/{t}.jpg"}
+                           for t in ('poster', 'banner', 'fanart')],
+                'seasons': [{'seasonNumber': n, 'monitored': True,
+                             'statistics': {'episodeCount': 12, 'sizeOnDisk': 1 << 30}}
+                            for n in range(1, 4)]
+            })
+            if rng.random() < in_list_ratio:
+                self.user_list[mal_id] = {'status': 'completed', 'score': 0}
+
+    def search(self, query, limit):
+        """Return the matching anime (if any) followed by decoys, like MAL's search."""
+        ids = []
+        match = self.by_title.get(normalize_query(query))
+        if match:
+            ids.append(match)
+        decoy = (match or hash(query)) % max(1, len(self.catalog))
+        while len(ids) < min(limit, len(self.catalog)):
+            candidate = 1000 + (decoy + len(ids) * 13) % len(self.catalog)
+            if candidate not in ids:
+                ids.append(candidate)
+            else:
+                decoy += 1
+        return [{'node': self.catalog[i]} for i in ids]
+
+
+class MockState:
+    """Shared behaviour switches and call counters for both servers."""
+
+    def __init__(self, library, latency_ms=0, rate_429=0.0, seed=42):
+        self.library = library
+        self.latency = latency_ms / 1000.0
+        self.rate_429 = rate_429
+        self.calls = Counter()
+        self.throttled = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def count(self, endpoint):
+        with self._lock:
+            self.calls[endpoint] += 1
+            # Only MAL rate-limits; Sonarr is a local service
+            throttle = (endpoint.startswith('mal/') and self.rate_429
+                        and self._rng.random() < self.rate_429)
+            if throttle:
+                self.throttled[endpoint] += 1
+        return throttle
+
+    def reset_counters(self):
+        with self._lock:
+            self.calls.clear()
+            self.throttled.clear()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real services
+    disable_nagle_algorithm = True  # Headers and body are separate writes
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return parse_qs(self.rfile.read(length).decode('utf-8')) if length else {}
+
+    def _handle(self, method):
+        parts = urlsplit(self.path)
+        endpoint = self.route(method, parts.path)
+        if endpoint is None:
+            self._send_json({'error': 'not_found'}, 404)
+            return
+        throttled = self.state.count(endpoint)
+        if self.state.latency:
+            time.sleep(self.state.latency)
+        if throttled:
+            self._send_json({'error': 'too_many_requests'}, 429, {'Retry-After': '1'})
+            return
+        getattr(self, 'serve_' + endpoint.replace(' ', '_').replace('/', '_'))(
+            parts.path, parse_qs(parts.query)
+        )
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_POST(self):
+        self._handle('POST')
+
+
+class SonarrHandler(_Handler):
+    def route(self, method, path):
+        if method == 'GET' and path == '/api/v3/series':
+            return 'sonarr/series'
+        if method == 'GET' and path == '/api/v3/tag':
+            return 'sonarr/tag'
+        if method == 'GET' and re.fullmatch(r'/api/v3/series/\d+', path):
+            return 'sonarr/series_detail'
+        return None
+
+    def serve_sonarr_series(self, path, query):
+        self._send_json(self.state.library.series)
+
+    def serve_sonarr_series_detail(self, path, query):
+        series_id = int(path.rsplit('/', 1)[1])
+        for series in self.state.library.series:
+            if series['id'] == series_id:
+                self._send_json(series)
+                return
+        self._send_json({'message': 'NotFound'}, 404)
+
+    def serve_sonarr_tag(self, path, query):
+        self._send_json([{'id': 1, 'label': 'anime'}])
+
+
+class MALHandler(_Handler):
+    def route(self, method, path):
+        if method == 'POST' and path == '/v1/oauth2/token':
+            return 'mal/token'
+        if method == 'GET' and path == '/v2/anime':
+            return 'mal/search'
+        if method == 'GET' and path == '/v2/users/@me/animelist':
+            return 'mal/animelist'
+        if method == 'GET' and path == '/v2/users/@me':
+            return 'mal/me'
+        if re.fullmatch(r'/v2/anime/\d+', path) and method == 'GET':
+            return 'mal/detail'
+        if re.fullmatch(r'/v2/anime/\d+/my_list_status', path) and method == 'PUT':
+            return 'mal/update'
+        return None
+
+    def serve_mal_token(self, path, query):
+        self._read_body()
+        self._send_json({'token_type': 'Bearer', 'expires_in': 2678400,
+                         'access_token': 'bench-access', 'refresh_token': 'bench-refresh'})
+
+    def serve_mal_search(self, path, query):
+        q = query.get('q', [''])[0]
+        limit = int(query.get('limit', ['10'])[0])
+        self._send_json({'data': self.state.library.search(q, limit), 'paging': {}})
+
+    def serve_mal_animelist(self, path, query):
+        limit = int(query.get('limit', ['100'])[0])
+        offset = int(query.get('offset', ['0'])[0])
+        entries = sorted(self.state.library.user_list.items())
+        page = entries[offset:offset + limit]
+        paging = {}
+        if offset + limit < len(entries):
+            host = self.headers.get('Host')
+            paging['next'] = (f"http://{host}/v2/users/@me/animelist?"
+                              f"fields=list_status&limit={limit}&offset={offset + limit}")
+        self._send_json({
+            'data': [{'node': {'id': i, 'title': self.state.library.catalog[i]['title']},
+                      'list_status': status} for i, status in page],
+            'paging': paging
+        })
+
+    def serve_mal_me(self, path, query):
+        self._send_json({'id': 1, 'name': 'bench'})
+
+    def serve_mal_detail(self, path, query):
+        anime_id = int(path.rsplit('/', 1)[1])
+        node = dict(self.state.library.catalog.get(anime_id, {'id': anime_id, 'title': ''}))
+        status = self.state.library.user_list.get(anime_id)
+        if status:
+            node['my_list_status'] = status
+        self._send_json(node)
+
+    def serve_mal_update(self, path, query):
+        anime_id = int(path.split('/')[3])
+        fields = self._read_body()
+        status = {'status': fields.get('status', ['completed'])[0], 'score': 0}
+        self.state.library.user_list[anime_id] = status
+        self._send_json(status)
+
+
+class MockServers:
+    """Runs the Sonarr and MAL stand-ins on free localhost ports."""
+
+    def __init__(self, size, latency_ms=0, rate_429=0.0, seed=42):
+        self.state = MockState(MockLibrary(size, seed), latency_ms, rate_429, seed)
+        self._servers = []
+        self.sonarr_url = self._start(SonarrHandler) + '/api/v3/series'
+        mal_root = self._start(MALHandler)
+        self.mal_api_url = mal_root + '/v2'
+        self.mal_auth_url = mal_root + '/v1/oauth2'
+
+    def _start(self, handler_class):
+        handler = type(handler_class.__name__, (handler_class,), {'state': self.state})
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self._servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    def shutdown(self):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
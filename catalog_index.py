@@ -0,0 +1,256 @@
+"""
+Offline MyAnimeList catalog index.
+
+Imports a local MAL catalog dump (JSON or CSV) into an SQLite file holding
+an exact normalized-title table and a character-trigram inverted index with
+delta/varint-encoded posting lists. Candidate generation then runs locally
+and the live search API is only needed for titles the index cannot resolve.
+"""
+
+import csv
+import json
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+
+from title_normalizer import fold_title
+
+CATALOG_FILE = "mal_catalog.db"
+NGRAM_SIZE = 3
+# Share of the query's trigrams a title must contain to become a candidate
+MIN_GRAM_OVERLAP = 0.4
+
+
+# Catalog titles and queries are folded by the shared (memoized) normalizer
+normalize_title = fold_title
+
+
+def title_grams(normalized):
+    """Return the set of character trigrams of a normalized title (padded with spaces)."""
+    padded = f" {normalized} "
+    if len(padded) < NGRAM_SIZE:
+        return {padded}
+    return {padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)}
+
+
+def encode_postings(ids):
+    """Encode sorted anime ids as delta varints."""
+    out = bytearray()
+    previous = 0
+    for anime_id in sorted(ids):
+        delta = anime_id - previous
+        previous = anime_id
+        while delta >= 0x80:
+            out.append((delta & 0x7F) | 0x80)
+            delta >>= 7
+        out.append(delta)
+    return bytes(out)
+
+
+def decode_postings(blob):
+    """Decode a posting list produced by encode_postings."""
+    ids = []
+    current = 0
+    value = 0
+    shift = 0
+    for byte in blob:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        current += value
+        ids.append(current)
+        value = 0
+        shift = 0
+    return ids
+
+
+def _split_synonyms(value):
+    if not value:
+        return []
+    if isinstance(value, list):
+        return [v for v in value if v]
+    return [v.strip() for v in re.split(r'[;|]', value) if v.strip()]
+
+
+def _record_from_json(item):
+    """Normalize one JSON catalog entry (plain object or MAL API {'node': ...})."""
+    node = item.get('node', item)
+    alt = node.get('alternative_titles') or {}
+    return {
+        'id': int(node['id']),
+        'title': node.get('title') or '',
+        'alternative_titles': {
+            'en': alt.get('en') or node.get('title_english') or '',
+            'ja': alt.get('ja') or node.get('title_japanese') or '',
+            'synonyms': _split_synonyms(alt.get('synonyms') or node.get('synonyms'))
+        },
+        'start_date': node.get('start_date'),
+        'media_type': node.get('media_type')
+    }
+
+
+def _record_from_csv(row):
+    """Normalize one CSV catalog row."""
+    return {
+        'id': int(row['id']),
+        'title': row.get('title') or '',
+        'alternative_titles': {
+            'en': row.get('en') or row.get('title_english') or '',
+            'ja': row.get('ja') or row.get('title_japanese') or '',
+            'synonyms': _split_synonyms(row.get('synonyms'))
+        },
+        'start_date': row.get('start_date') or None,
+        'media_type': row.get('media_type') or None
+    }
+
+
+def read_catalog_dump(path):
+    """Yield catalog records from a JSON or CSV dump."""
+    if path.lower().endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                yield _record_from_csv(row)
+        return
+
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('data', [])
+    for item in data:
+        yield _record_from_json(item)
+
+
+def _all_titles(record):
+    alt = record['alternative_titles']
+    titles = [record['title'], alt.get('en'), alt.get('ja')] + list(alt.get('synonyms', []))
+    return [t for t in titles if t]
+
+
+def import_catalog(dump_path, db_path=CATALOG_FILE):
+    """Build (or rebuild) the catalog index at db_path from a dump. Returns the number of anime."""
+    tmp_path = db_path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    conn.executescript(
+        """CREATE TABLE anime (
+               id INTEGER PRIMARY KEY,
+               title TEXT,
+               alternative_titles TEXT,
+               start_date TEXT,
+               media_type TEXT
+           );
+           CREATE TABLE titles (norm TEXT NOT NULL, anime_id INTEGER NOT NULL);
+           CREATE TABLE grams (gram TEXT PRIMARY KEY, postings BLOB NOT NULL);"""
+    )
+
+    postings = defaultdict(set)
+    count = 0
+    for record in read_catalog_dump(dump_path):
+        conn.execute(
+            "INSERT OR REPLACE INTO anime VALUES (?, ?, ?, ?, ?)",
+            (record['id'], record['title'], json.dumps(record['alternative_titles']),
+             record['start_date'], record['media_type'])
+        )
+        normalized_titles = {normalize_title(t) for t in _all_titles(record)}
+        normalized_titles.discard('')
+        for norm in normalized_titles:
+            conn.execute("INSERT INTO titles VALUES (?, ?)", (norm, record['id']))
+            for gram in title_grams(norm):
+                postings[gram].add(record['id'])
+        count += 1
+
+    conn.executemany(
+        "INSERT INTO grams VALUES (?, ?)",
+        ((gram, encode_postings(ids)) for gram, ids in postings.items())
+    )
+    conn.execute("CREATE INDEX titles_norm ON titles (norm)")
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, db_path)
+    return count
+
+
+class CatalogIndex:
+    """Read-only candidate generator backed by an imported catalog file."""
+
+    def __init__(self, path=CATALOG_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self.lookups = 0
+        self.resolved = 0
+
+    @classmethod
+    def open_if_exists(cls, path=CATALOG_FILE):
+        """Return a CatalogIndex for path, or None when no catalog has been imported."""
+        if path and os.path.exists(path):
+            return cls(path)
+        return None
+
+    def _load_nodes(self, anime_ids):
+        placeholders = ','.join('?' * len(anime_ids))
+        rows = self._conn.execute(
+            f"SELECT id, title, alternative_titles, start_date, media_type "
+            f"FROM anime WHERE id IN ({placeholders})", list(anime_ids)
+        ).fetchall()
+        nodes = {
+            row[0]: {
+                'id': row[0],
+                'title': row[1],
+                'alternative_titles': json.loads(row[2] or '{}'),
+                'start_date': row[3],
+                'media_type': row[4]
+            }
+            for row in rows
+        }
+        return [{'node': nodes[i]} for i in anime_ids if i in nodes]
+
+    def search(self, title, limit=10):
+        """Return up to `limit` candidates shaped like MAL search results ([{'node': {...}}])."""
+        norm = normalize_title(title)
+        if not norm:
+            return []
+
+        with self._lock:
+            self.lookups += 1
+            exact = [row[0] for row in self._conn.execute(
+                "SELECT DISTINCT anime_id FROM titles WHERE norm = ?", (norm,)
+            )]
+
+            grams = title_grams(norm)
+            placeholders = ','.join('?' * len(grams))
+            overlap = Counter()
+            for (blob,) in self._conn.execute(
+                f"SELECT postings FROM grams WHERE gram IN ({placeholders})", list(grams)
+            ):
+                overlap.update(decode_postings(blob))
+
+            needed = max(1, int(len(grams) * MIN_GRAM_OVERLAP))
+            ranked = [anime_id for anime_id, shared in overlap.most_common() if shared >= needed]
+            candidates = list(dict.fromkeys(exact + ranked))[:limit]
+            return self._load_nodes(candidates) if candidates else []
+
+    def record_resolved(self):
+        """Count a title that was matched from the catalog without the live API."""
+        with self._lock:
+            self.resolved += 1
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM anime").fetchone()[0]
+            return {
+                'entries': entries,
+                'lookups': self.lookups,
+                'resolved_locally': self.resolved,
+                'api_fallbacks': self.lookups - self.resolved,
+                'path': os.path.abspath(self.path)
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
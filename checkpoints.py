@@ -0,0 +1,167 @@
+"""
+Durable checkpoints for sync jobs.
+
+Every sync job records its options and each finished item as it goes, so an
+interrupted job (container restart, Ctrl+C) can be resumed without repeating
+searches or list updates that already completed.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+CHECKPOINT_FILE = "sync_jobs.db"
+
+# Outcomes that are attempted again when a job is resumed
+RETRYABLE_OUTCOMES = {'failed'}
+
+
+class CheckpointStore:
+    """SQLite-backed store of sync jobs and their committed items."""
+
+    def __init__(self, path=CHECKPOINT_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL keeps a commit per item cheap while staying durable
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                   job_id TEXT PRIMARY KEY,
+                   source TEXT NOT NULL,
+                   options TEXT,
+                   status TEXT NOT NULL,
+                   total INTEGER DEFAULT 0,
+                   cursor INTEGER DEFAULT 0,
+                   created_at REAL,
+                   updated_at REAL
+               );
+               CREATE TABLE IF NOT EXISTS job_items (
+                   job_id TEXT NOT NULL,
+                   item_key TEXT NOT NULL,
+                   position INTEGER,
+                   outcome TEXT,
+                   result TEXT,
+                   committed_at REAL,
+                   PRIMARY KEY (job_id, item_key)
+               );"""
+        )
+        self._conn.commit()
+
+    def create_job(self, job_id, source, options=None, total=0):
+        """Register a new running job."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, 'running', ?, 0, ?, ?)",
+                (job_id, source, json.dumps(options or {}), total, now, now)
+            )
+            self._conn.commit()
+
+    def update_job(self, job_id, status=None, total=None):
+        """Change the status and/or total of a job."""
+        with self._lock:
+            if status is not None:
+                self._conn.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ?",
+                                   (status, time.time(), job_id))
+            if total is not None:
+                self._conn.execute("UPDATE jobs SET total = ? WHERE job_id = ?", (total, job_id))
+            self._conn.commit()
+
+    def commit_item(self, job_id, item_key, position, outcome, result=None):
+        """Durably record the final outcome of one item and advance the job cursor."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_items VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, item_key, position, outcome,
+                 json.dumps(result) if result is not None else None, time.time())
+            )
+            self._conn.execute(
+                "UPDATE jobs SET cursor = (SELECT COUNT(*) FROM job_items WHERE job_id = ?), "
+                "updated_at = ? WHERE job_id = ?", (job_id, time.time(), job_id)
+            )
+            self._conn.commit()
+
+    def committed_items(self, job_id):
+        """Return {item_key: {'outcome', 'result'}} for a job, in commit order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT item_key, outcome, result FROM job_items WHERE job_id = ? "
+                "ORDER BY position", (job_id,)
+            ).fetchall()
+        return {
+            row[0]: {'outcome': row[1], 'result': json.loads(row[2]) if row[2] else None}
+            for row in rows
+        }
+
+    def completed_keys(self, job_id):
+        """Return the keys of items that must not be redone when the job resumes."""
+        return {key for key, item in self.committed_items(job_id).items()
+                if item['outcome'] not in RETRYABLE_OUTCOMES}
+
+    def _job_from_row(self, row):
+        return {
+            'job_id': row[0],
+            'source': row[1],
+            'options': json.loads(row[2] or '{}'),
+            'status': row[3],
+            'total': row[4],
+            'cursor': row[5],
+            'created_at': row[6],
+            'updated_at': row[7]
+        }
+
+    def get_job(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._job_from_row(row) if row else None
+
+    def latest_resumable(self, source):
+        """Return the most recent interrupted or failed job for source, if any."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE source = ? AND status IN ('running', 'interrupted', 'error') "
+                "ORDER BY updated_at DESC LIMIT 1", (source,)
+            ).fetchone()
+        return self._job_from_row(row) if row else None
+
+    def active_jobs(self, within_seconds=600):
+        """Return running jobs of any source that made progress in the last `within_seconds`.
+
+        Older 'running' jobs were left behind by a process that died and are ignored.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE status = 'running' AND updated_at >= ? "
+                "ORDER BY updated_at DESC", (time.time() - within_seconds,)
+            ).fetchall()
+        return [self._job_from_row(row) for row in rows]
+
+    def list_jobs(self, source=None, limit=20):
+        with self._lock:
+            if source:
+                rows = self._conn.execute(
+                    "SELECT * FROM jobs WHERE source = ? ORDER BY updated_at DESC LIMIT ?",
+                    (source, limit)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT * FROM jobs ORDER BY updated_at DESC LIMIT ?", (limit,)
+                ).fetchall()
+        return [self._job_from_row(row) for row in rows]
+
+    def mark_interrupted(self, source):
+        """Flag jobs left 'running' by a previous process as interrupted. Returns how many."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'interrupted' WHERE source = ? AND status = 'running'",
+                (source,)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
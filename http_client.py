@@ -0,0 +1,257 @@
+"""
+Shared HTTP transport for every Sonarr and MyAnimeList call.
+
+Keeps one pooled keep-alive session per host, applies connect/read
+timeouts to every request and retries connection resets and 5xx
+responses with exponential backoff. Throttled responses (429/503) are
+reported to the host's rate limiter and retried once it allows, or after
+their Retry-After on hosts without one. Hosts with a token manager always get
+its current bearer token and a request rejected with 401 is retried once
+with a refreshed one. Hosts with a response cache get cacheable GETs
+answered from it. Every request is counted and timed in a Metrics
+registry.
+"""
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from metrics import default_metrics
+from profiling import trace_span, trace_wait
+from rate_limit import THROTTLE_STATUSES, retry_after_seconds
+
+DEFAULT_HTTP_SETTINGS = {
+    "connect_timeout": 5,
+    "read_timeout": 30,
+    "retries": 3,
+    "backoff_factor": 0.5,
+    "pool_size": 10,
+    "throttle_retries": 5
+}
+
+
+def cached_response(url, content_type, body):
+    """Build a requests.Response for a body served from a ResponseCache."""
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response._content = body
+    response.encoding = "utf-8"
+    if content_type:
+        response.headers["Content-Type"] = content_type
+    response.from_cache = True
+    return response
+
+
+class HttpClient:
+    """Pooled requests client with one keep-alive session per host."""
+
+    def __init__(self, settings=None, metrics=None):
+        self.metrics = metrics if metrics is not None else default_metrics
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._stats = {}
+        self._limiters = {}
+        self._auth = {}
+        self._caches = {}
+        self.configure(settings)
+
+    def configure(self, settings=None):
+        """Apply transport settings; existing sessions are rebuilt on next use."""
+        merged = dict(DEFAULT_HTTP_SETTINGS)
+        merged.update(settings or {})
+        with self._lock:
+            self.settings = merged
+            self.timeout = (merged["connect_timeout"], merged["read_timeout"])
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+    def set_limiter(self, host, limiter):
+        """Make every request to host wait on limiter first."""
+        with self._lock:
+            self._limiters[host] = limiter
+
+    def set_auth(self, host, tokens):
+        """Send requests to host that carry an Authorization header with tokens' current token."""
+        with self._lock:
+            self._auth[host] = tokens
+
+    def set_cache(self, host, cache):
+        """Answer cacheable GETs to host from a ResponseCache, and tell it about list writes."""
+        with self._lock:
+            self._caches[host] = cache
+
+    def _new_session(self):
+        # Throttled responses (429/503) are left to _send, which involves the rate limiter
+        retry = Retry(
+            total=self.settings["retries"],
+            connect=self.settings["retries"],
+            read=self.settings["retries"],
+            status=self.settings["retries"],
+            backoff_factor=self.settings["backoff_factor"],
+            status_forcelist=(500, 502, 504),
+            respect_retry_after_header=False,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            max_retries=retry,
+            pool_connections=1,
+            pool_maxsize=self.settings["pool_size"]
+        )
+        session = requests.Session()
+        session.headers["Accept-Encoding"] = "gzip, deflate"
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _session_for(self, host):
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = self._new_session()
+                self._sessions[host] = session
+                self._stats.setdefault(host, {"requests": 0, "errors": 0, "retries": 0,
+                                              "auth_retries": 0, "throttled": 0})
+            return session, self._limiters.get(host), self._auth.get(host)
+
+    def request(self, method, url, **kwargs):
+        """Send a request through the pooled session for the URL's host.
+
+        With a response cache for the host, a fresh cached response is
+        returned without touching the network (its `from_cache` is True).
+        """
+        host = urlsplit(url).netloc
+        cache = self._caches.get(host)
+        if cache is None:
+            return self._request(host, method, url, kwargs)
+        key = cache.key_for(method, url, kwargs.get("params"))
+        if key is None:
+            response = self._request(host, method, url, kwargs)
+            if response.ok:
+                cache.written(method, url)
+            return response
+        hit = cache.get(key)
+        if hit is not None:
+            self.metrics.inc("response_cache_total", result="hit")
+            return cached_response(url, *hit)
+        self.metrics.inc("response_cache_total", result="miss")
+        response = self._request(host, method, url, kwargs)
+        if response.status_code == 200:
+            cache.put(key, url, response.headers.get("Content-Type"), response.content)
+        return response
+
+    def _request(self, host, method, url, kwargs):
+        session, limiter, auth = self._session_for(host)
+        kwargs.setdefault("timeout", self.timeout)
+        headers = kwargs.get("headers") or {}
+        if auth is None or "Authorization" not in headers:
+            return self._send(session, limiter, host, method, url, kwargs)
+
+        # Whichever token the caller was handed, send the current one
+        token = auth.access_token()
+        if token:
+            kwargs["headers"] = headers = dict(headers, Authorization=f"Bearer {token}")
+        response = self._send(session, limiter, host, method, url, kwargs)
+        if response.status_code != 401:
+            return response
+        fresh = auth.refresh(stale=headers["Authorization"].split(" ", 1)[-1])
+        if not fresh:
+            return response
+        response.close()
+        with self._lock:
+            self._stats[host]["auth_retries"] += 1
+        kwargs["headers"] = dict(headers, Authorization=f"Bearer {fresh}")
+        return self._send(session, limiter, host, method, url, kwargs)
+
+    def _send(self, session, limiter, host, method, url, kwargs):
+        """Send a request, retrying throttled responses up to throttle_retries times."""
+        attempts = self.settings["throttle_retries"] + 1
+        for attempt in range(attempts):
+            response = self._attempt(session, limiter, host, method, url, kwargs)
+            if response.status_code not in THROTTLE_STATUSES or attempt == attempts - 1:
+                return response
+            with self._lock:
+                self._stats[host]["throttled"] += 1
+            delay = retry_after_seconds(response.headers.get("Retry-After"))
+            response.close()
+            # A limiter applies a Retry-After pause on the next acquire(); without one, back off here
+            if limiter is None or not delay:
+                if delay is None:
+                    delay = self.settings["backoff_factor"] * (2 ** attempt)
+                with trace_span("retry_after_sleep"):
+                    time.sleep(delay)
+                self.metrics.record_wait(delay, "retry_after")
+
+    def _attempt(self, session, limiter, host, method, url, kwargs):
+        if limiter is not None:
+            waited = limiter.acquire()
+            self.metrics.record_wait(waited, "limiter")
+            trace_wait("rate_limit_wait", waited)
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            self.metrics.record_request(method, url, "error", time.perf_counter() - start)
+            with self._lock:
+                self._stats[host]["requests"] += 1
+                self._stats[host]["errors"] += 1
+            raise
+        retries = getattr(getattr(response.raw, "retries", None), "history", ())
+        # Responses urllib3 retried internally (5xx) count as requests too
+        for attempt in retries:
+            if attempt.status is not None:
+                self.metrics.record_request(method, url, attempt.status)
+        self.metrics.record_request(method, url, response.status_code, time.perf_counter() - start)
+        if limiter is not None:
+            limiter.record_response(response.status_code,
+                                    retry_after_seconds(response.headers.get("Retry-After")))
+        with self._lock:
+            self._stats[host]["requests"] += 1
+            self._stats[host]["retries"] += len(retries)
+            if response.status_code >= 400:
+                self._stats[host]["errors"] += 1
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def stats(self):
+        """Return per-host request counts and how many of them reused a pooled connection."""
+        with self._lock:
+            report = {}
+            for host, counters in self._stats.items():
+                connections = 0
+                session = self._sessions.get(host)
+                if session is not None:
+                    for adapter in set(session.adapters.values()):
+                        pools = adapter.poolmanager.pools
+                        for key in list(pools.keys()):
+                            pool = pools.get(key)
+                            if pool is not None:
+                                connections += pool.num_connections
+                entry = dict(counters)
+                entry["connections_opened"] = connections
+                entry["connections_reused"] = max(0, counters["requests"] - connections)
+                report[host] = entry
+            return report
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+
+# Process-wide client shared by the CLI and the web app
+default_client = HttpClient()
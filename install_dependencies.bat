@@ -2,7 +2,7 @@
 echo Installing MAL-Sonarr Sync dependencies...
 echo.
 
-pip install requests fuzzywuzzy python-levenshtein flask flask_socketio
+pip install requests rapidfuzz flask flask_socketio aiohttp
 
 echo.
 echo Dependencies installed!
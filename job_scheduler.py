@@ -0,0 +1,179 @@
+"""
+Scheduler for web sync jobs.
+
+Every sync request goes through one queue. At most `max_concurrent` jobs
+run at a time; the rest wait in priority order (higher first, then oldest
+first) and can be cancelled while queued. A request equivalent to a job
+that is already queued or running attaches to that job instead of starting
+another full-library sync.
+"""
+
+import heapq
+import itertools
+import json
+import threading
+import time
+import uuid
+
+DEFAULT_MAX_CONCURRENT_JOBS = 1
+
+# Options that change what a sync does or produces; jobs that agree on these are equivalent
+DEDUP_OPTIONS = ('dry_run', 'rematch', 'incremental', 'profile')
+
+
+def _public(job):
+    return {name: value for name, value in job.items() if name != 'key'}
+
+
+def dedup_key(options, resume_session_id=None):
+    """Key under which equivalent sync requests are merged."""
+    if resume_session_id:
+        return 'resume:' + resume_session_id
+    if options.get('plan_id'):
+        return 'plan:' + options['plan_id']
+    if options.get('series_ids'):
+        return 'series:' + ','.join(str(series_id) for series_id in sorted(options['series_ids']))
+    return json.dumps({name: bool(options.get(name)) for name in DEDUP_OPTIONS}, sort_keys=True)
+
+
+class JobScheduler:
+    """Priority queue of sync jobs with a concurrency cap and deduplication.
+
+    `start(session_id, options, resume)` launches a job; the job must call
+    job_finished(session_id) when it ends so the next one can start.
+    `on_queued(job)` and `on_cancelled(job)` let the caller reflect queue
+    state in its session store.
+    """
+
+    def __init__(self, start, max_concurrent=DEFAULT_MAX_CONCURRENT_JOBS, on_queued=None,
+                 on_cancelled=None):
+        self._start = start
+        self._on_queued = on_queued
+        self._on_cancelled = on_cancelled
+        self.max_concurrent = max(1, int(max_concurrent))
+        self._lock = threading.Lock()
+        self._queue = []  # heap of (-priority, sequence, session_id)
+        self._sequence = itertools.count()
+        self._jobs = {}  # session_id -> job, for queued and running jobs
+        self._by_key = {}  # dedup key -> session_id
+        self._done = {}  # session_id -> Event set when the job leaves the scheduler
+        self.deduplicated = 0
+        self.cancelled = 0
+
+    def configure(self, max_concurrent):
+        with self._lock:
+            self.max_concurrent = max(1, int(max_concurrent))
+        self._dispatch()
+
+    def submit(self, options, priority=0, resume_session_id=None, source='web'):
+        """Queue a sync job, or attach to an equivalent queued or running one.
+
+        Returns (job, deduplicated).
+        """
+        key = dedup_key(options, resume_session_id)
+        with self._lock:
+            existing = self._jobs.get(self._by_key.get(key))
+            if existing is not None:
+                self.deduplicated += 1
+                existing['attached'] += 1
+                return _public(existing), True
+            job = {
+                'session_id': resume_session_id or str(uuid.uuid4()),
+                'options': options,
+                'priority': int(priority),
+                'resume': bool(resume_session_id),
+                'source': source,
+                'key': key,
+                'state': 'queued',
+                'attached': 0,
+                'queued_at': time.time(),
+                'started_at': None
+            }
+            self._jobs[job['session_id']] = job
+            self._by_key[key] = job['session_id']
+            # Reported before the job can be dispatched, so its session never goes back to 'queued'
+            if self._on_queued:
+                self._on_queued(_public(job))
+            heapq.heappush(self._queue, (-job['priority'], next(self._sequence), job['session_id']))
+        self._dispatch()
+        return _public(job), False
+
+    def cancel(self, session_id):
+        """Cancel a queued job. Returns False if it is not queued (running jobs are not interrupted)."""
+        with self._lock:
+            job = self._jobs.get(session_id)
+            if job is None or job['state'] != 'queued':
+                return False
+            self._forget(job)
+            self._queue = [entry for entry in self._queue if entry[2] != session_id]
+            heapq.heapify(self._queue)
+            self.cancelled += 1
+        if self._on_cancelled:
+            self._on_cancelled(dict(job, state='cancelled'))
+        return True
+
+    def job_finished(self, session_id):
+        """Release a running job's slot and start the next queued job."""
+        with self._lock:
+            job = self._jobs.get(session_id)
+            if job is not None and job['state'] == 'running':
+                self._forget(job)
+        self._dispatch()
+
+    def wait(self, session_id, timeout=None):
+        """Block until a queued or running job has finished or been cancelled.
+
+        Returns False if the timeout expired first.
+        """
+        with self._lock:
+            if session_id not in self._jobs:
+                return True
+            done = self._done.setdefault(session_id, threading.Event())
+        return done.wait(timeout)
+
+    def is_busy(self):
+        """True if any job is queued or running."""
+        with self._lock:
+            return bool(self._jobs)
+
+    def _forget(self, job):
+        self._jobs.pop(job['session_id'], None)
+        done = self._done.pop(job['session_id'], None)
+        if done is not None:
+            done.set()
+        if self._by_key.get(job['key']) == job['session_id']:
+            del self._by_key[job['key']]
+
+    def _dispatch(self):
+        while True:
+            with self._lock:
+                running = sum(1 for job in self._jobs.values() if job['state'] == 'running')
+                if running >= self.max_concurrent or not self._queue:
+                    return
+                _, _, session_id = heapq.heappop(self._queue)
+                job = self._jobs[session_id]
+                job['state'] = 'running'
+                job['started_at'] = time.time()
+            try:
+                self._start(job['session_id'], job['options'], job['resume'])
+            except Exception:
+                self.job_finished(job['session_id'])
+                raise
+
+    def position(self, session_id):
+        """1-based queue position of a queued job, or None."""
+        with self._lock:
+            order = [entry[2] for entry in sorted(self._queue)]
+        return order.index(session_id) + 1 if session_id in order else None
+
+    def snapshot(self):
+        """Return the running and queued jobs (queued in start order) and counters."""
+        with self._lock:
+            order = [entry[2] for entry in sorted(self._queue)]
+            return {
+                'max_concurrent': self.max_concurrent,
+                'running': [_public(job) for job in self._jobs.values() if job['state'] == 'running'],
+                'queued': [_public(self._jobs[session_id]) for session_id in order],
+                'deduplicated': self.deduplicated,
+                'cancelled': self.cancelled
+            }
@@ -0,0 +1,62 @@
+"""
+Paginated access to the authenticated user's MyAnimeList anime list.
+"""
+
+from http_client import default_client
+
+# Overridable through config ("mal": {"api_base_url", "auth_base_url"}), e.g. for local stand-in servers
+MAL_API_BASE_URL = "https://api.myanimelist.net/v2"
+MAL_AUTH_BASE_URL = "https://myanimelist.net/v1/oauth2"
+MAL_LIST_PAGE_SIZE = 1000  # Largest page the MAL API allows
+
+
+def iter_anime_list(access_token, client=default_client, page_size=MAL_LIST_PAGE_SIZE,
+                    base_url=MAL_API_BASE_URL):
+    """Yield every entry of the user's anime list, following `paging.next` page by page."""
+    headers = {"Authorization": f"Bearer {access_token}"}
+    url = f"{base_url}/users/@me/animelist"
+    params = {"fields": "list_status", "limit": page_size, "nsfw": "true"}
+
+    while url:
+        resp = client.get(url, headers=headers, params=params)
+        resp.raise_for_status()
+        page = resp.json()
+        for entry in page.get("data", []):
+            yield entry
+        # The next link already carries the query string (including offset)
+        url = page.get("paging", {}).get("next")
+        params = None
+
+
+def build_list_index(access_token, client=default_client, base_url=MAL_API_BASE_URL):
+    """Return {anime_id: list_status} for the user's whole anime list."""
+    return {
+        entry["node"]["id"]: entry.get("list_status") or {}
+        for entry in iter_anime_list(access_token, client=client, base_url=base_url)
+    }
+
+
+class ListStatusLookup:
+    """The user's list as {anime_id: list_status}, asked from MAL one title at a time.
+
+    For a handful of titles one detail request each is far cheaper than
+    paging through the whole list. Supports `in` and `get`.
+    """
+
+    def __init__(self, access_token, client=default_client, base_url=MAL_API_BASE_URL):
+        self._headers = {"Authorization": f"Bearer {access_token}"}
+        self._client = client
+        self._base_url = base_url
+        self._statuses = {}
+
+    def get(self, anime_id, default=None):
+        if anime_id not in self._statuses:
+            resp = self._client.get(f"{self._base_url}/anime/{anime_id}", headers=self._headers,
+                                    params={"fields": "my_list_status"})
+            resp.raise_for_status()
+            self._statuses[anime_id] = resp.json().get("my_list_status")
+        status = self._statuses[anime_id]
+        return default if status is None else status
+
+    def __contains__(self, anime_id):
+        return self.get(anime_id) is not None
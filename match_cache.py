@@ -0,0 +1,165 @@
+"""
+Persistent Sonarr -> MyAnimeList match cache.
+
+Stores the MAL id chosen for each Sonarr series so later runs can skip the
+MAL search and fuzzy scoring entirely. A best match below the caller's
+minimum score is a negative entry: it is only trusted for NEGATIVE_TTL
+seconds, after which the series is searched again in case MAL has since
+added the show.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from title_normalizer import fold_title
+
+MATCH_CACHE_FILE = "match_cache.db"
+# How long a match below the minimum score is kept before searching again
+NEGATIVE_TTL = 7 * 24 * 3600
+
+
+def title_fingerprint(title):
+    """Return a short fingerprint of a title that ignores case, width, punctuation and spacing."""
+    return hashlib.sha1(fold_title(title).encode('utf-8')).hexdigest()[:16]
+
+
+def series_key(series=None, title=None):
+    """Build the cache key for a Sonarr series.
+
+    Prefers the tvdbId, then the Sonarr series id, and falls back to the
+    title fingerprint when neither is known.
+    """
+    series = series or {}
+    tvdb_id = series.get('tvdbId') or series.get('tvdb_id')
+    if tvdb_id:
+        return f"tvdb:{tvdb_id}"
+    sonarr_id = series.get('sonarr_id') or series.get('id')
+    if sonarr_id:
+        return f"sonarr:{sonarr_id}"
+    return f"title:{title_fingerprint(title or series.get('title'))}"
+
+
+class MatchCache:
+    """SQLite-backed store mapping Sonarr series to their MAL match."""
+
+    def __init__(self, path=MATCH_CACHE_FILE, refresh=False, negative_ttl=NEGATIVE_TTL):
+        self.path = path
+        self.negative_ttl = negative_ttl
+        # When refresh is set every lookup misses, forcing a re-match that
+        # then overwrites the stored entry.
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.expired = 0
+        self.stores = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS matches (
+                series_key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                title TEXT,
+                mal_id INTEGER NOT NULL,
+                mal_title TEXT,
+                start_date TEXT,
+                score REAL,
+                updated_at REAL
+            )"""
+        )
+        self._conn.commit()
+
+    def get(self, key, title, refresh=False, min_score=None):
+        """Return the cached match for key, or None on a miss.
+
+        An entry stored under a different title fingerprint is stale (the
+        series was renamed) and is dropped. With min_score, an entry scoring
+        below it that is older than negative_ttl also misses. Passing
+        refresh forces a miss for this lookup only.
+        """
+        if refresh or self.refresh:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        fingerprint = title_fingerprint(title)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, mal_id, mal_title, start_date, score, updated_at "
+                "FROM matches WHERE series_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            if row[0] != fingerprint:
+                self._conn.execute("DELETE FROM matches WHERE series_key = ?", (key,))
+                self._conn.commit()
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            if (min_score is not None and (row[4] or 0) < min_score
+                    and time.time() - (row[5] or 0) >= self.negative_ttl):
+                # Kept until put() replaces it with the new search's result
+                self.expired += 1
+                self.misses += 1
+                return None
+            self.hits += 1
+            return {
+                'mal_id': row[1],
+                'mal_title': row[2],
+                'start_date': row[3],
+                'score': row[4]
+            }
+
+    def put(self, key, title, mal_id, mal_title, start_date=None, score=0):
+        """Store or replace the match for key."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO matches "
+                "(series_key, fingerprint, title, mal_id, mal_title, start_date, score, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, title_fingerprint(title), title, mal_id, mal_title,
+                 start_date, score, time.time())
+            )
+            self._conn.commit()
+            self.stores += 1
+
+    def invalidate(self, key):
+        """Drop the entry for key so the next lookup re-matches it."""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM matches WHERE series_key = ?", (key,))
+            self._conn.commit()
+            if cursor.rowcount:
+                self.invalidations += 1
+            return cursor.rowcount > 0
+
+    def clear(self):
+        """Drop every cached match."""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM matches")
+            self._conn.commit()
+            self.invalidations += cursor.rowcount
+            return cursor.rowcount
+
+    def stats(self):
+        """Return hit/miss counters and the number of stored entries."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM matches").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                'entries': entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'expired': self.expired,
+                'stores': self.stores,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+                'path': os.path.abspath(self.path)
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
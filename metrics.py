@@ -0,0 +1,243 @@
+"""
+Sync instrumentation: counters, latency histograms and gauges.
+
+Outbound Sonarr and MAL calls are counted and timed per endpoint and status,
+the sync phases (fetch, normalize, score, write) are timed, and 429s, time
+spent waiting on rate limits and finished items are counted. The web app
+renders the registry in the Prometheus text format at /metrics; the CLI
+writes the same data as a JSON summary at the end of a sync.
+"""
+
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+METRICS_PREFIX = "malsync"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SYNC_PHASES = ('fetch', 'normalize', 'score', 'write')
+# Items per second is measured over this trailing window
+RATE_WINDOW_SECONDS = 60
+
+_HELP = {
+    'http_requests_total': ('counter', 'Outbound HTTP requests by endpoint and status'),
+    'http_request_duration_seconds': ('histogram', 'Outbound HTTP request latency by endpoint'),
+    'rate_limited_total': ('counter', 'HTTP 429 responses by endpoint'),
+    'rate_limit_wait_seconds_total': ('counter', 'Seconds spent waiting on rate limits by source'),
+    'phase_duration_seconds': ('histogram', 'Time spent in each sync phase'),
+    'items_total': ('counter', 'Synced items by outcome'),
+    'response_cache_total': ('counter', 'Cacheable MAL GETs answered from the response cache (hit) or sent (miss)'),
+    'mal_searches_total': ('counter', 'MAL searches sent, or coalesced into an identical search of the same run'),
+    'items_per_second': ('gauge', f'Items finished per second over the last {RATE_WINDOW_SECONDS}s'),
+}
+
+_MAL_DETAIL = re.compile(r'/anime/\d+$')
+
+
+def endpoint_name(method, url):
+    """Classify an outbound request as a Sonarr or MAL endpoint for metric labels."""
+    path = urlsplit(url).path.rstrip('/')
+    if '/api/v3/' in path:
+        if path.endswith('/tag'):
+            return 'sonarr_tag'
+        return 'sonarr_series' if '/series' in path else 'sonarr_other'
+    if path.endswith('/oauth2/token'):
+        return 'mal_token'
+    if path.endswith('/animelist'):
+        return 'mal_list'
+    if path.endswith('/my_list_status'):
+        return 'mal_delete' if method.upper() == 'DELETE' else 'mal_update'
+    if _MAL_DETAIL.search(path):
+        return 'mal_detail'
+    if path.endswith('/anime'):
+        return 'mal_search'
+    return 'other'
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels) + '}'
+
+
+class Metrics:
+    """Thread-safe registry of labelled counters, histograms and gauges."""
+
+    def __init__(self, prefix=METRICS_PREFIX, buckets=LATENCY_BUCKETS):
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._gauges = {}
+        self.reset()
+
+    def reset(self):
+        """Drop every recorded value; registered gauges are kept."""
+        with self._lock:
+            self._counters = {}
+            self._histograms = {}
+            self._recent = deque()
+            self.started_at = time.time()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            entry = self._histograms.get(key)
+            if entry is None:
+                entry = self._histograms[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0,
+                                                 'count': 0, 'max': 0.0}
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    entry['buckets'][i] += 1
+                    break
+            entry['sum'] += seconds
+            entry['count'] += 1
+            entry['max'] = max(entry['max'], seconds)
+
+    def gauge(self, name, read, help_text=''):
+        """Register a gauge whose value is read() at collection time."""
+        with self._lock:
+            self._gauges[name] = (read, help_text)
+
+    @contextmanager
+    def phase(self, name):
+        """Time the enclosed block as sync phase `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('phase_duration_seconds', time.perf_counter() - start, phase=name)
+
+    def record_request(self, method, url, status, seconds=None):
+        """Count and time one outbound request; status is the HTTP status or 'error'.
+
+        Attempts retried inside the transport have no latency of their own and are only counted.
+        """
+        endpoint = endpoint_name(method, url)
+        self.inc('http_requests_total', endpoint=endpoint, status=str(status))
+        if seconds is not None:
+            self.observe('http_request_duration_seconds', seconds, endpoint=endpoint)
+        if status == 429:
+            self.inc('rate_limited_total', endpoint=endpoint)
+
+    def record_wait(self, seconds, source):
+        """Add time spent sleeping on a rate limit ('limiter' or 'retry_after')."""
+        if seconds:
+            self.inc('rate_limit_wait_seconds_total', seconds, source=source)
+
+    def record_item(self, outcome):
+        """Count one finished sync item."""
+        now = time.monotonic()
+        with self._lock:
+            key = ('items_total', (('outcome', outcome or 'unknown'),))
+            self._counters[key] = self._counters.get(key, 0) + 1
+            self._recent.append(now)
+            while self._recent and self._recent[0] < now - RATE_WINDOW_SECONDS:
+                self._recent.popleft()
+
+    def items_per_second(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and self._recent[0] < now - RATE_WINDOW_SECONDS:
+                self._recent.popleft()
+            if not self._recent:
+                return 0.0
+            # A run shorter than the window is measured over its own duration
+            span = min(RATE_WINDOW_SECONDS, max(now - self._recent[0], 1.0))
+            return len(self._recent) / span
+
+    def _gauge_values(self):
+        with self._lock:
+            gauges = dict(self._gauges)
+        values = {'items_per_second': (self.items_per_second(), _HELP['items_per_second'][1])}
+        for name, (read, help_text) in gauges.items():
+            try:
+                values[name] = (float(read()), help_text)
+            except Exception:
+                continue
+        return values
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: dict(entry, buckets=list(entry['buckets']))
+                          for key, entry in self._histograms.items()}
+        lines = []
+        described = set()
+
+        def describe(name, kind, help_text):
+            if name not in described:
+                described.add(name)
+                lines.append(f'# HELP {self.prefix}_{name} {help_text}')
+                lines.append(f'# TYPE {self.prefix}_{name} {kind}')
+
+        for (name, labels), value in sorted(counters.items()):
+            describe(name, 'counter', _HELP.get(name, ('', name))[1])
+            lines.append(f'{self.prefix}_{name}{_label_text(labels)} {value:g}')
+        for (name, labels), entry in sorted(histograms.items()):
+            describe(name, 'histogram', _HELP.get(name, ('', name))[1])
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry['buckets']):
+                cumulative += count
+                lines.append(f'{self.prefix}_{name}_bucket'
+                             f'{_label_text(labels + (("le", f"{bound:g}"),))} {cumulative}')
+            lines.append(f'{self.prefix}_{name}_bucket{_label_text(labels + (("le", "+Inf"),))} '
+                         f'{entry["count"]}')
+            lines.append(f'{self.prefix}_{name}_sum{_label_text(labels)} {entry["sum"]:.6f}')
+            lines.append(f'{self.prefix}_{name}_count{_label_text(labels)} {entry["count"]}')
+        for name, (value, help_text) in sorted(self._gauge_values().items()):
+            describe(name, 'gauge', help_text or name)
+            lines.append(f'{self.prefix}_{name} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """Return the recorded values as a JSON-serializable dict."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: dict(entry) for key, entry in self._histograms.items()}
+            elapsed = time.time() - self.started_at
+        report = {'elapsed_seconds': round(elapsed, 3), 'requests': {}, 'phases': {},
+                  'rate_limited': {}, 'rate_limit_wait_seconds': {}, 'items': {},
+                  'response_cache': {}, 'searches': {}}
+        for (name, labels), value in counters.items():
+            labels = dict(labels)
+            if name == 'http_requests_total':
+                report['requests'].setdefault(labels['endpoint'], {'by_status': {}})
+                report['requests'][labels['endpoint']]['by_status'][labels['status']] = value
+            elif name == 'rate_limited_total':
+                report['rate_limited'][labels['endpoint']] = value
+            elif name == 'rate_limit_wait_seconds_total':
+                report['rate_limit_wait_seconds'][labels['source']] = round(value, 3)
+            elif name == 'items_total':
+                report['items'][labels['outcome']] = value
+            elif name == 'response_cache_total':
+                report['response_cache'][labels['result']] = value
+            elif name == 'mal_searches_total':
+                report['searches'][labels['result']] = value
+        for (name, labels), entry in histograms.items():
+            labels = dict(labels)
+            timing = {'count': entry['count'], 'total_seconds': round(entry['sum'], 3),
+                      'mean_ms': round(entry['sum'] / entry['count'] * 1000, 1) if entry['count'] else 0,
+                      'max_ms': round(entry['max'] * 1000, 1)}
+            if name == 'http_request_duration_seconds':
+                report['requests'].setdefault(labels['endpoint'], {'by_status': {}})
+                report['requests'][labels['endpoint']]['latency'] = timing
+            elif name == 'phase_duration_seconds':
+                report['phases'][labels['phase']] = timing
+        items = sum(report['items'].values())
+        report['items_per_second'] = round(items / elapsed, 2) if elapsed > 0 else 0.0
+        for name, (value, _) in self._gauge_values().items():
+            if name != 'items_per_second':
+                report[name] = value
+        return report
+
+
+# Process-wide registry shared by the transport, the engines and both entry points
+default_metrics = Metrics()
@@ -0,0 +1,245 @@
+"""
+Opt-in profiling of a sync: a cProfile dump and a per-title span trace.
+
+A Profiler session belongs to the context (thread or asyncio task) that
+started it: that thread is profiled, and trace spans (fetch, search,
+fallback search, scoring, status check, update, sleeps) recorded in its
+context go on one timeline lane per title. Work handed to a worker pool
+joins the session only when wrapped with in_session() or traced(), so other
+jobs and background threads stay out of it. The trace is written in the
+Chrome trace-event format, which chrome://tracing and
+https://ui.perfetto.dev load as a timeline.
+
+Outside a session, trace_span() and trace_title() return a shared no-op
+context manager, so the instrumentation costs a context variable lookup.
+"""
+
+import contextlib
+import contextvars
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+
+PROFILE_DIR = "profiles"
+
+# The session of the current context; only one session runs at a time
+_session = contextvars.ContextVar('profile_session', default=None)
+_session_lock = threading.Lock()
+_title = contextvars.ContextVar('trace_title', default=None)
+_NOOP = contextlib.nullcontext()
+
+
+def trace_span(name, **args):
+    """Record the enclosed block as span `name` on the current title's lane."""
+    session = _session.get()
+    if session is None:
+        return _NOOP
+    return session.tracer.span(name, args)
+
+
+def trace_wait(name, seconds, **args):
+    """Record a wait of `seconds` that has just ended (e.g. a rate limiter sleep) as a span."""
+    session = _session.get()
+    if session is not None and seconds:
+        session.tracer.add(name, time.perf_counter() - seconds, seconds, args)
+
+
+def trace_title(title):
+    """Attribute the spans recorded in the enclosed block (in this thread or task) to title."""
+    session = _session.get()
+    if session is None:
+        return _NOOP
+    return session.tracer.title(title)
+
+
+def in_session(fn):
+    """Return fn wrapped to run in the current session, profiling the worker thread it runs on."""
+    session = _session.get()
+    if session is None:
+        return fn
+
+    def run(*args, **kwargs):
+        token = _session.set(session)
+        profile = session.thread_profile()
+        if profile is not None:
+            profile.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            if profile is not None:
+                profile.disable()
+            _session.reset(token)
+    return run
+
+
+def traced(title, fn):
+    """Return fn wrapped to run in the current session under trace_title(title), e.g. for a pool."""
+    if _session.get() is None:
+        return fn
+
+    def run(*args, **kwargs):
+        with trace_title(title):
+            return fn(*args, **kwargs)
+    return in_session(run)
+
+
+class Tracer:
+    """Collects spans as Chrome trace 'complete' events, one thread lane per title."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = []
+        self._lanes = {}
+        self._origin = time.perf_counter()
+        self.pid = os.getpid()
+
+    def _lane(self):
+        title = _title.get()
+        if title is None:
+            return 0
+        with self._lock:
+            return self._lanes.setdefault(title, len(self._lanes) + 1)
+
+    def add(self, name, start, duration, args=None, category='sync'):
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': round((start - self._origin) * 1e6, 1),
+            'dur': round(duration * 1e6, 1),
+            'pid': self.pid,
+            'tid': self._lane(),
+            'args': args or {}
+        }
+        with self._lock:
+            self._events.append(event)
+
+    @contextlib.contextmanager
+    def span(self, name, args=None, category='sync'):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.perf_counter() - start, args, category)
+
+    @contextlib.contextmanager
+    def title(self, title):
+        token = _title.set(title)
+        try:
+            with self.span(title, category='title'):
+                yield
+        finally:
+            _title.reset(token)
+
+    def export(self, path):
+        """Write the trace as Chrome trace-event JSON; returns the number of spans."""
+        with self._lock:
+            events = list(self._events)
+            lanes = dict(self._lanes)
+        meta = [{'name': 'process_name', 'ph': 'M', 'pid': self.pid, 'tid': 0,
+                 'args': {'name': 'mal-sonarr sync'}},
+                {'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': 0,
+                 'args': {'name': 'sync'}}]
+        for title, lane in lanes.items():
+            meta.append({'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': lane,
+                         'args': {'name': title}})
+            meta.append({'name': 'thread_sort_index', 'ph': 'M', 'pid': self.pid, 'tid': lane,
+                         'args': {'sort_index': lane}})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': meta + events, 'displayTimeUnit': 'ms'}, f)
+        return len(events)
+
+
+class Profiler:
+    """A profiling session writing `<name>.pstats` and `<name>.trace.json` to directory.
+
+    Only one session runs at a time per process; start() returns False (and
+    the session does nothing) while another one is running. From Python 3.12
+    cProfile sees every thread, so the pstats dump is process-wide there.
+    """
+
+    def __init__(self, directory=PROFILE_DIR, name='sync'):
+        self.directory = directory
+        self.name = name
+        self.paths = {
+            'pstats': os.path.join(directory, f'{name}.pstats'),
+            'trace': os.path.join(directory, f'{name}.trace.json')
+        }
+        self.stats = None
+        self.tracer = None
+        self._profiles = []
+        self._thread_profiles = threading.local()
+        self._lock = threading.Lock()
+        self._active = False
+        self._token = None
+        self._owner = None
+
+    def thread_profile(self):
+        """The calling worker thread's profile, or None where the session's own profile covers it."""
+        # Before 3.12 a profiler only sees the thread that enabled it; from 3.12 one sees them all
+        if sys.version_info >= (3, 12) or threading.get_ident() == self._owner:
+            return None
+        profile = getattr(self._thread_profiles, 'profile', None)
+        if profile is None:
+            profile = self._thread_profiles.profile = cProfile.Profile()
+            with self._lock:
+                self._profiles.append(profile)
+        return profile
+
+    def start(self):
+        if not _session_lock.acquire(blocking=False):
+            print("⚠️  Another profiling session is running; this sync is not profiled")
+            return False
+        self._active = True
+        self._owner = threading.get_ident()
+        self.tracer = Tracer()
+        self._token = _session.set(self)
+        profile = cProfile.Profile()
+        self._profiles.append(profile)
+        profile.enable()
+        return True
+
+    def stop(self):
+        """End the session and write the dumps; returns their paths, or None if it never started."""
+        if not self._active:
+            return None
+        self._profiles[0].disable()
+        _session.reset(self._token)
+        tracer = self.tracer
+        self._active = False
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with self._lock:
+                profiles = list(self._profiles)
+            self.stats = pstats.Stats(profiles[0])
+            for profile in profiles[1:]:
+                self.stats.add(profile)
+            self.stats.dump_stats(self.paths['pstats'])
+            spans = tracer.export(self.paths['trace'])
+            print(f"🔬 Profile written to {self.paths['pstats']} ({len(profiles)} threads), "
+                  f"trace to {self.paths['trace']} ({spans} spans)")
+        finally:
+            _session_lock.release()
+        return self.paths
+
+    def top(self, limit=15):
+        """Return the `limit` functions with the most cumulative time, as printed by pstats."""
+        if self.stats is None:
+            return ''
+        out = io.StringIO()
+        self.stats.stream = out
+        self.stats.sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
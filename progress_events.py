@@ -0,0 +1,72 @@
+"""
+Time-windowed batching of sync progress events.
+
+Instead of one Socket.IO event per title, progress for a session is emitted
+at most once per window: the latest state plus how many items finished since
+the previous event. A trailing event is always sent, so clients never miss
+the final position.
+"""
+
+import threading
+import time
+
+DEFAULT_PROGRESS_INTERVAL_MS = 250
+
+
+class ProgressBatcher:
+    """Coalesces per-item progress updates into at most one emit per session per window."""
+
+    def __init__(self, emit, interval_ms=DEFAULT_PROGRESS_INTERVAL_MS):
+        self._emit = emit
+        self.interval = interval_ms / 1000.0
+        self._lock = threading.Lock()
+        self._pending = {}   # session_id -> latest payload not yet sent
+        self._batched = {}   # session_id -> items folded into the pending payload
+        self._last_sent = {}
+        self._timers = {}
+        self.events_in = 0
+        self.events_out = 0
+
+    def update(self, session_id, payload):
+        """Record the latest progress of a session, emitting it now or at the end of the window."""
+        with self._lock:
+            self.events_in += 1
+            self._pending[session_id] = payload
+            self._batched[session_id] = self._batched.get(session_id, 0) + 1
+            wait = self._last_sent.get(session_id, 0) + self.interval - time.monotonic()
+            if wait > 0:
+                if session_id not in self._timers:
+                    timer = threading.Timer(wait, self.flush, args=(session_id,))
+                    timer.daemon = True
+                    self._timers[session_id] = timer
+                    timer.start()
+                return
+        self.flush(session_id)
+
+    def flush(self, session_id):
+        """Emit the pending progress of a session, if any."""
+        # Emitting under the lock keeps a session's events in order
+        with self._lock:
+            timer = self._timers.pop(session_id, None)
+            if timer is not None:
+                timer.cancel()
+            payload = self._pending.pop(session_id, None)
+            if payload is None:
+                return
+            self._last_sent[session_id] = time.monotonic()
+            self.events_out += 1
+            self._emit(dict(payload, batched=self._batched.pop(session_id, 0)))
+
+    def close(self, session_id):
+        """Send any trailing progress and forget the session."""
+        self.flush(session_id)
+        with self._lock:
+            self._last_sent.pop(session_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'interval_ms': int(self.interval * 1000),
+                'updates': self.events_in,
+                'events_emitted': self.events_out
+            }
@@ -0,0 +1,208 @@
+"""
+Rate limiting shared by every MyAnimeList worker.
+
+The transports report every response to the host's limiter: any TokenBucket
+holds all callers back for a throttled response's Retry-After period, and
+AdaptiveRateLimiter also adjusts its rate to the server (AIMD).
+"""
+
+import asyncio
+import email.utils
+import threading
+import time
+
+DEFAULT_REQUESTS_PER_SECOND = 1.0
+DEFAULT_BURST = 3
+# Responses that mean the server wants fewer requests
+THROTTLE_STATUSES = (429, 503)
+
+# AIMD: the rate is multiplied by DEFAULT_DECREASE_FACTOR on throttling and grows
+# by DEFAULT_INCREASE_FRACTION of the configured rate after every
+# DEFAULT_HEALTHY_WINDOW successes
+DEFAULT_DECREASE_FACTOR = 0.5
+DEFAULT_INCREASE_FRACTION = 0.1
+DEFAULT_HEALTHY_WINDOW = 10
+DEFAULT_MIN_REQUESTS_PER_SECOND = 0.1
+
+
+def retry_after_seconds(value):
+    """Parse a Retry-After header (seconds or an HTTP date) into seconds; None if absent or invalid."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing `rate` requests per second with bursts of up to `burst`."""
+
+    def __init__(self, rate=DEFAULT_REQUESTS_PER_SECOND, burst=DEFAULT_BURST):
+        self._lock = threading.Lock()
+        self.configure(rate, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self.total_wait = 0.0
+        self.acquired = 0
+        self.throttled = 0
+
+    def configure(self, rate, burst=None):
+        """Change the allowed rate (and optionally the burst size) on the fly."""
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        with self._lock:
+            self.rate = float(rate)
+            if burst is not None:
+                self.burst = max(1, int(burst))
+            if getattr(self, '_tokens', 0) > self.burst:
+                self._tokens = float(self.burst)
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+
+    def _take(self, tokens, waited):
+        """Take tokens if available (returning 0) or return the seconds until they will be."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._refill(now)
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                self.acquired += 1
+                self.total_wait += waited
+                return 0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` are available and take them. Returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            delay = self._take(tokens, waited)
+            if not delay:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    async def acquire_async(self, tokens=1):
+        """Like acquire(), but waits with asyncio.sleep so the event loop keeps running."""
+        waited = 0.0
+        while True:
+            delay = self._take(tokens, waited)
+            if not delay:
+                return waited
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def record_response(self, status, retry_after=None):
+        """Note a response's status; a throttled one with Retry-After pauses every caller that long."""
+        if status in THROTTLE_STATUSES:
+            with self._lock:
+                self._throttle(time.monotonic(), retry_after)
+
+    def _throttle(self, now, retry_after):
+        self.throttled += 1
+        if retry_after:
+            self._paused_until = max(self._paused_until, now + retry_after)
+            # Tokens start accruing again when the pause ends, so it isn't followed by a burst
+            self._tokens = 0.0
+            self._updated = self._paused_until
+
+    def stats(self):
+        """Return the current limiter settings and counters."""
+        with self._lock:
+            return self._stats()
+
+    def _stats(self):
+        return {
+            'requests_per_second': round(self.rate, 3),
+            'burst': self.burst,
+            'acquired': self.acquired,
+            'total_wait_seconds': round(self.total_wait, 3),
+            'throttled': self.throttled,
+            'paused_seconds': round(max(0.0, self._paused_until - time.monotonic()), 3)
+        }
+
+
+class AdaptiveRateLimiter(TokenBucket):
+    """TokenBucket whose rate follows the server with AIMD, between min_rate and max_rate.
+
+    max_rate defaults to the configured rate, which is then never exceeded.
+
+    A 429 or 503 multiplies the rate by `decrease_factor`, at most once per
+    cooldown so that the rejections of requests already in flight count as
+    one, and empties the bucket. Every `healthy_window` successive 2xx/3xx
+    responses add `increase_fraction` of the configured rate.
+    """
+
+    def __init__(self, rate=DEFAULT_REQUESTS_PER_SECOND, burst=DEFAULT_BURST, max_rate=None,
+                 min_rate=DEFAULT_MIN_REQUESTS_PER_SECOND, decrease_factor=DEFAULT_DECREASE_FACTOR,
+                 increase_fraction=DEFAULT_INCREASE_FRACTION, healthy_window=DEFAULT_HEALTHY_WINDOW):
+        self.min_rate = min_rate
+        self.decrease_factor = decrease_factor
+        self.increase_fraction = increase_fraction
+        self.healthy_window = max(1, int(healthy_window))
+        self._max_rate = max_rate
+        self._healthy = 0
+        self._cooldown_until = 0.0
+        self.decreases = 0
+        self.increases = 0
+        super().__init__(rate, burst)
+
+    def configure(self, rate, burst=None, max_rate=None):
+        """Set the starting rate (and burst / ceiling); adaptation continues from there."""
+        super().configure(rate, burst)
+        with self._lock:
+            if max_rate is not None:
+                self._max_rate = max_rate
+            self.configured_rate = self.rate
+            self.max_rate = max(self.rate, self._max_rate or self.rate)
+            self.min_rate = min(self.min_rate, self.rate)
+            self.increase_step = self.rate * self.increase_fraction
+
+    def record_response(self, status, retry_after=None):
+        now = time.monotonic()
+        with self._lock:
+            if status in THROTTLE_STATUSES:
+                self._throttle(now, retry_after)
+                self._healthy = 0
+                if now >= self._cooldown_until:
+                    self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+                    self.decreases += 1
+                    self._tokens = 0.0
+                    self._cooldown_until = now + max(retry_after or 0, self.burst / self.rate)
+            elif 200 <= status < 400:
+                self._healthy += 1
+                if self._healthy >= self.healthy_window and self.rate < self.max_rate:
+                    self.rate = min(self.max_rate, self.rate + self.increase_step)
+                    self.increases += 1
+                    self._healthy = 0
+
+    def _stats(self):
+        stats = super()._stats()
+        stats.update({
+            'adaptive': True,
+            'configured_requests_per_second': self.configured_rate,
+            'min_requests_per_second': self.min_rate,
+            'max_requests_per_second': self.max_rate,
+            'decreases': self.decreases,
+            'increases': self.increases
+        })
+        return stats
+
+
+def limiter_from_config(sync_config):
+    """Build the MAL limiter the sync settings ask for; adaptive unless adaptive_rate is false."""
+    rate = sync_config.get('requests_per_second', DEFAULT_REQUESTS_PER_SECOND)
+    burst = sync_config.get('burst', DEFAULT_BURST)
+    if sync_config.get('adaptive_rate', True):
+        return AdaptiveRateLimiter(rate, burst, sync_config.get('max_requests_per_second'))
+    return TokenBucket(rate, burst)
@@ -0,0 +1,215 @@
+"""
+On-disk cache of idempotent MAL GET responses.
+
+MAL searches (/v2/anime?q=) and anime details (/v2/anime/{id}) are stored
+zlib-compressed in SQLite, keyed on the normalized request: host, path and
+the sorted query, with the search text whitespace-collapsed and case-folded.
+Each endpoint has its own TTL and the store is capped in size, evicting the
+least recently used responses first. A list update or delete through the
+transport drops the cached details of that anime, so a status check never
+sees the list as it was before our own write; details that carry the
+user's list status are only kept for LIST_STATUS_TTL seconds, as changes
+made on the MAL website are not seen otherwise.
+
+The mode is 'use' (read and write), 'refresh' (skip reads, store fresh
+responses) or 'bypass' (leave the cache alone).
+"""
+
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from metrics import endpoint_name
+from title_normalizer import fold_query
+
+RESPONSE_CACHE_FILE = "response_cache.db"
+DEFAULT_MAX_MB = 64
+# Seconds a response stays fresh, per endpoint; 0 turns caching off for it
+DEFAULT_CACHE_TTLS = {
+    'mal_search': 24 * 3600,
+    'mal_detail': 10 * 60
+}
+# Requests for the user's list status (fields=my_list_status) are fresh at most this long,
+# enough to share a lookup within a run but not to hide changes made on the MAL website
+LIST_STATUS_TTL = 5
+CACHE_MODES = ('use', 'refresh', 'bypass')
+# Eviction frees space down to this fraction of the cap, so it does not run on every store
+EVICT_TO = 0.9
+
+
+def request_key(method, url, params=None):
+    """Normalize a request into a cache key: method, host, path and the sorted query."""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        items = params.items() if hasattr(params, 'items') else params
+        query += [(name, str(value)) for name, value in items]
+    normalized = sorted((name, fold_query(value) if name == 'q' else value) for name, value in query)
+    return f"{method.upper()} {parts.netloc}{parts.path.rstrip('/')}?{urlencode(normalized)}"
+
+
+def _reads_list_status(key):
+    query = dict(parse_qsl(key.partition('?')[2]))
+    return 'my_list_status' in query.get('fields', '').split(',')
+
+
+def _resource(url):
+    return urlsplit(url).netloc + urlsplit(url).path.rstrip('/')
+
+
+class ResponseCache:
+    """SQLite-backed, size-capped LRU cache of MAL GET responses with per-endpoint TTLs."""
+
+    def __init__(self, path=RESPONSE_CACHE_FILE, max_mb=DEFAULT_MAX_MB, ttls=None, mode='use'):
+        self.path = path
+        self._lock = threading.Lock()
+        self.ttls = dict(DEFAULT_CACHE_TTLS)
+        self.configure(max_mb, ttls, mode)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS responses (
+                   request_key TEXT PRIMARY KEY,
+                   resource TEXT NOT NULL,
+                   endpoint TEXT NOT NULL,
+                   content_type TEXT,
+                   body BLOB NOT NULL,
+                   size INTEGER NOT NULL,
+                   raw_size INTEGER NOT NULL,
+                   expires_at REAL NOT NULL,
+                   last_used REAL NOT NULL
+               );
+               CREATE INDEX IF NOT EXISTS responses_resource ON responses (resource);
+               CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);"""
+        )
+        self._conn.commit()
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self.counters = {'hits': 0, 'misses': 0, 'stores': 0, 'bytes_saved': 0, 'evictions': 0,
+                         'invalidations': 0}
+
+    def configure(self, max_mb=None, ttls=None, mode=None):
+        if max_mb is not None:
+            self.max_bytes = max(1, int(float(max_mb) * 1024 * 1024))
+        if ttls:
+            self.ttls.update(ttls)
+        if mode is not None:
+            if mode not in CACHE_MODES:
+                raise ValueError(f"response cache mode must be one of {', '.join(CACHE_MODES)}")
+            self.mode = mode
+
+    def key_for(self, method, url, params=None):
+        """Return the cache key of a request, or None if it is not cached."""
+        if self.mode == 'bypass' or method.upper() != 'GET':
+            return None
+        if not self.ttls.get(endpoint_name(method, url)):
+            return None
+        return request_key(method, url, params)
+
+    def get(self, key):
+        """Return (content_type, body) of a fresh cached response, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            if self.mode != 'use':
+                self.counters['misses'] += 1
+                return None
+            row = self._conn.execute(
+                "SELECT content_type, body, raw_size, expires_at FROM responses WHERE request_key = ?",
+                (key,)
+            ).fetchone()
+            if row is None or row[3] <= now:
+                self.counters['misses'] += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE request_key = ?", (now, key))
+            self._conn.commit()
+            self.counters['hits'] += 1
+            self.counters['bytes_saved'] += row[2]
+        return row[0], zlib.decompress(row[1])
+
+    def put(self, key, url, content_type, body):
+        """Store a successful response body under key."""
+        if self.mode == 'bypass':
+            return
+        endpoint = endpoint_name('GET', url)
+        ttl = self.ttls.get(endpoint, 0)
+        if _reads_list_status(key):
+            ttl = min(ttl, LIST_STATUS_TTL)
+        packed = zlib.compress(body)
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE request_key = ?",
+                                     (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, _resource(url), endpoint, content_type, packed, len(packed), len(body),
+                 now + ttl, now)
+            )
+            self._bytes += len(packed) - (old[0] if old else 0)
+            self.counters['stores'] += 1
+            if self._bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # Expired responses go first, then the least recently used ones
+        target = self.max_bytes * EVICT_TO
+        rows = self._conn.execute(
+            "SELECT request_key, size FROM responses ORDER BY expires_at > ?, last_used",
+            (time.time(),)
+        )
+        evicted = []
+        for key, size in rows:
+            if self._bytes <= target:
+                break
+            evicted.append((key,))
+            self._bytes -= size
+        self._conn.executemany("DELETE FROM responses WHERE request_key = ?", evicted)
+        self.counters['evictions'] += len(evicted)
+
+    def written(self, method, url):
+        """Drop the cached details of an anime after its list status was updated or deleted."""
+        if endpoint_name(method, url) not in ('mal_update', 'mal_delete'):
+            return 0
+        resource = _resource(url).rsplit('/', 1)[0]
+        with self._lock:
+            size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses WHERE resource = ?",
+                                      (resource,)).fetchone()[0]
+            cursor = self._conn.execute("DELETE FROM responses WHERE resource = ?", (resource,))
+            self._conn.commit()
+            self._bytes -= size
+            self.counters['invalidations'] += cursor.rowcount
+            return cursor.rowcount
+
+    def clear(self):
+        """Delete every cached response. Returns how many there were."""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._bytes = 0
+            return cursor.rowcount
+
+    def snapshot(self):
+        """The hit/miss counters so far, for since()."""
+        with self._lock:
+            return dict(self.counters)
+
+    def since(self, snapshot=None):
+        """Hits, misses, hit ratio and bytes saved since snapshot (default: since the cache was opened)."""
+        current = self.snapshot()
+        delta = {name: value - (snapshot or {}).get(name, 0) for name, value in current.items()}
+        lookups = delta['hits'] + delta['misses']
+        delta['hit_ratio'] = round(delta['hits'] / lookups, 3) if lookups else 0.0
+        return delta
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            stored = self._bytes
+        return dict(self.since(), mode=self.mode, entries=entries, bytes=stored,
+                    max_bytes=self.max_bytes, ttls=dict(self.ttls))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,320 @@
+"""
+Durable retry queue and dead-letter list for failed MAL searches and updates.
+
+A series whose MAL search or list update failed in a way worth retrying
+(429/503 throttling, other 5xx, timeouts, dropped connections) is queued
+with the stage that failed and, for updates, the match and status it was
+going to write. Queued items are retried with exponential backoff at the
+start of the next CLI run or by the web app's background worker. An item
+that fails `max_attempts` times, or fails in a way retrying cannot fix,
+moves to the dead-letter list until it is requeued or discarded.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+try:
+    import aiohttp
+except ImportError:  # Only needed for the async engine
+    aiohttp = None
+
+from match_cache import series_key
+from profiling import in_session
+from rate_limit import THROTTLE_STATUSES
+
+RETRY_QUEUE_FILE = "retry_queue.db"
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_RETRY_BASE_SECONDS = 60
+DEFAULT_RETRY_MAX_SECONDS = 6 * 3600
+# How often the web app's worker looks for due retries
+DEFAULT_RETRY_POLL_SECONDS = 60
+
+
+def failure_reason(error):
+    """Classify a failed MAL call (an exception or HTTP status) as worth retrying.
+
+    Returns 'throttled', 'server_error', 'timeout' or 'connection', or None
+    when retrying would not help (4xx responses, bad data, bugs).
+    """
+    status = error if isinstance(error, int) else None
+    if status is None:
+        response = getattr(error, 'response', None)
+        status = getattr(response, 'status_code', None) or getattr(error, 'status', None)
+    if isinstance(status, int):
+        if status in THROTTLE_STATUSES:
+            return 'throttled'
+        return 'server_error' if status >= 500 else None
+    if isinstance(error, (requests.exceptions.Timeout, asyncio.TimeoutError, TimeoutError)):
+        return 'timeout'
+    if isinstance(error, (requests.exceptions.ConnectionError, ConnectionError)):
+        return 'connection'
+    if aiohttp is not None and isinstance(error, aiohttp.ClientConnectionError):
+        return 'connection'
+    return None
+
+
+def retry_delay(attempts, base=DEFAULT_RETRY_BASE_SECONDS, limit=DEFAULT_RETRY_MAX_SECONDS):
+    """Seconds to wait before retry number `attempts` (1-based): base, 2*base, 4*base... up to limit."""
+    return min(limit, base * (2 ** max(0, attempts - 1)))
+
+
+class RetryQueue:
+    """SQLite-backed queue of failed series, with their backoff schedule and dead letters."""
+
+    def __init__(self, path=RETRY_QUEUE_FILE, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 base_delay=DEFAULT_RETRY_BASE_SECONDS, max_delay=DEFAULT_RETRY_MAX_SECONDS):
+        self.path = path
+        self._lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self.configure(max_attempts, base_delay, max_delay)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS retry_items (
+                item_key TEXT PRIMARY KEY,
+                stage TEXT NOT NULL,
+                series TEXT NOT NULL,
+                mal_id INTEGER,
+                mal_title TEXT,
+                mal_status TEXT,
+                attempts INTEGER DEFAULT 0,
+                reason TEXT,
+                last_error TEXT,
+                next_attempt_at REAL,
+                dead_at REAL,
+                created_at REAL,
+                updated_at REAL
+            )"""
+        )
+        self._conn.commit()
+        # Every finished item clears its key, so keep the keys in memory to skip needless deletes
+        self._keys = {row[0] for row in self._conn.execute("SELECT item_key FROM retry_items")}
+        self.counters = {'queued': 0, 'retried': 0, 'recovered': 0, 'dead_lettered': 0}
+
+    def configure(self, max_attempts=None, base_delay=None, max_delay=None):
+        if max_attempts is not None:
+            self.max_attempts = max(1, int(max_attempts))
+        if base_delay is not None:
+            self.base_delay = max(0.0, float(base_delay))
+        if max_delay is not None:
+            self.max_delay = max(self.base_delay, float(max_delay))
+
+    def push(self, series, stage, error, mal_id=None, mal_title=None, mal_status=None):
+        """Queue series after a failed stage ('search' or 'update'); returns 'queued' or 'dead'.
+
+        The attempt count carries over from earlier failures of the same
+        series; failures that retrying cannot fix go straight to the dead letters.
+        """
+        key = series_key(series, series.get('title'))
+        reason = failure_reason(error)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT attempts, created_at FROM retry_items WHERE item_key = ?",
+                                     (key,)).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            dead = reason is None or attempts >= self.max_attempts
+            next_attempt = None if dead else now + retry_delay(attempts, self.base_delay, self.max_delay)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO retry_items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, stage, json.dumps(series), mal_id, mal_title, mal_status, attempts,
+                 reason or 'permanent', str(error), next_attempt, now if dead else None,
+                 row[1] if row else now, now)
+            )
+            self._conn.commit()
+            self._keys.add(key)
+            self.counters['dead_lettered' if dead else 'queued'] += 1
+        return 'dead' if dead else 'queued'
+
+    def resolve(self, series):
+        """Drop series from the queue and the dead letters once it has synced (or has nothing to sync)."""
+        key = series_key(series, series.get('title'))
+        with self._lock:
+            if key not in self._keys:
+                return False
+            self._conn.execute("DELETE FROM retry_items WHERE item_key = ?", (key,))
+            self._conn.commit()
+            self._keys.discard(key)
+            return True
+
+    def _entry_from_row(self, row):
+        return {
+            'item_key': row[0],
+            'stage': row[1],
+            'series': json.loads(row[2]),
+            'mal_id': row[3],
+            'mal_title': row[4],
+            'mal_status': row[5],
+            'attempts': row[6],
+            'reason': row[7],
+            'last_error': row[8],
+            'next_attempt_at': row[9],
+            'dead_at': row[10],
+            'created_at': row[11],
+            'updated_at': row[12]
+        }
+
+    def due(self, now=None, limit=None):
+        """Return the queued items whose next attempt is due, oldest schedule first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM retry_items WHERE dead_at IS NULL AND next_attempt_at <= ? "
+                "ORDER BY next_attempt_at LIMIT ?", (now or time.time(), limit or -1)
+            ).fetchall()
+        return [self._entry_from_row(row) for row in rows]
+
+    def pending(self, limit=100):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM retry_items WHERE dead_at IS NULL ORDER BY next_attempt_at LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [self._entry_from_row(row) for row in rows]
+
+    def dead_letters(self, limit=100):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM retry_items WHERE dead_at IS NOT NULL ORDER BY dead_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [self._entry_from_row(row) for row in rows]
+
+    def requeue(self, item_key=None):
+        """Move one dead letter (or all of them) back to the queue with a fresh attempt count."""
+        query = ("UPDATE retry_items SET dead_at = NULL, attempts = 0, next_attempt_at = ?, "
+                 "updated_at = ? WHERE dead_at IS NOT NULL")
+        params = [time.time(), time.time()]
+        if item_key is not None:
+            query += " AND item_key = ?"
+            params.append(item_key)
+        with self._lock:
+            cursor = self._conn.execute(query, params)
+            self._conn.commit()
+            return cursor.rowcount
+
+    def discard(self, item_key=None):
+        """Delete one dead letter (or all of them). Returns how many were deleted."""
+        with self._lock:
+            if item_key is None:
+                keys = [row[0] for row in self._conn.execute(
+                    "SELECT item_key FROM retry_items WHERE dead_at IS NOT NULL")]
+            else:
+                keys = [row[0] for row in self._conn.execute(
+                    "SELECT item_key FROM retry_items WHERE dead_at IS NOT NULL AND item_key = ?",
+                    (item_key,))]
+            self._conn.executemany("DELETE FROM retry_items WHERE item_key = ?", [(k,) for k in keys])
+            self._conn.commit()
+            self._keys.difference_update(keys)
+            return len(keys)
+
+    def next_due_at(self):
+        """When the earliest queued item falls due, or None if the queue is empty."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_attempt_at) FROM retry_items WHERE dead_at IS NULL"
+            ).fetchone()
+        return row[0]
+
+    def drain(self, process, workers=1, limit=None):
+        """Retry every due item with process(entry), on up to `workers` threads.
+
+        process returns None once the item has synced (or turned out to have
+        nothing to sync) and the error otherwise, which requeues it with the
+        next backoff or dead-letters it. Returns the counts of this drain.
+        """
+        if not self._drain_lock.acquire(blocking=False):
+            return None
+        try:
+            entries = self.due(limit=limit)
+            counts = {'retried': len(entries), 'recovered': 0, 'requeued': 0, 'dead_lettered': 0}
+            if not entries:
+                return counts
+
+            def retry(entry):
+                try:
+                    return process(entry)
+                except Exception as e:
+                    return e
+
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                for entry, error in zip(entries, pool.map(in_session(retry), entries)):
+                    if error is None:
+                        self.resolve(entry['series'])
+                        counts['recovered'] += 1
+                        continue
+                    outcome = self.push(entry['series'], entry['stage'], error, entry['mal_id'],
+                                        entry['mal_title'], entry['mal_status'])
+                    counts['dead_lettered' if outcome == 'dead' else 'requeued'] += 1
+            with self._lock:
+                self.counters['retried'] += counts['retried']
+                self.counters['recovered'] += counts['recovered']
+            return counts
+        finally:
+            self._drain_lock.release()
+
+    def stats(self):
+        with self._lock:
+            pending, due, dead = self._conn.execute(
+                "SELECT COALESCE(SUM(dead_at IS NULL), 0), "
+                "COALESCE(SUM(dead_at IS NULL AND next_attempt_at <= ?), 0), "
+                "COALESCE(SUM(dead_at IS NOT NULL), 0) FROM retry_items", (time.time(),)
+            ).fetchone()
+            return dict(self.counters, pending=pending, due=due, dead_letters=dead,
+                        max_attempts=self.max_attempts)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RetryWorker:
+    """Drains a RetryQueue on a daemon thread whenever items fall due and `is_busy()` is false."""
+
+    def __init__(self, queue, process, poll_seconds=DEFAULT_RETRY_POLL_SECONDS, is_busy=None):
+        self.queue = queue
+        self._process = process
+        self._is_busy = is_busy
+        self.poll_seconds = max(1.0, float(poll_seconds))
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+        self.last_drain = None
+
+    def run_due(self):
+        """Drain due items unless a sync is running. Returns the drain's counts, or None."""
+        if self._is_busy and self._is_busy():
+            return None
+        counts = self.queue.drain(self._process)
+        if counts and counts['retried']:
+            print(f"🔁 Retried {counts['retried']} failed items: {counts['recovered']} recovered, "
+                  f"{counts['requeued']} requeued, {counts['dead_lettered']} dead-lettered")
+            self.last_drain = dict(counts, finished_at=time.time())
+        return counts
+
+    def serve_forever(self):
+        while not self._stopped:
+            try:
+                self.run_due()
+            except Exception as e:
+                print(f"❌ Retry queue drain failed: {e}")
+            next_due = self.queue.next_due_at()
+            wait = self.poll_seconds if next_due is None else max(1.0, next_due - time.time())
+            self._wake.wait(min(self.poll_seconds, wait))
+            self._wake.clear()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        """Look for due items now, e.g. after dead letters were requeued."""
+        self._wake.set()
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
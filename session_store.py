@@ -0,0 +1,190 @@
+"""
+Bounded store of web sync sessions.
+
+Running sessions live in memory. When a session finishes its result set is
+written to disk as zlib-compressed JSON and dropped from memory; the small
+summary that is left is evicted once the session is older than the TTL or
+the store holds more than `max_sessions` (least recently used first).
+Finished sessions are then served from disk until they too pass the TTL or
+more than `max_sessions` newer ones have been written.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+SESSION_FILE = "sync_sessions.db"
+DEFAULT_MAX_SESSIONS = 20
+DEFAULT_SESSION_TTL_HOURS = 24
+
+
+def pack_results(results):
+    """Serialize a result list compactly (minified JSON, zlib-compressed)."""
+    return zlib.compress(json.dumps(results, separators=(',', ':')).encode('utf-8'))
+
+
+def unpack_results(blob):
+    return json.loads(zlib.decompress(blob).decode('utf-8')) if blob else []
+
+
+class SessionStore:
+    """Sync sessions keyed by session id, with finished result sets spilled to SQLite."""
+
+    def __init__(self, path=SESSION_FILE, max_sessions=DEFAULT_MAX_SESSIONS,
+                 ttl_hours=DEFAULT_SESSION_TTL_HOURS):
+        self.path = path
+        self.max_sessions = max(1, int(max_sessions))
+        self.ttl = ttl_hours * 3600
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()  # Least recently used first
+        self._finished_at = {}
+        self.evictions = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                results BLOB,
+                finished_at REAL
+            )"""
+        )
+        self._conn.commit()
+
+    def configure(self, max_sessions=None, ttl_hours=None):
+        with self._lock:
+            if max_sessions is not None:
+                self.max_sessions = max(1, int(max_sessions))
+            if ttl_hours is not None:
+                self.ttl = ttl_hours * 3600
+            self._evict(time.time())
+            self._conn.commit()
+
+    def create(self, session_id, session):
+        """Register a new live session dict; returns it."""
+        with self._lock:
+            self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            self._finished_at.pop(session_id, None)
+            self._evict(time.time())
+            self._conn.commit()
+        return session
+
+    def get(self, session_id):
+        """Return the in-memory session dict, or None if it is not held in memory."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def __getitem__(self, session_id):
+        session = self.get(session_id)
+        if session is None:
+            raise KeyError(session_id)
+        return session
+
+    def __contains__(self, session_id):
+        with self._lock:
+            return session_id in self._sessions
+
+    def finish(self, session_id):
+        """Move a finished session's results to disk, keeping only its summary in memory."""
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            results = session.pop('results', None) or []
+            session['results_on_disk'] = True
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+                (session_id, json.dumps(session), pack_results(results), now)
+            )
+            self._finished_at[session_id] = now
+            self._evict(now)
+            self._conn.commit()
+
+    def status(self, session_id, since=0):
+        """Return the session with its results from position `since` on.
+
+        Live sessions are served from memory and finished ones from disk;
+        `cursor` is the position to pass as `since` next time.
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                if not session.get('results_on_disk'):
+                    # Only the new tail is copied, so polling stays cheap as results grow
+                    results = session.get('results') or []
+                    cursor = len(results)
+                    return dict(session, results=results[since:cursor], cursor=cursor, since=since)
+            row = self._conn.execute(
+                "SELECT summary, results FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if not row:
+            return None
+        status = json.loads(row[0])
+        results = unpack_results(row[1])
+        status.update(results=results[since:], cursor=len(results), since=since)
+        return status
+
+    def _evict(self, now):
+        """Drop finished sessions past the TTL, then the least recently used over the cap.
+
+        On disk, result sets past the TTL and all but the `max_sessions` most
+        recently finished are deleted; the caller commits.
+        """
+        for session_id in [sid for sid, finished in self._finished_at.items()
+                           if now - finished > self.ttl]:
+            self._drop(session_id)
+        for session_id in list(self._sessions):
+            if len(self._sessions) <= self.max_sessions:
+                break
+            if session_id in self._finished_at:
+                self._drop(session_id)
+        expired = [row[0] for row in self._conn.execute(
+            "SELECT session_id FROM sessions WHERE finished_at < ? OR session_id NOT IN "
+            "(SELECT session_id FROM sessions ORDER BY finished_at DESC LIMIT ?)",
+            (now - self.ttl, self.max_sessions)
+        )]
+        if expired:
+            self._conn.executemany("DELETE FROM sessions WHERE session_id = ?",
+                                   [(session_id,) for session_id in expired])
+            for session_id in expired:
+                if session_id in self._finished_at:
+                    self._drop(session_id)
+
+    def _drop(self, session_id):
+        self._sessions.pop(session_id, None)
+        self._finished_at.pop(session_id, None)
+        self.evictions += 1
+
+    def stats(self):
+        """Return how many sessions and results are held in memory and on disk."""
+        with self._lock:
+            self._evict(time.time())
+            self._conn.commit()
+            live = [s for sid, s in self._sessions.items() if sid not in self._finished_at]
+            memory_bytes = sum(len(json.dumps(s, default=str)) for s in self._sessions.values())
+            disk = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(results)), 0) FROM sessions"
+            ).fetchone()
+            return {
+                'max_sessions': self.max_sessions,
+                'ttl_hours': self.ttl / 3600,
+                'sessions_in_memory': len(self._sessions),
+                'live_sessions': len(live),
+                'results_in_memory': sum(len(s.get('results') or []) for s in live),
+                'approx_memory_bytes': memory_bytes,
+                'sessions_on_disk': disk[0],
+                'results_bytes_on_disk': disk[1],
+                'evictions': self.evictions
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -58,6 +58,11 @@ def create_config():
     config["sync"]["minimum_match_score"] = 75
     config["sync"]["auto_sync"] = False
     config["sync"]["sync_interval_hours"] = 24
+    config["sync"]["workers"] = 1
+    config["sync"]["requests_per_second"] = 1.0
+    config["sync"]["burst"] = 3
+    config["sync"]["engine"] = "threads"
+    config["sync"]["concurrency"] = 32
     
     # Save configuration
     try:
@@ -71,9 +76,18 @@ def create_config():
 
 def check_dependencies():
     """Check if required packages are installed"""
-    required_packages = ["requests", "fuzzywuzzy", "python-levenshtein", "flask", "flask-socketio"]
+    required_packages = ["requests", "rapidfuzz", "flask", "flask-socketio"]
+    # Only the async engine (engine: async / --engine async) needs these
+    optional_packages = ["aiohttp"]
     missing_packages = []
     
+    for package in optional_packages:
+        try:
+            __import__(package)
+        except ImportError:
+            print(f"⚠️  Optional package {package} is not installed; the async engine is unavailable "
+                  f"(pip install {package})")
+    
     for package in required_packages:
         try:
             __import__(package.replace("-", "_"))
@@ -0,0 +1,112 @@
+"""
+Coalescing of identical MAL searches within one sync run.
+
+Several Sonarr series often clean to the same query ("Title Season 2",
+"Title Part 2" and "Title (2019)" all search for "Title"), and so can their
+raw-title fallback searches. A SingleFlight made for a run sends each unique
+query (keyed with fold_query) once: callers asking while it is in flight
+wait for it and later callers get its results, which every series then
+scores against its own title. A failed search is raised in every caller
+waiting on it but not remembered, so the next caller tries again.
+
+AsyncSingleFlight does the same for coroutines on one event loop.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+
+from title_normalizer import fold_query
+
+SEARCH_METRIC = 'mal_searches_total'
+
+
+def search_key(query, limit=None):
+    """Key of a MAL search: the folded query text and the result limit."""
+    return fold_query(query), limit
+
+
+class _Flights:
+    """Results and in-flight calls of one run, and how many calls were saved."""
+
+    def __init__(self, metrics=None, metric=SEARCH_METRIC):
+        self.metrics = metrics
+        self.metric = metric
+        self._results = {}
+        self._flights = {}
+        self.counters = {'sent': 0, 'coalesced': 0}
+
+    def _count(self, result):
+        self.counters[result] += 1
+        if self.metrics is not None:
+            self.metrics.inc(self.metric, result=result)
+
+    def stats(self):
+        calls = self.counters['sent'] + self.counters['coalesced']
+        return dict(self.counters, unique=len(self._results),
+                    saved_ratio=round(self.counters['coalesced'] / calls, 3) if calls else 0.0)
+
+
+class SingleFlight(_Flights):
+    """Runs fn once per key across threads; duplicate callers share its result."""
+
+    def __init__(self, metrics=None, metric=SEARCH_METRIC):
+        super().__init__(metrics, metric)
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Return fn()'s result for key, calling fn only if no other caller has (or is)."""
+        with self._lock:
+            if key in self._results:
+                self._count('coalesced')
+                return self._results[key]
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Future()
+            self._count('sent' if leader else 'coalesced')
+        if not leader:
+            return flight.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                del self._flights[key]
+            flight.set_exception(e)
+            raise
+        with self._lock:
+            del self._flights[key]
+            self._results[key] = result
+        flight.set_result(result)
+        return result
+
+
+class AsyncSingleFlight(_Flights):
+    """SingleFlight for coroutines: await do(key, make) awaits make() once per key."""
+
+    async def do(self, key, make):
+        if key in self._results:
+            self._count('coalesced')
+            return self._results[key]
+        flight = self._flights.get(key)
+        if flight is not None:
+            self._count('coalesced')
+            # A waiter being cancelled must not cancel the search the others wait on
+            return await asyncio.shield(flight)
+        self._count('sent')
+        flight = self._flights[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await make()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as e:
+            flight.set_exception(e)
+            # Retrieved here, so a search nobody else waited on does not log "never retrieved"
+            flight.exception()
+            raise
+        finally:
+            del self._flights[key]
+        self._results[key] = result
+        flight.set_result(result)
+        return result
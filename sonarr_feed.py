@@ -0,0 +1,156 @@
+"""
+Streaming reader for Sonarr's /api/v3/series feed.
+
+Parses the JSON array incrementally from the socket so only one series is
+held in full at a time; callers filter each series as it arrives and keep a
+compact record with just the fields the sync uses.
+"""
+
+import codecs
+import json
+import sys
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+from http_client import default_client
+
+CHUNK_SIZE = 64 * 1024
+
+# Fields of a Sonarr series the sync actually reads
+SERIES_FIELDS = ('id', 'tvdbId', 'title', 'year', 'status', 'seriesType', 'path', 'tags')
+
+_decoder = json.JSONDecoder()
+
+
+def compact_series(series):
+    """Project a full Sonarr series dict down to SERIES_FIELDS."""
+    return {field: series.get(field) for field in SERIES_FIELDS if field in series}
+
+
+def peak_rss_mb():
+    """Return the process peak resident set size in MB, or None where unsupported."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and KB elsewhere
+    if sys.platform == 'darwin':
+        peak /= 1024
+    return round(peak / 1024, 1)
+
+
+class StreamStats:
+    """Counters describing one streamed feed."""
+
+    def __init__(self):
+        self.bytes_read = 0
+        self.series_seen = 0
+        self.series_kept = 0
+        self.peak_buffer_bytes = 0
+
+    def as_dict(self):
+        return {
+            'bytes_read': self.bytes_read,
+            'series_seen': self.series_seen,
+            'series_kept': self.series_kept,
+            'peak_buffer_bytes': self.peak_buffer_bytes,
+            'peak_rss_mb': peak_rss_mb()
+        }
+
+
+class JsonArrayParser:
+    """Incremental parser for a top-level JSON array fed as text chunks.
+
+    The buffer only ever holds the unparsed tail of the stream, so memory is
+    bounded by the largest single element plus one chunk.
+    """
+
+    def __init__(self, stats=None):
+        self.stats = stats
+        self.done = False
+        self._buffer = ''
+        self._pos = 0
+        self._started = False
+
+    def feed(self, chunk):
+        """Add a chunk of text and return the elements it completed."""
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        if self.stats:
+            self.stats.peak_buffer_bytes = max(self.stats.peak_buffer_bytes, len(self._buffer))
+        return self._parse(eof=False)
+
+    def close(self):
+        """Signal the end of the stream; returns any remaining elements."""
+        values = self._parse(eof=True)
+        if not self.done:
+            if self._started:
+                raise ValueError("Truncated JSON array")
+            self.done = True
+        return values
+
+    def _parse(self, eof):
+        values = []
+        buffer = self._buffer
+        pos = self._pos
+        while not self.done:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos >= len(buffer):
+                break
+            if not self._started:
+                if buffer[pos] != '[':
+                    raise ValueError("Expected a JSON array")
+                self._started = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                self.done = True
+                break
+            try:
+                value, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                break
+            if (not eof and not isinstance(value, (dict, list))
+                    and (end == len(buffer) or buffer[end] not in ' \t\r\n,]')):
+                # A scalar (e.g. a number) may continue in the next chunk
+                break
+            pos = end
+            if self.stats:
+                self.stats.series_seen += 1
+            values.append(value)
+        self._pos = pos
+        return values
+
+
+def iter_json_array(chunks, stats=None):
+    """Yield the elements of a top-level JSON array from an iterable of text chunks."""
+    parser = JsonArrayParser(stats)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+        if parser.done:
+            return
+    yield from parser.close()
+
+
+def stream_series(url, api_key, client=default_client, stats=None):
+    """Yield every series from a Sonarr /api/v3/series endpoint as it is parsed."""
+    headers = {"X-Api-Key": api_key}
+    response = client.get(url, headers=headers, stream=True)
+    try:
+        response.raise_for_status()
+        decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')()
+
+        def chunks():
+            for chunk in response.iter_content(CHUNK_SIZE):
+                if stats:
+                    stats.bytes_read += len(chunk)
+                yield decoder.decode(chunk)
+
+        yield from iter_json_array(chunks(), stats)
+    finally:
+        response.close()
@@ -0,0 +1,106 @@
+"""
+Sonarr Connect/Webhook events.
+
+Sonarr posts an event for every series added, deleted or downloaded. Instead
+of rescanning the whole library, the affected series are collected and
+handed on in one batch once events have been quiet for `debounce_seconds`
+(or at most `max_delay_seconds` after the first one), so an import of many
+episodes or series becomes a single small sync.
+"""
+
+import threading
+import time
+
+# Events that (re)sync their series; deletions only forget it
+SYNC_EVENTS = ('SeriesAdd', 'Download')
+DELETE_EVENTS = ('SeriesDelete',)
+DEFAULT_DEBOUNCE_SECONDS = 5
+DEFAULT_MAX_DELAY_SECONDS = 60
+
+
+def event_series(payload):
+    """Return (event_type, series) from a webhook payload; series is None if it names none."""
+    payload = payload or {}
+    series = payload.get('series') or {}
+    return payload.get('eventType'), series if series.get('id') is not None else None
+
+
+class WebhookQueue:
+    """Debounces series from webhook events into batches.
+
+    `sync_series(series_ids)` receives each batch; `forget_series(series)`
+    is called right away for deleted series.
+    """
+
+    def __init__(self, sync_series, forget_series=None, debounce_seconds=DEFAULT_DEBOUNCE_SECONDS,
+                 max_delay_seconds=DEFAULT_MAX_DELAY_SECONDS):
+        self._sync_series = sync_series
+        self._forget_series = forget_series
+        self.debounce = debounce_seconds
+        self.max_delay = max_delay_seconds
+        self._lock = threading.Lock()
+        self._pending = {}  # Sonarr series id -> event type that queued it
+        self._first_event_at = None
+        self._timer = None
+        self.events = {}
+        self.batches = 0
+        self.series_synced = 0
+
+    def add(self, payload):
+        """Handle one webhook payload. Returns a dict describing what was done with it."""
+        event_type, series = event_series(payload)
+        with self._lock:
+            self.events[event_type] = self.events.get(event_type, 0) + 1
+        if series is None or event_type not in SYNC_EVENTS + DELETE_EVENTS:
+            return {'event': event_type, 'action': 'ignored'}
+
+        if event_type in DELETE_EVENTS:
+            with self._lock:
+                self._pending.pop(series['id'], None)
+            if self._forget_series:
+                self._forget_series(series)
+            return {'event': event_type, 'series_id': series['id'], 'action': 'forgotten'}
+
+        with self._lock:
+            now = time.monotonic()
+            self._pending[series['id']] = event_type
+            if self._first_event_at is None:
+                self._first_event_at = now
+            # Each event restarts the quiet period, but never past the maximum delay
+            delay = min(self.debounce, self._first_event_at + self.max_delay - now)
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(max(0, delay), self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+            queued = len(self._pending)
+        return {'event': event_type, 'series_id': series['id'], 'action': 'queued', 'pending': queued}
+
+    def flush(self):
+        """Hand the pending series on as one batch now."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            series_ids = sorted(self._pending)
+            self._pending = {}
+            self._first_event_at = None
+            if not series_ids:
+                return
+            self.batches += 1
+            self.series_synced += len(series_ids)
+        try:
+            self._sync_series(series_ids)
+        except Exception as e:
+            print(f"Error syncing series from Sonarr webhook: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'debounce_seconds': self.debounce,
+                'max_delay_seconds': self.max_delay,
+                'events': dict(self.events),
+                'pending': len(self._pending),
+                'batches': self.batches,
+                'series_synced': self.series_synced
+            }
@@ -1,16 +1,36 @@
-import requests
 import json
 import base64
 import hashlib
 import os
 import secrets
 import time
-import re
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 import webbrowser
-from fuzzywuzzy import fuzz, process
+import uuid
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from match_cache import MatchCache, MATCH_CACHE_FILE, series_key
+from rate_limit import limiter_from_config, DEFAULT_REQUESTS_PER_SECOND, DEFAULT_BURST
+from http_client import default_client as transport, DEFAULT_HTTP_SETTINGS
+from mal_list import build_list_index, MAL_API_BASE_URL, MAL_AUTH_BASE_URL
+from catalog_index import CatalogIndex, CATALOG_FILE, import_catalog
+from title_matching import TitleScorer, CLI_WEIGHTS
+from title_normalizer import clean_title
+from single_flight import SingleFlight, search_key
+from sync_state import SyncState, SYNC_STATE_FILE
+from checkpoints import CheckpointStore, CHECKPOINT_FILE
+from retry_queue import (RetryQueue, RETRY_QUEUE_FILE, DEFAULT_MAX_ATTEMPTS, DEFAULT_RETRY_BASE_SECONDS,
+                         failure_reason)
+from response_cache import ResponseCache, RESPONSE_CACHE_FILE, DEFAULT_MAX_MB, DEFAULT_CACHE_TTLS
+from sonarr_feed import stream_series, compact_series, StreamStats
+from token_manager import TokenManager
+from metrics import default_metrics as metrics, SYNC_PHASES
+from profiling import Profiler, PROFILE_DIR, trace_span, trace_title, traced, in_session
+from auto_sync import AutoSync, AUTO_SYNC_FILE, DEFAULT_SYNC_INTERVAL_HOURS, DEFAULT_JITTER_MINUTES
+from async_engine import (AsyncHttpClient, AsyncSyncEngine, SeriesMatcher, ENGINES,
+                          DEFAULT_CONCURRENCY, aiohttp)
 
 # Configuration Management
 CONFIG_FILE = "config.json"
@@ -26,14 +46,37 @@ def load_config():
         "mal": {
             "client_id": "",
             "client_secret": "",
-            "redirect_uri": "http://localhost:8765/callback"
+            "redirect_uri": "http://localhost:8765/callback",
+            "api_base_url": MAL_API_BASE_URL,
+            "auth_base_url": MAL_AUTH_BASE_URL
         },
         "sync": {
             "default_status": "completed",
             "minimum_match_score": 75,
             "auto_sync": False,
-            "sync_interval_hours": 24
-        }
+            "sync_interval_hours": DEFAULT_SYNC_INTERVAL_HOURS,
+            "auto_sync_jitter_minutes": DEFAULT_JITTER_MINUTES,
+            "auto_sync_file": AUTO_SYNC_FILE,
+            "workers": 1,
+            "requests_per_second": DEFAULT_REQUESTS_PER_SECOND,
+            "burst": DEFAULT_BURST,
+            "adaptive_rate": True,
+            "max_requests_per_second": None,
+            "catalog_file": CATALOG_FILE,
+            "state_file": SYNC_STATE_FILE,
+            "checkpoint_file": CHECKPOINT_FILE,
+            "retry_queue_file": RETRY_QUEUE_FILE,
+            "retry_max_attempts": DEFAULT_MAX_ATTEMPTS,
+            "retry_base_seconds": DEFAULT_RETRY_BASE_SECONDS,
+            "response_cache_file": RESPONSE_CACHE_FILE,
+            "response_cache_max_mb": DEFAULT_MAX_MB,
+            "response_cache_ttls": dict(DEFAULT_CACHE_TTLS),
+            "response_cache_mode": "use",
+            "engine": "threads",
+            "concurrency": DEFAULT_CONCURRENCY,
+            "metrics_file": None
+        },
+        "http": dict(DEFAULT_HTTP_SETTINGS)
     }
     
     if os.path.exists(CONFIG_FILE):
@@ -60,6 +103,81 @@ SONARR_API_KEY = config["sonarr"]["api_key"]
 MAL_CLIENT_ID = config["mal"]["client_id"]
 MAL_CLIENT_SECRET = config["mal"]["client_secret"]
 MAL_REDIRECT_URI = config["mal"]["redirect_uri"]
+MAL_API_URL = config["mal"]["api_base_url"].rstrip("/")
+MAL_AUTH_URL = config["mal"]["auth_base_url"].rstrip("/")
+
+# All Sonarr/MAL traffic goes through the pooled transport; one token
+# bucket is shared by every thread that talks to the MAL API and, unless
+# adaptive_rate is off, slows down and speeds up with the server's 429s
+transport.configure(config["http"])
+mal_limiter = limiter_from_config(config["sync"])
+transport.set_limiter(urlparse(MAL_API_URL).netloc, mal_limiter)
+metrics.gauge("mal_requests_per_second", lambda: mal_limiter.rate, "Current MAL request rate allowed by the limiter")
+
+# Match cache is opened lazily so importing this module has no side effects
+_match_cache = None
+
+_sync_state = None
+
+def get_sync_state():
+    """Return the per-series sync state used by incremental syncs, opening it on first use."""
+    global _sync_state
+    if _sync_state is None:
+        _sync_state = SyncState(config["sync"]["state_file"])
+    return _sync_state
+
+_checkpoints = None
+
+def get_checkpoints():
+    """Return the durable sync job checkpoint store, opening it on first use."""
+    global _checkpoints
+    if _checkpoints is None:
+        _checkpoints = CheckpointStore(config["sync"]["checkpoint_file"])
+    return _checkpoints
+
+_retry_queue = None
+
+def get_retry_queue():
+    """Return the queue of failed searches and updates (and their dead letters), opening it on first use."""
+    global _retry_queue
+    if _retry_queue is None:
+        _retry_queue = RetryQueue(config["sync"]["retry_queue_file"], config["sync"]["retry_max_attempts"],
+                                  config["sync"]["retry_base_seconds"])
+    return _retry_queue
+
+_response_cache = None
+# Response cache counters at the start of the current sync, so the summary reports one run
+_response_cache_baseline = None
+
+def get_response_cache():
+    """Return the on-disk cache of MAL search and detail responses, opening it on first use."""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache(config["sync"]["response_cache_file"],
+                                        config["sync"]["response_cache_max_mb"],
+                                        config["sync"]["response_cache_ttls"],
+                                        config["sync"]["response_cache_mode"])
+        # Cacheable MAL GETs are answered from it; list updates invalidate the anime's details
+        transport.set_cache(urlparse(MAL_API_URL).netloc, _response_cache)
+    return _response_cache
+
+_catalog = None
+_catalog_checked = False
+
+def get_catalog():
+    """Return the imported local MAL catalog, or None if there is none."""
+    global _catalog, _catalog_checked
+    if not _catalog_checked:
+        _catalog = CatalogIndex.open_if_exists(config["sync"]["catalog_file"])
+        _catalog_checked = True
+    return _catalog
+
+def get_match_cache():
+    """Return the shared Sonarr -> MAL match cache, opening it on first use."""
+    global _match_cache
+    if _match_cache is None:
+        _match_cache = MatchCache(config["sync"].get("match_cache_file", MATCH_CACHE_FILE))
+    return _match_cache
 
 def save_token(token):
     # Add expiration time
@@ -70,31 +188,33 @@ def save_token(token):
     with open(TOKEN_FILE, "w") as f:
         json.dump(token, f)
 
-def load_token():
-    if os.path.exists(TOKEN_FILE):
-        with open(TOKEN_FILE, "r") as f:
-            token_data = json.load(f)
-            # Check if token is expired
-            if 'expires_at' in token_data:
-                if datetime.now() >= datetime.fromisoformat(token_data['expires_at']):
-                    print("Token expired, will need to refresh...")
-                    return None
-            return token_data
-    return None
+_token_manager = None
+
+def get_token_manager():
+    """Token manager holding the MAL tokens, read from the token file once per process."""
+    global _token_manager
+    if _token_manager is None:
+        token = {}
+        if os.path.exists(TOKEN_FILE):
+            with open(TOKEN_FILE, "r") as f:
+                token = json.load(f)
+        _token_manager = TokenManager(token, request_token_refresh, on_refresh=save_token)
+        # Every MAL API request carries the current token and is retried once after a 401
+        transport.set_auth(urlparse(MAL_API_URL).netloc, _token_manager)
+    return _token_manager
 
-def refresh_token(refresh_token):
-    token_url = "https://myanimelist.net/v1/oauth2/token"
+def request_token_refresh(refresh_token):
+    """Exchange a refresh token for new tokens."""
+    token_url = f"{MAL_AUTH_URL}/token"
     data = {
         "client_id": MAL_CLIENT_ID,
         "client_secret": MAL_CLIENT_SECRET,
         "grant_type": "refresh_token",
         "refresh_token": refresh_token,
     }
-    response = requests.post(token_url, data=data)
+    response = transport.post(token_url, data=data)
     response.raise_for_status()
-    token = response.json()
-    save_token(token)
-    return token["access_token"], token["refresh_token"]
+    return response.json()
 
 class OAuthHandler(BaseHTTPRequestHandler):
     code = None
@@ -113,24 +233,13 @@ class OAuthHandler(BaseHTTPRequestHandler):
 
 # Step 1: Authenticate with MyAnimeList (OAuth2)
 def get_mal_access_token():
-    token = load_token()
-    if token:
-        # Check if token needs refreshing
-        if 'expires_at' in token:
-            if datetime.now() >= datetime.fromisoformat(token['expires_at']) - timedelta(minutes=5):
-                # Token will expire in 5 minutes or less, refresh it
-                if 'refresh_token' in token:
-                    try:
-                        print("Refreshing access token...")
-                        new_access_token, new_refresh_token = refresh_token(token['refresh_token'])
-                        return new_access_token
-                    except Exception as e:
-                        print(f"Token refresh failed: {e}")
-                        print("Need to re-authenticate...")
-                else:
-                    print("No refresh token available, need to re-authenticate...")
-            else:
-                return token["access_token"]
+    manager = get_token_manager()
+    # Refreshed first if it expires within a few minutes; None if there is no usable token
+    access_token = manager.access_token()
+    if access_token:
+        manager.start()
+        return access_token
+    print("No valid token, need to authenticate...")
 
     # Generate a secure code_verifier for PKCE (MAL uses "plain" method)
     code_verifier = base64.urlsafe_b64encode(secrets.token_bytes(32)).rstrip(b'=').decode('utf-8')
@@ -143,7 +252,7 @@ def get_mal_access_token():
     state = base64.urlsafe_b64encode(secrets.token_bytes(16)).rstrip(b'=').decode('utf-8')
     
     auth_url = (
-        f"https://myanimelist.net/v1/oauth2/authorize?response_type=code"
+        f"{MAL_AUTH_URL}/authorize?response_type=code"
         f"&client_id={MAL_CLIENT_ID}&redirect_uri={MAL_REDIRECT_URI}"
         f"&code_challenge={code_challenge}&code_challenge_method=plain"
         f"&state={state}"
@@ -177,7 +286,7 @@ def get_mal_access_token():
     code = OAuthHandler.code
     print("✅ Authorization code received!")
 
-    token_url = "https://myanimelist.net/v1/oauth2/token"
+    token_url = f"{MAL_AUTH_URL}/token"
     data = {
         "client_id": MAL_CLIENT_ID,
         "client_secret": MAL_CLIENT_SECRET,
@@ -186,10 +295,12 @@ def get_mal_access_token():
         "redirect_uri": MAL_REDIRECT_URI,
         "code_verifier": code_verifier
     }
-    response = requests.post(token_url, data=data)
+    response = transport.post(token_url, data=data)
     response.raise_for_status()
     token = response.json()
     save_token(token)
+    manager.set_tokens(token)
+    manager.start()
     return token["access_token"]
 
 # Step 2: Fetch anime from Sonarr
@@ -198,7 +309,8 @@ def get_sonarr_tags():
     headers = {"X-Api-Key": SONARR_API_KEY}
     tag_url = SONARR_API_URL.replace('/series', '/tag')
     try:
-        response = requests.get(tag_url, headers=headers)
+        with trace_span('fetch_sonarr_tags'):
+            response = transport.get(tag_url, headers=headers)
         response.raise_for_status()
         tags = response.json()
         return {tag['id']: tag['label'].lower() for tag in tags}
@@ -206,124 +318,124 @@ def get_sonarr_tags():
         print(f"Warning: Could not fetch tags from Sonarr: {e}")
         return {}
 
+def is_anime(series, tag_mapping):
+    """Decide whether a Sonarr series is anime from its tags, series type or title."""
+    # Check tags
+    for tag_id in series.get('tags') or []:
+        tag_name = tag_mapping.get(tag_id, str(tag_id))
+        if 'anime' in tag_name.lower():
+            return True
+    
+    # Also check if the series type is anime or title contains anime keywords
+    series_type = (series.get('seriesType') or '').lower()
+    title = (series.get('title') or '').lower()
+    
+    # Check series type
+    if series_type == 'anime':
+        return True
+    # Check title for anime indicators
+    return any(keyword in title for keyword in ['anime', '(tv)', 'season', 'cour'])
+
 def get_sonarr_anime():
-    headers = {"X-Api-Key": SONARR_API_KEY}
-    response = requests.get(SONARR_API_URL, headers=headers)
-    response.raise_for_status()
-    all_series = response.json()
+    """Stream the Sonarr series feed and keep a compact record of each anime series.
     
-    # Get tag mappings
+    Series are filtered as they are parsed, so memory stays bounded by one
+    series plus the compact records kept, whatever the library size.
+    """
+    # Get tag mappings first so series can be filtered on the fly
     tag_mapping = get_sonarr_tags()
     
-    # Filter series with tag 'anime' (case-insensitive)
+    stats = StreamStats()
     anime_series = []
-    for series in all_series:
-        is_anime = False
-        
-        # Check tags
-        tags = series.get('tags', [])
-        for tag_id in tags:
-            tag_name = tag_mapping.get(tag_id, str(tag_id))
-            if 'anime' in tag_name.lower():
-                is_anime = True
-                break
-        
-        # Also check if the series type is anime or title contains anime keywords
-        series_type = series.get('seriesType', '').lower()
-        title = series.get('title', '').lower()
-        
-        if not is_anime:
-            # Check series type
-            if series_type == 'anime':
-                is_anime = True
-            # Check title for anime indicators
-            elif any(keyword in title for keyword in ['anime', '(tv)', 'season', 'cour']):
-                is_anime = True
-        
-        if is_anime:
-            anime_series.append(series)
+    with metrics.phase('fetch'), trace_span('fetch_sonarr'):
+        for series in stream_series(SONARR_API_URL, SONARR_API_KEY, client=transport, stats=stats):
+            if is_anime(series, tag_mapping):
+                anime_series.append(compact_series(series))
+                stats.series_kept += 1
     
+    feed = stats.as_dict()
+    peak_rss = f", peak RSS {feed['peak_rss_mb']} MB" if feed['peak_rss_mb'] is not None else ""
+    print(f"Streamed {feed['series_seen']} series ({feed['bytes_read'] / 1024:.0f} KB), "
+          f"kept {feed['series_kept']}; parse buffer peak {feed['peak_buffer_bytes'] / 1024:.0f} KB{peak_rss}")
     return anime_series
 
 # Improved anime title cleaning for better matching
-def clean_anime_title(title):
-    """Clean anime title for better matching."""
-    # Remove common suffixes and patterns
-    title = re.sub(r'\s*\(\d{4}\)$', '', title)  # Remove year in parentheses
-    title = re.sub(r'\s*Season\s+\d+', '', title, flags=re.IGNORECASE)  # Remove "Season X"
-    title = re.sub(r'\s*S\d+$', '', title)  # Remove "S1", "S2", etc.
-    title = re.sub(r'\s*\d+(?:st|nd|rd|th)\s+Season', '', title, flags=re.IGNORECASE)
-    title = re.sub(r'\s*Part\s+\d+', '', title, flags=re.IGNORECASE)  # Remove "Part X"
-    title = re.sub(r'\s*Cour\s+\d+', '', title, flags=re.IGNORECASE)  # Remove "Cour X"
-    title = re.sub(r'\s*\[.*?\]', '', title)  # Remove content in square brackets
-    title = re.sub(r'\s*\(.*?\)', '', title)  # Remove content in parentheses
-    title = re.sub(r'\s+', ' ', title).strip()  # Normalize whitespace
-    return title
+# Titles are cleaned once per run and scored in batches
+title_scorer = TitleScorer(clean_title, CLI_WEIGHTS)
+
+def score_mal_results(title, results):
+    """Return (best_anime, best_score) among MAL search results using fuzzy matching.
+    
+    Checks the main, English and Japanese titles and synonyms of every result;
+    token sort is weighted highest as it is usually best for anime titles.
+    """
+    return title_scorer.best_match(title, results)
 
 # Search for anime on MyAnimeList by title
-def search_mal_anime(title, access_token, max_results=10):
-    """Search MAL for an anime by title and return the best match using fuzzy matching."""
+def search_mal_anime(title, access_token, max_results=10, series=None, searches=None):
+    """Search MAL for an anime by title and return the best match using fuzzy matching.
+
+    Matches are remembered in the match cache keyed by the Sonarr series, so
+    a cache hit skips the MAL search and scoring entirely. When a local
+    catalog has been imported, candidates come from it first and the live
+    search is only used if none of them reaches the minimum score. Live
+    searches go through `searches`, the run's SingleFlight, so series that
+    clean to the same query share one request.
+    """
+    min_score = config.get("sync", {}).get("minimum_match_score", 75)
+    cache = get_match_cache()
+    cache_key = series_key(series, title)
+    cached = cache.get(cache_key, title, min_score=min_score)
+    if cached:
+        if cached['score'] >= min_score:
+            return cached['mal_id'], cached['mal_title'], cached['start_date'], cached['score']
+        return None, None, None, 0
+
     # Clean the title
-    cleaned_title = clean_anime_title(title)
-    
-    url = "https://api.myanimelist.net/v2/anime"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    params = {
-        "q": cleaned_title,
-        "limit": max_results,
-        "fields": "id,title,alternative_titles,start_date,media_type"
-    }
+    cleaned_title = title_scorer.normalize(title)
     
     try:
-        resp = requests.get(url, headers=headers, params=params)
-        resp.raise_for_status()
-        
-        if not resp.json().get('data'):
-            # Try with original title if cleaned title doesn't work
-            params["q"] = title
-            resp = requests.get(url, headers=headers, params=params)
-            resp.raise_for_status()
-            
-            if not resp.json().get('data'):
-                return None, None, None, 0
+        best_match, best_score = None, 0
         
-        results = resp.json()['data']
-        best_match = None
-        best_score = 0
+        catalog = get_catalog()
+        if catalog:
+            with trace_span('catalog_search'):
+                candidates = catalog.search(cleaned_title, max_results)
+            best_match, best_score = score_mal_results(title, candidates)
+            if best_match and best_score >= min_score:
+                catalog.record_resolved()
         
-        for result in results:
-            anime = result['node']
+        if not best_match or best_score < min_score:
+            url = f"{MAL_API_URL}/anime"
+            headers = {"Authorization": f"Bearer {access_token}"}
+            searches = searches or SingleFlight()
             
-            # Get all possible titles for this anime
-            titles_to_check = [anime['title']]
+            def search(query, span):
+                params = {
+                    "q": query,
+                    "limit": max_results,
+                    "fields": "id,title,alternative_titles,start_date,media_type"
+                }
+                with trace_span(span, query=query):
+                    resp = transport.get(url, headers=headers, params=params)
+                resp.raise_for_status()
+                return resp.json().get('data', [])
             
-            # Add alternative titles
-            alt_titles = anime.get('alternative_titles', {})
-            if alt_titles.get('en'):
-                titles_to_check.append(alt_titles['en'])
-            if alt_titles.get('ja'):
-                titles_to_check.append(alt_titles['ja'])
-            if alt_titles.get('synonyms'):
-                titles_to_check.extend(alt_titles['synonyms'])
+            results = searches.do(search_key(cleaned_title, max_results),
+                                  lambda: search(cleaned_title, 'search'))
+            if not results:
+                # Try with original title if cleaned title doesn't work
+                results = searches.do(search_key(title, max_results),
+                                      lambda: search(title, 'fallback_search'))
             
-            # Calculate fuzzy match scores
-            for check_title in titles_to_check:
-                # Clean the MAL title too
-                cleaned_check_title = clean_anime_title(check_title)
-                
-                # Multiple scoring methods
-                ratio_score = fuzz.ratio(cleaned_title.lower(), cleaned_check_title.lower())
-                partial_score = fuzz.partial_ratio(cleaned_title.lower(), cleaned_check_title.lower())
-                token_score = fuzz.token_sort_ratio(cleaned_title.lower(), cleaned_check_title.lower())
-                
-                # Weighted average (token sort is usually best for anime titles)
-                combined_score = (ratio_score * 0.3 + partial_score * 0.3 + token_score * 0.4)
-                
-                if combined_score > best_score:
-                    best_score = combined_score
-                    best_match = anime
+            api_match, api_score = score_mal_results(title, results)
+            if api_score > best_score:
+                best_match, best_score = api_match, api_score
+        
+        if best_match:
+            cache.put(cache_key, title, best_match['id'], best_match['title'],
+                      best_match.get('start_date'), best_score)
         
-        min_score = config.get("sync", {}).get("minimum_match_score", 75)
         if best_match and best_score >= min_score:
             return (
                 best_match['id'],
@@ -333,6 +445,9 @@ def search_mal_anime(title, access_token, max_results=10):
             )
     
     except Exception as e:
+        if failure_reason(e):
+            # Worth retrying later; resolve_anime hands it to the retry queue
+            raise
         print(f"Error searching MAL for '{title}': {e}")
     
     return None, None, None, 0
@@ -340,12 +455,13 @@ def search_mal_anime(title, access_token, max_results=10):
 # Check if anime is already in user's MAL list
 def get_mal_list_status(anime_id, access_token):
     """Get current status of anime in user's MAL list."""
-    url = f"https://api.myanimelist.net/v2/anime/{anime_id}"
+    url = f"{MAL_API_URL}/anime/{anime_id}"
     headers = {"Authorization": f"Bearer {access_token}"}
     params = {"fields": "my_list_status"}
     
     try:
-        resp = requests.get(url, headers=headers, params=params)
+        with trace_span('status_check'):
+            resp = transport.get(url, headers=headers, params=params)
         resp.raise_for_status()
         data = resp.json()
         return data.get('my_list_status')
@@ -354,8 +470,11 @@ def get_mal_list_status(anime_id, access_token):
 
 # Update the user's MyAnimeList
 def update_mal_list(anime_id, access_token, status="completed", score=None):
-    """Add or update an anime in the user's MAL list."""
-    url = f"https://api.myanimelist.net/v2/anime/{anime_id}/my_list_status"
+    """Add or update an anime in the user's MAL list.
+    
+    Returns (True, response) or (False, the exception that made it fail).
+    """
+    url = f"{MAL_API_URL}/anime/{anime_id}/my_list_status"
     headers = {"Authorization": f"Bearer {access_token}"}
     data = {"status": status}
     
@@ -363,98 +482,491 @@ def update_mal_list(anime_id, access_token, status="completed", score=None):
         data["score"] = score
     
     try:
-        # Add rate limiting
-        time.sleep(1)  # Be nice to the API
-        resp = requests.put(url, headers=headers, data=data)
+        with metrics.phase('write'), trace_span('update', status=status):
+            resp = transport.put(url, headers=headers, data=data)
         resp.raise_for_status()
         return True, resp.json()
-    except requests.exceptions.HTTPError as e:
-        if e.response.status_code == 429:  # Rate limited
-            print("Rate limited, waiting...")
-            time.sleep(5)
-            return False, f"Rate limited: {e}"
-        return False, f"HTTP Error: {e}"
     except Exception as e:
-        return False, f"Error: {e}"
+        # 429s are still throttled after the transport's own retries
+        return False, e
 
 # Step 3: Sync with MyAnimeList
-def sync_with_mal(anime_list, access_token, interactive=True, default_status="completed"):
-    """Sync Sonarr anime with MyAnimeList."""
+def fetch_mal_list_index(access_token):
+    """Fetch the user's whole MAL list once as {anime_id: list_status}, or None on failure."""
+    try:
+        with metrics.phase('fetch'), trace_span('fetch_mal_list'):
+            list_index = build_list_index(access_token, client=transport, base_url=MAL_API_URL)
+        print(f"📋 Loaded {len(list_index)} entries from your MAL list")
+        return list_index
+    except Exception as e:
+        print(f"Warning: Could not fetch your MAL list, checking titles one by one: {e}")
+        return None
+
+def resolve_anime(anime, access_token, list_index=None, searches=None):
+    """Find the MAL match for a Sonarr series and its current MAL list status.
+    
+    Returns (mal_id, mal_title, mal_year, match_score, current_status, error);
+    error is set when the search failed in a way worth retrying later.
+    """
+    title = anime.get('title')
+    with trace_title(title):
+        try:
+            mal_id, mal_title, mal_year, match_score = search_mal_anime(title, access_token, series=anime,
+                                                                        searches=searches)
+        except Exception as e:
+            return None, None, None, 0, None, e
+        if not mal_id:
+            current_status = None
+        elif list_index is not None:
+            current_status = list_index.get(mal_id)
+        else:
+            current_status = get_mal_list_status(mal_id, access_token)
+    return mal_id, mal_title, mal_year, match_score, current_status, None
+
+def sync_with_mal(anime_list, access_token, interactive=True, default_status="completed", workers=1,
+                  incremental=False, job_id=None, retried=()):
+    """Sync Sonarr anime with MyAnimeList.
+    
+    Searches, status lookups and list updates run on a pool of `workers`
+    threads; every MAL request goes through the shared rate limiter, so
+    throughput follows the configured request rate. Prompts and output stay
+    in Sonarr order on the calling thread.
+    
+    Successful outcomes are recorded in the sync state; with `incremental`
+    only series that are new or changed since their last successful sync
+    are processed. Series in `retried` were just retried from the retry
+    queue and are skipped.
+    
+    With a `job_id`, every finished item is checkpointed as soon as its
+    outcome is known and items the job already completed are skipped, so an
+    interrupted run can be resumed without redoing searches or updates.
+    Searches and updates that fail with throttling, a server error or a
+    timeout go to the retry queue.
+    """
     print(f"Found {len(anime_list)} anime series in Sonarr")
+    total_count = len(anime_list)
+    anime_list, unchanged_count = prepare_sync(anime_list, job_id, incremental, retried)
     print("=" * 60)
     
+    checkpoints = get_checkpoints() if job_id else None
+    retries = get_retry_queue()
+    
+    def checkpoint(anime, position, outcome):
+        metrics.record_item(outcome)
+        if outcome != 'failed':
+            retries.resolve(anime)
+        if checkpoints:
+            checkpoints.commit_item(job_id, series_key(anime, anime.get('title')), position,
+                                    outcome, {'title': anime.get('title')})
+    
+    state = get_sync_state()
+    
     updated_count = 0
     skipped_count = 0
     failed_count = 0
+    pending_updates = []
     
-    for i, anime in enumerate(anime_list, 1):
-        title = anime.get('title')
-        sonarr_status = anime.get('status', 'Unknown')
-        
-        print(f"\n[{i}/{len(anime_list)}] Processing: {title}")
-        print(f"Sonarr Status: {sonarr_status}")
-        
-        # Search for anime on MAL
-        mal_id, mal_title, mal_year, match_score = search_mal_anime(title, access_token)
+    # One paginated fetch replaces a status lookup per title
+    list_index = fetch_mal_list_index(access_token)
+    # Series whose titles clean to the same query share one MAL search per run
+    searches = SingleFlight(metrics)
+    
+    pool = ThreadPoolExecutor(max_workers=max(1, workers))
+    try:
+        # Lookups are queued up front and consumed in order as they finish
+        resolved = pool.map(in_session(lambda anime: resolve_anime(anime, access_token, list_index,
+                                                                    searches)),
+                            anime_list)
         
-        if not mal_id:
-            print(f"❌ No MAL match found for: {title}")
-            failed_count += 1
-            continue
+        for i, (anime, match) in enumerate(zip(anime_list, resolved), 1):
+            title = anime.get('title')
+            sonarr_status = anime.get('status', 'Unknown')
+            mal_id, mal_title, mal_year, match_score, current_status, error = match
             
-        print(f"✅ Found MAL match: {mal_title}")
-        print(f"   MAL ID: {mal_id}")
-        print(f"   Year: {mal_year}")
-        print(f"   Match Score: {match_score:.1f}%")
-        
-        # Check if already in MAL list
-        current_status = get_mal_list_status(mal_id, access_token)
-        if current_status:
-            print(f"   Already in MAL list with status: {current_status.get('status', 'unknown')}")
-            if interactive:
-                update_anyway = input("   Update anyway? (y/N): ").lower().startswith('y')
-                if not update_anyway:
+            print(f"\n[{i}/{len(anime_list)}] Processing: {title}")
+            print(f"Sonarr Status: {sonarr_status}")
+            
+            if error is not None:
+                print(f"❌ MAL search failed for {title}: {error}")
+                failed_count += 1
+                queue_retry(anime, 'search', error)
+                checkpoint(anime, i, 'failed')
+                continue
+            
+            if not mal_id:
+                print(f"❌ No MAL match found for: {title}")
+                failed_count += 1
+                checkpoint(anime, i, 'no_match')
+                continue
+                
+            print(f"✅ Found MAL match: {mal_title}")
+            print(f"   MAL ID: {mal_id}")
+            print(f"   Year: {mal_year}")
+            print(f"   Match Score: {match_score:.1f}%")
+            
+            # Check if already in MAL list
+            if current_status is not None:
+                print(f"   Already in MAL list with status: {current_status.get('status', 'unknown')}")
+                if interactive:
+                    update_anyway = input("   Update anyway? (y/N): ").lower().startswith('y')
+                    if not update_anyway:
+                        print("   Skipping...")
+                        skipped_count += 1
+                        state.record(anime, 'already_in_list', mal_id, mal_title, match_score)
+                        checkpoint(anime, i, 'already_in_list')
+                        continue
+            
+            # Determine status based on Sonarr status
+            mal_status = mal_status_for(sonarr_status, default_status)
+            
+            if interactive and match_score < 90:
+                print(f"   Low match score ({match_score:.1f}%). Confirm update?")
+                confirm = input(f"   Add '{mal_title}' to MAL as '{mal_status}'? (y/N): ").lower()
+                if not confirm.startswith('y'):
                     print("   Skipping...")
                     skipped_count += 1
+                    state.record(anime, 'declined', mal_id, mal_title, match_score)
+                    checkpoint(anime, i, 'declined')
                     continue
+            
+            # Queue the MAL list update; it is checkpointed the moment it finishes
+            print(f"   Updating MAL list with status: {mal_status}")
+            future = pool.submit(traced(title, update_mal_list), mal_id, access_token, status=mal_status)
+            future.add_done_callback(
+                lambda f, anime=anime, position=i: checkpoint(
+                    anime, position, 'updated' if not f.cancelled() and f.result()[0] else 'failed'
+                )
+            )
+            pending_updates.append((anime, mal_id, mal_title, match_score, mal_status, future))
         
-        # Determine status based on Sonarr status
-        if sonarr_status.lower() == 'continuing':
-            mal_status = "watching"
-        elif sonarr_status.lower() in ['ended', 'completed']:
-            mal_status = default_status
-        else:
-            mal_status = default_status
-        
-        if interactive and match_score < 90:
-            print(f"   Low match score ({match_score:.1f}%). Confirm update?")
-            confirm = input(f"   Add '{mal_title}' to MAL as '{mal_status}'? (y/N): ").lower()
-            if not confirm.startswith('y'):
-                print("   Skipping...")
-                skipped_count += 1
-                continue
-        
-        # Update MAL list
-        print(f"   Updating MAL list with status: {mal_status}")
-        success, result = update_mal_list(mal_id, access_token, status=mal_status)
-        
-        if success:
-            print(f"   ✅ Successfully updated {mal_title} in your MAL list.")
-            updated_count += 1
-        else:
-            print(f"   ❌ Failed to update {mal_title}: {result}")
-            failed_count += 1
-        
-        # Small delay to be nice to the API
-        time.sleep(1)
+        for anime, mal_id, mal_title, match_score, mal_status, future in pending_updates:
+            success, result = future.result()
+            if success:
+                print(f"   ✅ Successfully updated {mal_title} in your MAL list.")
+                updated_count += 1
+                state.record(anime, 'updated', mal_id, mal_title, match_score)
+            else:
+                print(f"   ❌ Failed to update {mal_title}: {result}")
+                failed_count += 1
+                queue_retry(anime, 'update', result, mal_id, mal_title, mal_status)
+    except BaseException:
+        # Drop queued work but let in-flight updates finish and checkpoint
+        pool.shutdown(wait=True, cancel_futures=True)
+        raise
+    pool.shutdown(wait=True)
+    
+    return print_sync_summary(updated_count, skipped_count, failed_count, len(anime_list),
+                              total_count, unchanged_count if incremental else None)
+
+def print_sync_summary(updated_count, skipped_count, failed_count, processed, total_count,
+                       unchanged_count=None, http_stats=None):
+    """Print the end-of-sync counters and cache, catalog, limiter, HTTP and phase statistics.
     
+    With sync.metrics_file set, the collected metrics are also written there
+    as JSON. Returns the counters as a dict.
+    """
     print("\n" + "=" * 60)
     print("SYNC COMPLETE")
     print(f"Updated: {updated_count}")
     print(f"Skipped: {skipped_count}")
     print(f"Failed: {failed_count}")
-    print(f"Total processed: {len(anime_list)}")
+    if unchanged_count is not None:
+        print(f"Unchanged (skipped): {unchanged_count}")
+    print(f"Total processed: {processed} of {total_count}")
+    cache_stats = get_match_cache().stats()
+    print(f"Match cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+          f"{cache_stats['invalidations']} invalidated, "
+          f"{cache_stats['expired']} no-match entries expired")
+    if get_catalog():
+        catalog_stats = get_catalog().stats()
+        print(f"Local catalog: {catalog_stats['resolved_locally']} resolved offline, "
+              f"{catalog_stats['api_fallbacks']} needed the live search")
+    response_stats = get_response_cache().since(_response_cache_baseline)
+    print(f"Response cache: {response_stats['hits']} hits, {response_stats['misses']} misses "
+          f"({response_stats['hit_ratio']:.0%} hit ratio), "
+          f"{response_stats['bytes_saved'] / 1024:.0f} KB not downloaded")
+    retry_stats = get_retry_queue().stats()
+    print(f"Retry queue: {retry_stats['pending']} pending, {retry_stats['dead_letters']} dead letters")
+    limiter_stats = mal_limiter.stats()
+    print(f"MAL requests: {limiter_stats['acquired']} "
+          f"({limiter_stats['requests_per_second']}/s, {limiter_stats['total_wait_seconds']}s throttled, "
+          f"{limiter_stats['throttled']} 429/503)")
+    if limiter_stats.get('adaptive'):
+        print(f"Adaptive rate: configured {limiter_stats['configured_requests_per_second']}/s, "
+              f"max {limiter_stats['max_requests_per_second']}/s, "
+              f"{limiter_stats['decreases']} decreases, {limiter_stats['increases']} increases")
+    if http_stats is not None:
+        for host, host_stats in http_stats.items():
+            print(f"HTTP {host}: {host_stats['requests']} requests, "
+                  f"{host_stats['retries']} retries, {host_stats['errors']} errors")
+    else:
+        for host, host_stats in transport.stats().items():
+            print(f"HTTP {host}: {host_stats['requests']} requests, "
+                  f"{host_stats['connections_reused']} on reused connections, "
+                  f"{host_stats['retries']} retries, {host_stats['errors']} errors")
+    report = metrics.summary()
+    searches = report['searches']
+    if searches:
+        print(f"MAL searches: {searches.get('sent', 0)} sent, "
+              f"{searches.get('coalesced', 0)} saved by sharing identical queries")
+    phases = ", ".join(f"{phase} {report['phases'][phase]['total_seconds']}s"
+                       for phase in SYNC_PHASES if phase in report['phases'])
+    print(f"Phases: {phases or 'none recorded'} ({report['items_per_second']} items/s)")
+    print("=" * 60)
+    counts = {'updated': updated_count, 'skipped': skipped_count, 'failed': failed_count,
+              'processed': processed, 'total': total_count, 'unchanged': unchanged_count}
+    if config["sync"]["metrics_file"]:
+        write_metrics_summary(config["sync"]["metrics_file"], dict(report, counts=counts))
+    return counts
+
+def write_metrics_summary(path, report):
+    """Write a metrics summary as JSON, replacing the file atomically."""
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "w") as f:
+            json.dump(report, f, indent=2)
+        os.replace(temp_path, path)
+        print(f"📈 Metrics written to {path}")
+    except OSError as e:
+        print(f"Warning: Could not write metrics to {path}: {e}")
+
+def queue_retry(anime, stage, error, mal_id=None, mal_title=None, mal_status=None):
+    """Hand a failed search or update to the retry queue and report where it went."""
+    report_retry(get_retry_queue().push(anime, stage, error, mal_id, mal_title, mal_status))
+
+def report_retry(outcome):
+    """Print where RetryQueue.push put a failed item."""
+    if outcome == 'dead':
+        print("   ☠️  Moved to the dead-letter list (see --dead-letters)")
+    else:
+        print("   🔁 Queued for retry")
+
+def retry_failed_item(entry, access_token, default_status, searches=None):
+    """Retry one queued search or update; returns None once the series is settled, else the error."""
+    anime = entry['series']
+    title = anime.get('title')
+    mal_id, mal_title, mal_status = entry['mal_id'], entry['mal_title'], entry['mal_status']
+    score = None
+    with trace_title(title):
+        if entry['stage'] == 'search':
+            mal_id, mal_title, _, score, current_status, error = resolve_anime(anime, access_token,
+                                                                                searches=searches)
+            if error is not None:
+                return error
+            if not mal_id:
+                print(f"   ❌ {title}: still no MAL match")
+                return None
+            if current_status is not None:
+                get_sync_state().record(anime, 'already_in_list', mal_id, mal_title, score)
+                return None
+            mal_status = mal_status_for(anime.get('status', 'Unknown'), default_status)
+        success, result = update_mal_list(mal_id, access_token, status=mal_status)
+    if not success:
+        print(f"   ❌ {title}: {result}")
+        return result
+    print(f"   ✅ {title} -> {mal_title} set to {mal_status}")
+    get_sync_state().record(anime, 'updated', mal_id, mal_title, score)
+    return None
+
+def drain_retry_queue(access_token, options):
+    """Retry the failed searches and updates of earlier runs that are due. Returns the keys it retried."""
+    retries = get_retry_queue()
+    due = retries.stats()['due']
+    if not due:
+        return set()
+    print(f"🔁 Retrying {due} failed items from earlier runs...")
+    searches = SingleFlight(metrics)
+    retried = set()
+    
+    def retry(entry):
+        retried.add(entry['item_key'])
+        return retry_failed_item(entry, access_token, options["default_status"], searches)
+    
+    counts = retries.drain(retry, workers=options.get("workers", 1))
+    if counts:
+        print(f"   {counts['recovered']} recovered, {counts['requeued']} requeued, "
+              f"{counts['dead_lettered']} moved to the dead-letter list")
+    return retried
+
+def print_retry_queue(limit=50):
+    """Print the items waiting for a retry and the dead letters."""
+    retries = get_retry_queue()
+    stats = retries.stats()
+    print(f"🔁 Retry queue: {stats['pending']} pending ({stats['due']} due), "
+          f"{stats['dead_letters']} dead letters")
+    for entry in retries.pending(limit):
+        due_at = time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['next_attempt_at']))
+        print(f"   ⏳ {entry['series'].get('title')} [{entry['stage']}] attempt {entry['attempts']}, "
+              f"next at {due_at}: {entry['last_error']}")
+    for entry in retries.dead_letters(limit):
+        print(f"   ☠️  {entry['series'].get('title')} [{entry['stage']}] {entry['reason']} after "
+              f"{entry['attempts']} attempts: {entry['last_error']}")
+        print(f"      key: {entry['item_key']}")
+
+def prepare_sync(anime_list, job_id, incremental, retried=()):
+    """Drop series the job finished or the retry queue just retried and, if incremental, unchanged ones.
+    
+    Returns (anime_list, unchanged_count).
+    """
+    total_count = len(anime_list)
+    if job_id:
+        done_keys = get_checkpoints().completed_keys(job_id)
+        if done_keys:
+            anime_list = [anime for anime in anime_list
+                          if series_key(anime, anime.get('title')) not in done_keys]
+            print(f"↩️  Resuming job {job_id}: {total_count - len(anime_list)} items already done")
+    if retried:
+        kept = [anime for anime in anime_list if series_key(anime, anime.get('title')) not in retried]
+        print(f"🔁 {len(anime_list) - len(kept)} items already retried from the retry queue")
+        anime_list = kept
+    
+    unchanged_count = 0
+    if incremental:
+        anime_list, unchanged = get_sync_state().partition(anime_list)
+        unchanged_count = len(unchanged)
+        print(f"⏭️  {unchanged_count} unchanged since the last sync, {len(anime_list)} to process")
+    return anime_list, unchanged_count
+
+def mal_status_for(sonarr_status, default_status):
+    """Map a Sonarr series status to the MAL list status to set."""
+    if sonarr_status.lower() == 'continuing':
+        return "watching"
+    return default_status
+
+async def sync_with_mal_async(anime_list, engine, default_status="completed", incremental=False,
+                              job_id=None, retried=()):
+    """Non-interactive sync on the asyncio engine.
+    
+    Follows sync_with_mal's rules (already-listed series are updated too),
+    but every series is resolved and updated as a coroutine, so up to the
+    engine's concurrency are in flight at once within the shared rate limit.
+    Items are reported and checkpointed in the order they finish.
+    """
+    print(f"Found {len(anime_list)} anime series in Sonarr")
+    total_count = len(anime_list)
+    anime_list, unchanged_count = await asyncio.to_thread(prepare_sync, anime_list, job_id,
+                                                          incremental, retried)
     print("=" * 60)
+    
+    checkpoints = get_checkpoints() if job_id else None
+    state = get_sync_state()
+    retries = get_retry_queue()
+    min_score = config["sync"]["minimum_match_score"]
+    counts = {'updated': 0, 'failed': 0, 'done': 0}
+    
+    # Already-listed series are updated too, so neither the list nor per-title statuses are needed
+    def plan(anime, best, score, current_status):
+        if not best or score < min_score:
+            return None, None
+        return (best, score), mal_status_for(anime.get('status', 'Unknown'), default_status)
+    
+    async def finish(anime, match, update):
+        counts['done'] += 1
+        title = anime.get('title')
+        prefix = f"[{counts['done']}/{len(anime_list)}]"
+        if update is None:
+            print(f"{prefix} ❌ No MAL match found for: {title}")
+            counts['failed'] += 1
+            outcome = 'no_match'
+        elif match is None:
+            print(f"{prefix} ❌ MAL search failed for {title}: {update[2]}")
+            counts['failed'] += 1
+            outcome = 'failed'
+        else:
+            (best, score), (mal_status, success, detail) = match, update
+            if success:
+                print(f"{prefix} ✅ {title} -> {best['title']} ({score:.1f}%) set to {mal_status}")
+                counts['updated'] += 1
+                outcome = 'updated'
+            else:
+                print(f"{prefix} ❌ Failed to update {best['title']}: {detail}")
+                counts['failed'] += 1
+                outcome = 'failed'
+        metrics.record_item(outcome)
+        # SQLite writes run in a worker thread so the loop's other requests keep going
+        retry = await asyncio.to_thread(store, anime, match, update, outcome, counts['done'])
+        if retry:
+            report_retry(retry)
+    
+    def store(anime, match, update, outcome, position):
+        """Checkpoint one finished series and record it in the sync state or retry queue."""
+        title = anime.get('title')
+        retry = None
+        if outcome == 'failed' and match is None:
+            retry = retries.push(anime, 'search', update[2])
+        elif outcome == 'failed':
+            (best, _), (mal_status, _, detail) = match, update
+            retry = retries.push(anime, 'update', detail, best['id'], best['title'], mal_status)
+        else:
+            if outcome == 'updated':
+                best, score = match
+                state.record(anime, 'updated', best['id'], best['title'], score)
+            retries.resolve(anime)
+        if checkpoints:
+            checkpoints.commit_item(job_id, series_key(anime, title), position, outcome,
+                                    {'title': title})
+        return retry
+    
+    await engine.run(anime_list, plan, finish, lookup_status=False)
+    
+    return print_sync_summary(counts['updated'], 0, counts['failed'], len(anime_list), total_count,
+                              unchanged_count if incremental else None, engine.client.stats())
+
+async def run_async_sync(access_token, job_id, options, resumed=False, dry_run=False, retried=()):
+    """Fetch Sonarr's anime and sync it with MAL on one event loop.
+    
+    Returns the sync's counters, or None if no sync ran.
+    """
+    client = AsyncHttpClient(config["http"], options["concurrency"])
+    client.set_limiter(urlparse(MAL_API_URL).netloc, mal_limiter)
+    client.set_auth(urlparse(MAL_API_URL).netloc, get_token_manager())
+    client.set_cache(urlparse(MAL_API_URL).netloc, get_response_cache())
+    matcher = SeriesMatcher(title_scorer, get_match_cache(), get_catalog(),
+                            config["sync"]["minimum_match_score"])
+    engine = AsyncSyncEngine(client, MAL_API_URL, access_token, matcher, options["concurrency"])
+    try:
+        print("📺 Fetching anime from Sonarr...")
+        tag_mapping = get_sonarr_tags()
+        stats = StreamStats()
+        anime_list = await engine.fetch_series(
+            SONARR_API_URL, SONARR_API_KEY,
+            lambda series: compact_series(series) if is_anime(series, tag_mapping) else None,
+            stats
+        )
+        feed = stats.as_dict()
+        print(f"Streamed {feed['series_seen']} series ({feed['bytes_read'] / 1024:.0f} KB), "
+              f"kept {feed['series_kept']}")
+        if not begin_sync(anime_list, job_id, options, resumed, dry_run):
+            return None
+        return await sync_with_mal_async(anime_list, engine, default_status=options["default_status"],
+                                         incremental=options["incremental"], job_id=job_id,
+                                         retried=retried)
+    finally:
+        await client.close()
+
+def begin_sync(anime_list, job_id, options, resumed=False, dry_run=False):
+    """Report the fetched anime and register the checkpoint job. Returns False if there is nothing to sync."""
+    if not anime_list:
+        print("❌ No anime found in Sonarr or failed to fetch")
+        return False
+    print(f"✅ Found {len(anime_list)} anime series")
+    
+    if dry_run:
+        print("\n🔍 DRY RUN - No changes will be made")
+        print("=" * 60)
+        for i, anime in enumerate(anime_list, 1):
+            title = anime.get('title')
+            status = anime.get('status', 'Unknown')
+            print(f"{i:3}. {title} (Status: {status})")
+        return False
+    
+    # Sync with MAL, checkpointing every finished item
+    checkpoints = get_checkpoints()
+    if resumed:
+        checkpoints.update_job(job_id, status="running", total=len(anime_list))
+    else:
+        checkpoints.create_job(job_id, "cli", options, total=len(anime_list))
+    return True
 
 def main():
     import argparse
@@ -467,52 +979,209 @@ def main():
                        help="Default MAL status for synced anime")
     parser.add_argument("--dry-run", action="store_true",
                        help="Show what would be synced without making changes")
+    parser.add_argument("--rematch", action="store_true",
+                       help="Ignore cached MAL matches and search every title again")
+    parser.add_argument("--incremental", action="store_true",
+                       help="Only process series that are new or changed since the last successful sync")
+    parser.add_argument("--resume", nargs="?", const="latest", metavar="JOB_ID",
+                       help="Resume an interrupted sync job (default: the most recent one)")
+    parser.add_argument("--import-catalog", metavar="DUMP",
+                       help="Build the local MAL catalog index from a JSON/CSV dump and exit")
+    parser.add_argument("--dead-letters", action="store_true",
+                       help="List the failed items waiting for a retry and the dead-letter list, then exit")
+    parser.add_argument("--requeue-dead-letters", nargs="?", const="all", metavar="KEY",
+                       help="Move every dead letter (or the one with KEY) back to the retry queue and exit")
+    parser.add_argument("--no-response-cache", action="store_true",
+                       help="Send every MAL search and detail request instead of using the response cache")
+    parser.add_argument("--refresh-responses", action="store_true",
+                       help="Ignore cached MAL responses but store the fresh ones")
+    parser.add_argument("--workers", type=int, default=config["sync"]["workers"],
+                       help="Number of parallel MAL workers (default: %(default)s)")
+    parser.add_argument("--rate", type=float, default=config["sync"]["requests_per_second"],
+                       help="Maximum MAL requests per second shared by all workers (default: %(default)s)")
+    parser.add_argument("--burst", type=int, default=config["sync"]["burst"],
+                       help="Maximum burst of MAL requests (default: %(default)s)")
+    parser.add_argument("--engine", choices=ENGINES, default=config["sync"]["engine"],
+                       help="Run the sync on worker threads or on the asyncio engine (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=config["sync"]["concurrency"],
+                       help="Series in flight at once with --engine async (default: %(default)s)")
+    parser.add_argument("--daemon", action="store_true",
+                       help="Keep running and sync incrementally every sync_interval_hours from the config")
+    parser.add_argument("--metrics-json", metavar="FILE", default=config["sync"]["metrics_file"],
+                       help="Write request, phase and throughput metrics as JSON to FILE after each sync")
+    parser.add_argument("--profile", nargs="?", const=PROFILE_DIR, metavar="DIR",
+                       help="Write a cProfile dump and a per-title Chrome trace of the sync to DIR "
+                            "(default: %(const)s)")
     
     args = parser.parse_args()
+    if args.daemon and (args.dry_run or args.resume or args.profile):
+        parser.error("--daemon cannot be combined with --dry-run, --resume or --profile")
+    if args.engine == "async":
+        if not (args.non_interactive or args.daemon):
+            parser.error("--engine async has no prompts; use it with --non-interactive")
+        if aiohttp is None:
+            parser.error("--engine async needs aiohttp (pip install aiohttp)")
+    if args.no_response_cache and args.refresh_responses:
+        parser.error("--no-response-cache cannot be combined with --refresh-responses")
+    get_match_cache().refresh = args.rematch
+    if args.no_response_cache:
+        get_response_cache().configure(mode="bypass")
+    elif args.refresh_responses:
+        get_response_cache().configure(mode="refresh")
+    else:
+        get_response_cache()
+    mal_limiter.configure(args.rate, args.burst)
+    config["sync"]["metrics_file"] = args.metrics_json
     
-    try:
-        print("🚀 Starting MAL-Sonarr Sync...")
-        print("=" * 60)
-        
-        # Get access token
-        print("🔐 Authenticating with MyAnimeList...")
-        access_token = get_mal_access_token()
-        if not access_token:
-            print("❌ Failed to get MAL access token")
+    if args.dead_letters:
+        print_retry_queue()
+        return
+    if args.requeue_dead_letters:
+        key = None if args.requeue_dead_letters == "all" else args.requeue_dead_letters
+        count = get_retry_queue().requeue(key)
+        print(f"🔁 Requeued {count} dead letters; they are retried at the start of the next sync")
+        return
+    
+    if args.import_catalog:
+        print(f"📚 Importing MAL catalog from {args.import_catalog}...")
+        count = import_catalog(args.import_catalog, config["sync"]["catalog_file"])
+        print(f"✅ Indexed {count} anime into {config['sync']['catalog_file']}")
+        return
+    
+    checkpoints = get_checkpoints()
+    options = {
+        "interactive": not args.non_interactive,
+        "default_status": args.status,
+        "workers": args.workers,
+        "incremental": args.incremental,
+        "engine": args.engine,
+        "concurrency": args.concurrency
+    }
+    if args.daemon:
+        options.update(interactive=False, incremental=True)
+        run_daemon(options)
+        return
+    
+    if args.resume:
+        if args.resume == "latest":
+            job = checkpoints.latest_resumable("cli")
+        else:
+            job = checkpoints.get_job(args.resume)
+        if not job:
+            print("❌ No interrupted sync job to resume")
             return
-        print("✅ Authentication successful")
-        
+        job_id = job["job_id"]
+        # Resume with the options the job was started with
+        options.update(job["options"])
+        print(f"↩️  Resuming sync job {job_id} ({job['cursor']}/{job['total']} items committed)")
+    else:
+        job_id = str(uuid.uuid4())
+    
+    profiler = Profiler(args.profile, f"sync-{job_id}") if args.profile else None
+    try:
+        if profiler:
+            profiler.start()
+        run_sync(job_id, options, resumed=bool(args.resume), dry_run=args.dry_run)
+    except KeyboardInterrupt:
+        print("\n⚠️  Sync interrupted by user")
+        if checkpoints.get_job(job_id):
+            checkpoints.update_job(job_id, status="interrupted")
+            print(f"   Resume with: python sync_mal_sonarr.py --resume {job_id}")
+    except Exception as e:
+        print(f"❌ Unexpected error: {e}")
+        import traceback
+        traceback.print_exc()
+        if checkpoints.get_job(job_id):
+            checkpoints.update_job(job_id, status="error")
+    finally:
+        if profiler and profiler.stop():
+            print(profiler.top())
+            print(f"   Inspect with: python -m pstats {profiler.paths['pstats']}; "
+                  f"load {profiler.paths['trace']} in chrome://tracing or ui.perfetto.dev")
+
+def run_sync(job_id, options, resumed=False, dry_run=False):
+    """Authenticate, fetch Sonarr's anime and sync it with MAL as checkpoint job job_id.
+    
+    Returns the sync's counters, or None if no sync ran.
+    """
+    print("🚀 Starting MAL-Sonarr Sync...")
+    print("=" * 60)
+    global _response_cache_baseline
+    # Metrics cover one run, so each daemon run reports its own
+    metrics.reset()
+    _response_cache_baseline = get_response_cache().snapshot()
+    
+    # Get access token
+    print("🔐 Authenticating with MyAnimeList...")
+    access_token = get_mal_access_token()
+    if not access_token:
+        print("❌ Failed to get MAL access token")
+        return None
+    print("✅ Authentication successful")
+    
+    # Items the drain just retried are left out of the pass below, so none is synced twice
+    retried = drain_retry_queue(access_token, options) if not dry_run else set()
+    
+    if options.get("engine") == "async":
+        counts = asyncio.run(run_async_sync(access_token, job_id, options,
+                                            resumed=resumed, dry_run=dry_run, retried=retried))
+        if counts is None:
+            return None
+    else:
         # Get anime from Sonarr
         print("📺 Fetching anime from Sonarr...")
         anime_list = get_sonarr_anime()
-        if not anime_list:
-            print("❌ No anime found in Sonarr or failed to fetch")
-            return
-        print(f"✅ Found {len(anime_list)} anime series")
-        
-        if args.dry_run:
-            print("\n🔍 DRY RUN - No changes will be made")
-            print("=" * 60)
-            for i, anime in enumerate(anime_list, 1):
-                title = anime.get('title')
-                status = anime.get('status', 'Unknown')
-                print(f"{i:3}. {title} (Status: {status})")
-            return
-        
-        # Sync with MAL
-        sync_with_mal(
+        if not begin_sync(anime_list, job_id, options, resumed=resumed, dry_run=dry_run):
+            return None
+        counts = sync_with_mal(
             anime_list, 
             access_token, 
-            interactive=not args.non_interactive,
-            default_status=args.status
+            interactive=options["interactive"],
+            default_status=options["default_status"],
+            workers=options["workers"],
+            incremental=options["incremental"],
+            job_id=job_id,
+            retried=retried
         )
-        
+    get_checkpoints().update_job(job_id, status="completed")
+    return counts
+
+def run_daemon(options):
+    """Run an incremental sync every sync_interval_hours (plus jitter) until interrupted.
+    
+    Caches, the catalog and HTTP connections stay warm between runs. A run
+    that comes due while another sync (a manual CLI run or a web job) is
+    still committing items is postponed.
+    """
+    checkpoints = get_checkpoints()
+    
+    def run_scheduled():
+        job_id = str(uuid.uuid4())
+        try:
+            counts = run_sync(job_id, options)
+        except KeyboardInterrupt:
+            if checkpoints.get_job(job_id):
+                checkpoints.update_job(job_id, status="interrupted")
+            raise
+        except Exception:
+            if checkpoints.get_job(job_id):
+                checkpoints.update_job(job_id, status="error")
+            raise
+        if counts is None:
+            raise RuntimeError("No sync ran (authentication failed or Sonarr returned no anime)")
+        return counts
+    
+    auto = AutoSync(run_scheduled, config["sync"]["sync_interval_hours"],
+                    jitter_minutes=config["sync"]["auto_sync_jitter_minutes"],
+                    path=config["sync"]["auto_sync_file"],
+                    is_busy=lambda: bool(checkpoints.active_jobs()))
+    next_run = time.strftime('%Y-%m-%d %H:%M', time.localtime(auto.state['next_run_at']))
+    print(f"🕒 Auto sync every {config['sync']['sync_interval_hours']}h, next run at {next_run} "
+          f"(Ctrl+C to stop)")
+    try:
+        auto.serve_forever()
     except KeyboardInterrupt:
-        print("\n⚠️  Sync interrupted by user")
-    except Exception as e:
-        print(f"❌ Unexpected error: {e}")
-        import traceback
-        traceback.print_exc()
+        print("\n👋 Auto sync stopped")
 
 if __name__ == "__main__":
     main()
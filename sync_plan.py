@@ -0,0 +1,143 @@
+"""
+Persisted sync plans.
+
+A preview resolves every Sonarr series to a MAL id and an intended list
+status. The plan records those decisions together with fingerprints of the
+Sonarr library and the user's MAL list it was built from, so applying it
+only has to send the list updates. A plan is stale, and must be rebuilt,
+once either fingerprint no longer matches; list entries the plan itself
+added are left out, so a partly applied plan can be applied again.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+from match_cache import series_key
+from session_store import pack_results, unpack_results
+from sync_state import series_fingerprint
+
+PLAN_FILE = "sync_plans.db"
+# Bumped when the item format changes; plans of another version are stale
+PLAN_VERSION = 1
+MAX_PLANS = 10
+
+
+def library_fingerprint(sonarr_anime):
+    """Fingerprint the synced fields of every series in a Sonarr library."""
+    entries = sorted([series_key(anime, anime.get('title')), series_fingerprint(anime)]
+                     for anime in sonarr_anime)
+    return hashlib.sha1(json.dumps(entries).encode('utf-8')).hexdigest()
+
+
+def list_fingerprint(list_index):
+    """Fingerprint a MAL list given as {anime_id: list_status}."""
+    entries = sorted([anime_id, status] for anime_id, status in list_index.items())
+    return hashlib.sha1(json.dumps(entries, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def unapplied_list_fingerprint(plan, list_index):
+    """Fingerprint list_index without the entries the plan itself wrote, to compare with the plan's."""
+    writes = {item['result']['mal_id']: item['mal_status'] for item in plan['items'] if item['mal_status']}
+    return list_fingerprint({
+        anime_id: list_status for anime_id, list_status in list_index.items()
+        if anime_id not in writes or _status_of(list_status) != writes[anime_id]
+    })
+
+
+def _status_of(list_status):
+    return list_status.get('status') if isinstance(list_status, dict) else list_status
+
+
+class PlanStore:
+    """SQLite-backed store of sync plans; only the most recent `max_plans` are kept."""
+
+    def __init__(self, path=PLAN_FILE, max_plans=MAX_PLANS):
+        self.path = path
+        self.max_plans = max_plans
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS plans (
+                plan_id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                sonarr_fingerprint TEXT,
+                list_fingerprint TEXT,
+                options TEXT,
+                items BLOB,
+                item_count INTEGER,
+                created_at REAL,
+                applied_by TEXT
+            )"""
+        )
+        self._conn.commit()
+
+    def create(self, items, sonarr_fingerprint, list_fingerprint, options=None):
+        """Persist a new plan and return its id.
+
+        Each item holds the Sonarr series ('anime'), its preview 'result' and
+        the 'mal_status' to set, or None when nothing has to be written.
+        """
+        plan_id = str(uuid.uuid4())
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO plans VALUES (?, ?, 'ready', ?, ?, ?, ?, ?, ?, NULL)",
+                (plan_id, PLAN_VERSION, sonarr_fingerprint, list_fingerprint,
+                 json.dumps(options or {}), pack_results(items), len(items), time.time())
+            )
+            self._conn.execute(
+                "DELETE FROM plans WHERE plan_id NOT IN "
+                "(SELECT plan_id FROM plans ORDER BY created_at DESC LIMIT ?)", (self.max_plans,)
+            )
+            self._conn.commit()
+        return plan_id
+
+    def get(self, plan_id, with_items=True):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT plan_id, version, status, sonarr_fingerprint, list_fingerprint, options, "
+                "item_count, created_at, applied_by, items FROM plans WHERE plan_id = ?", (plan_id,)
+            ).fetchone()
+        if not row:
+            return None
+        plan = {
+            'plan_id': row[0],
+            'version': row[1],
+            'status': row[2],
+            'sonarr_fingerprint': row[3],
+            'list_fingerprint': row[4],
+            'options': json.loads(row[5] or '{}'),
+            'item_count': row[6],
+            'created_at': row[7],
+            'applied_by': row[8]
+        }
+        if with_items:
+            plan['items'] = unpack_results(row[9])
+        return plan
+
+    def stale_reasons(self, plan, sonarr_fingerprint, list_fingerprint):
+        """Return what changed since the plan was built (empty if it can still be applied)."""
+        reasons = []
+        if plan['version'] != PLAN_VERSION:
+            reasons.append('version')
+        if plan['sonarr_fingerprint'] != sonarr_fingerprint:
+            reasons.append('sonarr')
+        if plan['list_fingerprint'] != list_fingerprint:
+            reasons.append('mal_list')
+        return reasons
+
+    def update_status(self, plan_id, status, applied_by=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE plans SET status = ?, applied_by = COALESCE(?, applied_by) WHERE plan_id = ?",
+                (status, applied_by, plan_id)
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
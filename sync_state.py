@@ -0,0 +1,101 @@
+"""
+Per-series sync state used by incremental syncs.
+
+Records a content fingerprint of each Sonarr series together with the last
+successful outcome, so later runs only process series that are new or have
+changed since then.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from match_cache import series_key
+
+SYNC_STATE_FILE = "sync_state.db"
+
+
+def series_fingerprint(series):
+    """Fingerprint the fields of a Sonarr series that affect its sync (title, status, type, tags)."""
+    content = [
+        series.get('title') or '',
+        (series.get('status') or '').lower(),
+        (series.get('seriesType') or series.get('series_type') or '').lower(),
+        sorted(str(tag) for tag in series.get('tags') or [])
+    ]
+    return hashlib.sha1(json.dumps(content).encode('utf-8')).hexdigest()
+
+
+class SyncState:
+    """SQLite-backed record of the last successful sync of each series."""
+
+    def __init__(self, path=SYNC_STATE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS series_state (
+                series_key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                title TEXT,
+                outcome TEXT,
+                mal_id INTEGER,
+                mal_title TEXT,
+                score REAL,
+                synced_at REAL
+            )"""
+        )
+        self._conn.commit()
+        # Loaded once so each unchanged-series check is a dict lookup
+        self._known = {
+            row[0]: {'fingerprint': row[1], 'outcome': row[2], 'mal_id': row[3],
+                     'mal_title': row[4], 'score': row[5]}
+            for row in self._conn.execute(
+                "SELECT series_key, fingerprint, outcome, mal_id, mal_title, score FROM series_state"
+            )
+        }
+
+    def get(self, series):
+        """Return the stored state of series if it is unchanged since its last successful sync."""
+        with self._lock:
+            known = self._known.get(series_key(series, series.get('title')))
+        if known and known['fingerprint'] == series_fingerprint(series):
+            return known
+        return None
+
+    def partition(self, series_list):
+        """Split series into (changed, unchanged) lists, keeping their order."""
+        changed, unchanged = [], []
+        for series in series_list:
+            (unchanged if self.get(series) else changed).append(series)
+        return changed, unchanged
+
+    def forget(self, series):
+        """Drop the stored state of series, so its next sync processes it again."""
+        key = series_key(series, series.get('title'))
+        with self._lock:
+            self._conn.execute("DELETE FROM series_state WHERE series_key = ?", (key,))
+            self._conn.commit()
+            self._known.pop(key, None)
+
+    def record(self, series, outcome, mal_id=None, mal_title=None, score=None):
+        """Remember a successful outcome for series under its current fingerprint."""
+        key = series_key(series, series.get('title'))
+        fingerprint = series_fingerprint(series)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO series_state "
+                "(series_key, fingerprint, title, outcome, mal_id, mal_title, score, synced_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, fingerprint, series.get('title'), outcome, mal_id, mal_title,
+                 score, time.time())
+            )
+            self._conn.commit()
+            self._known[key] = {'fingerprint': fingerprint, 'outcome': outcome, 'mal_id': mal_id,
+                                'mal_title': mal_title, 'score': score}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,23 @@
+import pytest
+
+from catalog_index import decode_postings, encode_postings
+
+
+@pytest.mark.parametrize('ids', [
+    [],
+    [1],
+    [0, 1, 2],
+    [127, 128, 16383, 16384],
+    [5, 300, 70000, 2 ** 31],
+])
+def test_postings_round_trip(ids):
+    assert decode_postings(encode_postings(ids)) == ids
+
+
+def test_postings_are_sorted_on_encode():
+    assert decode_postings(encode_postings([300, 5, 70000])) == [5, 300, 70000]
+
+
+def test_postings_use_one_byte_per_small_delta():
+    assert encode_postings([1, 2, 3]) == bytes([1, 1, 1])
+    assert encode_postings([128]) == bytes([0x80, 0x01])
@@ -0,0 +1,48 @@
+import time
+
+from checkpoints import CheckpointStore
+
+
+def test_a_reopened_store_resumes_where_the_job_stopped(tmp_path):
+    path = str(tmp_path / 'sync_jobs.db')
+    store = CheckpointStore(path)
+    store.create_job('job-1', 'cli', {'workers': 4}, total=4)
+    store.commit_item('job-1', 'tvdb:1', 1, 'updated', {'title': 'Frieren'})
+    store.commit_item('job-1', 'tvdb:2', 2, 'failed', {'title': 'Mushishi'})
+    store.commit_item('job-1', 'tvdb:3', 3, 'no_match')
+    # The process dies here: nothing is closed or marked
+    store = CheckpointStore(path)
+    assert store.mark_interrupted('cli') == 1
+    job = store.latest_resumable('cli')
+    assert (job['job_id'], job['status'], job['cursor'], job['total']) == ('job-1', 'interrupted', 3, 4)
+    assert job['options'] == {'workers': 4}
+    # Failed items are attempted again; everything else is done
+    assert store.completed_keys('job-1') == {'tvdb:1', 'tvdb:3'}
+    assert store.committed_items('job-1')['tvdb:1']['result'] == {'title': 'Frieren'}
+
+
+def test_recommitting_an_item_replaces_its_outcome(tmp_path):
+    store = CheckpointStore(str(tmp_path / 'sync_jobs.db'))
+    store.create_job('job-1', 'web')
+    store.commit_item('job-1', 'tvdb:2', 1, 'failed')
+    store.commit_item('job-1', 'tvdb:2', 1, 'updated')
+    assert store.completed_keys('job-1') == {'tvdb:2'}
+    assert store.get_job('job-1')['cursor'] == 1
+
+
+def test_completed_jobs_are_not_resumable(tmp_path):
+    store = CheckpointStore(str(tmp_path / 'sync_jobs.db'))
+    store.create_job('old', 'cli')
+    store.update_job('old', status='completed')
+    assert store.latest_resumable('cli') is None
+    assert store.latest_resumable('web') is None
+
+
+def test_only_recently_updated_running_jobs_are_active(tmp_path, monkeypatch):
+    store = CheckpointStore(str(tmp_path / 'sync_jobs.db'))
+    now = time.time()
+    monkeypatch.setattr('checkpoints.time.time', lambda: now - 3600)
+    store.create_job('abandoned', 'cli')
+    monkeypatch.setattr('checkpoints.time.time', lambda: now)
+    store.create_job('live', 'web')
+    assert [job['job_id'] for job in store.active_jobs(within_seconds=600)] == ['live']
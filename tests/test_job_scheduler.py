@@ -0,0 +1,110 @@
+import threading
+
+from job_scheduler import JobScheduler, dedup_key
+
+
+class Recorder:
+    """start callback that only records the jobs it was asked to start."""
+
+    def __init__(self):
+        self.started = []
+
+    def __call__(self, session_id, options, resume):
+        self.started.append((session_id, options.get('name'), resume))
+
+    @property
+    def names(self):
+        return [name for _, name, _ in self.started]
+
+
+def submit(scheduler, name, priority=0, **options):
+    job, deduplicated = scheduler.submit(dict(options, name=name), priority=priority)
+    return job['session_id'], deduplicated
+
+
+class TestPriority:
+    def test_queued_jobs_start_highest_priority_first_then_oldest(self):
+        start = Recorder()
+        scheduler = JobScheduler(start)
+        submit(scheduler, 'running')
+        submit(scheduler, 'low', priority=0, rematch=True)
+        submit(scheduler, 'high', priority=5, incremental=True)
+        submit(scheduler, 'also high', priority=5, dry_run=True)
+        assert start.names == ['running']
+        assert [job['options']['name'] for job in scheduler.snapshot()['queued']] == ['high', 'also high', 'low']
+        for expected in ('high', 'also high', 'low'):
+            scheduler.job_finished(start.started[-1][0])
+            assert start.names[-1] == expected
+
+    def test_more_jobs_run_at_once_up_to_max_concurrent(self):
+        start = Recorder()
+        scheduler = JobScheduler(start, max_concurrent=2)
+        submit(scheduler, 'a')
+        submit(scheduler, 'b', rematch=True)
+        submit(scheduler, 'c', dry_run=True)
+        assert start.names == ['a', 'b']
+        scheduler.configure(3)
+        assert start.names == ['a', 'b', 'c']
+
+
+class TestDeduplication:
+    def test_equivalent_request_attaches_to_the_running_job(self):
+        scheduler = JobScheduler(Recorder())
+        first, deduplicated = submit(scheduler, 'first', workers=1)
+        second, attached = submit(scheduler, 'second', workers=8)
+        assert (deduplicated, attached) == (False, True)
+        assert first == second
+        assert scheduler.snapshot()['deduplicated'] == 1
+
+    def test_different_options_or_plans_are_separate_jobs(self):
+        scheduler = JobScheduler(Recorder())
+        ids = {submit(scheduler, 'full')[0], submit(scheduler, 'dry', dry_run=True)[0],
+               submit(scheduler, 'plan', plan_id='p1')[0], submit(scheduler, 'plan', plan_id='p2')[0]}
+        assert len(ids) == 4
+
+    def test_a_finished_job_no_longer_absorbs_requests(self):
+        scheduler = JobScheduler(Recorder())
+        first, _ = submit(scheduler, 'first')
+        scheduler.job_finished(first)
+        second, deduplicated = submit(scheduler, 'second')
+        assert not deduplicated and second != first
+
+    def test_dedup_keys(self):
+        assert dedup_key({'series_ids': [3, 1]}) == dedup_key({'series_ids': [1, 3]})
+        assert dedup_key({}, resume_session_id='s') == 'resume:s'
+        assert dedup_key({'workers': 4}) == dedup_key({'workers': 1})
+
+
+def test_cancel_only_removes_queued_jobs():
+    cancelled = []
+    scheduler = JobScheduler(Recorder(), on_cancelled=cancelled.append)
+    running, _ = submit(scheduler, 'running')
+    queued, _ = submit(scheduler, 'queued', rematch=True)
+    assert scheduler.position(queued) == 1
+    assert not scheduler.cancel(running)
+    assert scheduler.cancel(queued)
+    assert scheduler.position(queued) is None
+    assert [job['state'] for job in cancelled] == ['cancelled']
+    assert scheduler.wait(queued, timeout=0)
+
+
+def test_wait_returns_once_the_job_finishes():
+    scheduler = JobScheduler(Recorder())
+    session_id, _ = submit(scheduler, 'job')
+    assert not scheduler.wait(session_id, timeout=0.01)
+    threading.Timer(0.05, scheduler.job_finished, args=(session_id,)).start()
+    assert scheduler.wait(session_id, timeout=5)
+    assert not scheduler.is_busy()
+
+
+def test_a_start_that_raises_frees_its_slot():
+    def start(session_id, options, resume):
+        if options['name'] == 'broken':
+            raise RuntimeError('boom')
+
+    scheduler = JobScheduler(start)
+    try:
+        submit(scheduler, 'broken')
+    except RuntimeError:
+        pass
+    assert not scheduler.is_busy()
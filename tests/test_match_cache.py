@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+import match_cache
+from match_cache import NEGATIVE_TTL, MatchCache, series_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    store = MatchCache(str(tmp_path / 'matches.db'))
+    yield store
+    store.close()
+
+
+def age(monkeypatch, seconds):
+    now = time.time() + seconds
+    monkeypatch.setattr(match_cache.time, 'time', lambda: now)
+
+
+def test_series_key_prefers_ids_over_the_title():
+    assert series_key({'tvdbId': 1, 'id': 2}, 'X') == 'tvdb:1'
+    assert series_key({'id': 2}, 'X') == 'sonarr:2'
+    assert series_key(title='Frieren') == series_key(title='FRIEREN')
+
+
+def test_renamed_series_misses_and_is_dropped(cache):
+    cache.put('tvdb:1', 'Frieren', 52991, 'Sousou no Frieren', score=95)
+    assert cache.get('tvdb:1', 'Frieren')['mal_id'] == 52991
+    assert cache.get('tvdb:1', 'Frieren Beyond Journey') is None
+    assert cache.stats()['invalidations'] == 1
+    assert cache.stats()['entries'] == 0
+
+
+def test_a_good_match_never_expires(cache, monkeypatch):
+    cache.put('tvdb:1', 'Frieren', 52991, 'Sousou no Frieren', score=95)
+    age(monkeypatch, NEGATIVE_TTL * 10)
+    assert cache.get('tvdb:1', 'Frieren', min_score=75)['score'] == 95
+
+
+def test_a_no_match_entry_is_searched_again_once_it_expires(cache, monkeypatch):
+    cache.put('tvdb:7', 'Obscure OVA', 100, 'Something Else', score=40)
+    assert cache.get('tvdb:7', 'Obscure OVA', min_score=75)['score'] == 40
+
+    age(monkeypatch, NEGATIVE_TTL + 1)
+    assert cache.get('tvdb:7', 'Obscure OVA', min_score=75) is None
+    assert cache.stats()['expired'] == 1
+
+    cache.put('tvdb:7', 'Obscure OVA', 200, 'Obscure OVA', score=98)
+    assert cache.get('tvdb:7', 'Obscure OVA', min_score=75)['mal_id'] == 200
+
+
+def test_expiry_follows_the_threshold_in_effect(cache, monkeypatch):
+    cache.put('tvdb:7', 'Obscure OVA', 100, 'Obscure OVA Special', score=70)
+    age(monkeypatch, NEGATIVE_TTL + 1)
+    # Lowered threshold: the stored match now qualifies and is kept
+    assert cache.get('tvdb:7', 'Obscure OVA', min_score=65)['mal_id'] == 100
+    # Raised threshold: the same entry is a stale no-match
+    assert cache.get('tvdb:7', 'Obscure OVA', min_score=75) is None
+    # Without a threshold the entry is returned as stored
+    assert cache.get('tvdb:7', 'Obscure OVA')['score'] == 70
+
+
+def test_refresh_and_clear(tmp_path):
+    store = MatchCache(str(tmp_path / 'matches.db'), refresh=True)
+    store.put('sonarr:3', 'Mushishi', 457, 'Mushishi', score=100)
+    assert store.get('sonarr:3', 'Mushishi') is None
+    store.refresh = False
+    assert store.get('sonarr:3', 'Mushishi')['mal_id'] == 457
+    assert store.clear() == 1
+    assert store.get('sonarr:3', 'Mushishi') is None
+    assert store.stats()['hit_ratio'] == pytest.approx(1 / 3, abs=0.001)
+    store.close()
@@ -0,0 +1,87 @@
+import time
+
+from rate_limit import AdaptiveRateLimiter, limiter_from_config
+
+
+def recover(limiter, successes):
+    for _ in range(successes):
+        limiter.record_response(200)
+
+
+def test_throttling_halves_the_rate_once_per_cooldown():
+    limiter = AdaptiveRateLimiter(rate=10, burst=2)
+    limiter.record_response(429)
+    # Requests already in flight when the first 429 arrived count as the same signal
+    limiter.record_response(429)
+    limiter.record_response(503)
+    assert limiter.rate == 5
+    assert limiter.decreases == 1
+    assert limiter.throttled == 3
+
+
+def test_throttling_again_after_the_cooldown_decreases_again():
+    limiter = AdaptiveRateLimiter(rate=10, burst=2)
+    limiter.record_response(429)
+    limiter._cooldown_until = time.monotonic()
+    limiter.record_response(429)
+    assert limiter.rate == 2.5
+    assert limiter.decreases == 2
+
+
+def test_rate_never_drops_below_min_rate():
+    limiter = AdaptiveRateLimiter(rate=1, burst=1, min_rate=0.4)
+    for _ in range(5):
+        limiter._cooldown_until = 0.0
+        limiter.record_response(429)
+    assert limiter.rate == 0.4
+
+
+def test_healthy_window_restores_the_configured_rate_but_not_more():
+    limiter = AdaptiveRateLimiter(rate=10, burst=2, healthy_window=10)
+    limiter.record_response(429)
+    recover(limiter, 10)
+    assert limiter.rate == 6
+    recover(limiter, 100)
+    assert limiter.rate == 10
+    assert limiter.increases == 5
+
+
+def test_max_rate_allows_climbing_above_the_configured_rate():
+    limiter = AdaptiveRateLimiter(rate=10, burst=2, max_rate=12, healthy_window=10)
+    recover(limiter, 100)
+    assert limiter.rate == 12
+    assert limiter.stats()['max_requests_per_second'] == 12
+
+
+def test_errors_do_not_count_as_healthy():
+    limiter = AdaptiveRateLimiter(rate=10, burst=2, healthy_window=2)
+    limiter.record_response(429)
+    for status in (404, 500, 502, 404):
+        limiter.record_response(status)
+    assert limiter.rate == 5
+    limiter.record_response(304)
+    limiter.record_response(201)
+    assert limiter.rate == 6
+
+
+def test_throttle_resets_the_healthy_streak():
+    limiter = AdaptiveRateLimiter(rate=10, burst=2, healthy_window=3)
+    limiter.record_response(429)
+    recover(limiter, 2)
+    limiter.record_response(429)
+    recover(limiter, 2)
+    assert limiter.rate == 5
+    assert limiter.increases == 0
+
+
+def test_retry_after_pauses_every_caller():
+    limiter = AdaptiveRateLimiter(rate=10, burst=2)
+    limiter.record_response(429, retry_after=30)
+    assert limiter.stats()['paused_seconds'] > 29
+
+
+def test_limiter_from_config():
+    assert isinstance(limiter_from_config({'requests_per_second': 2}), AdaptiveRateLimiter)
+    fixed = limiter_from_config({'requests_per_second': 2, 'adaptive_rate': False})
+    assert not isinstance(fixed, AdaptiveRateLimiter)
+    assert fixed.rate == 2
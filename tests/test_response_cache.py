@@ -0,0 +1,88 @@
+import os
+
+import pytest
+
+import response_cache
+from response_cache import LIST_STATUS_TTL, ResponseCache
+
+MAL = 'https://api.myanimelist.net/v2'
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / 'responses.db'))
+    yield cache
+    cache.close()
+
+
+def store(cache, url, params, body=b'{}'):
+    key = cache.key_for('GET', url, params)
+    cache.put(key, url, 'application/json', body)
+    return key
+
+
+def test_search_keys_ignore_case_spacing_and_parameter_order(cache):
+    first = cache.key_for('GET', f'{MAL}/anime', {'q': 'Attack  on Titan', 'limit': 10})
+    second = cache.key_for('GET', f'{MAL}/anime?limit=10', {'q': 'attack on titan'})
+    assert first == second
+    assert cache.key_for('POST', f'{MAL}/anime', {'q': 'x'}) is None
+
+
+def test_search_responses_are_served_until_they_expire(cache, clock):
+    key = store(cache, f'{MAL}/anime', {'q': 'Frieren'}, b'{"data": []}')
+    assert cache.get(key) == ('application/json', b'{"data": []}')
+    clock[0] += 24 * 3600 + 1
+    assert cache.get(key) is None
+    assert (cache.counters['hits'], cache.counters['misses']) == (1, 1)
+
+
+def test_list_status_details_expire_within_seconds(cache, clock):
+    status_key = store(cache, f'{MAL}/anime/52991', {'fields': 'my_list_status'})
+    detail_key = store(cache, f'{MAL}/anime/52991', {'fields': 'id,title'})
+    clock[0] += LIST_STATUS_TTL + 1
+    assert cache.get(status_key) is None
+    assert cache.get(detail_key) is not None
+
+
+def test_own_list_update_drops_the_cached_details(cache):
+    key = store(cache, f'{MAL}/anime/52991', {'fields': 'my_list_status'})
+    other = store(cache, f'{MAL}/anime/457', {'fields': 'my_list_status'})
+    assert cache.written('GET', f'{MAL}/anime/52991') == 0
+    assert cache.written('PUT', f'{MAL}/anime/52991/my_list_status') == 1
+    assert cache.get(key) is None
+    assert cache.get(other) is not None
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_refresh_mode_stores_without_reading(cache):
+    cache.configure(mode='refresh')
+    key = store(cache, f'{MAL}/anime', {'q': 'Frieren'})
+    assert cache.get(key) is None
+    cache.configure(mode='use')
+    assert cache.get(key) is not None
+
+
+def test_bypass_mode_leaves_the_cache_alone(cache):
+    cache.configure(mode='bypass')
+    assert cache.key_for('GET', f'{MAL}/anime', {'q': 'Frieren'}) is None
+    with pytest.raises(ValueError):
+        cache.configure(mode='sometimes')
+
+
+def test_least_recently_used_responses_are_evicted_over_the_cap(cache, clock):
+    cache.configure(max_mb=0.01)
+    body = os.urandom(5000)
+    keys = []
+    for anime_id in range(4):
+        clock[0] += 1
+        keys.append(store(cache, f'{MAL}/anime/{anime_id}', {'fields': 'id'}, body))
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[-1]) is not None
+    assert cache.stats()['bytes'] <= cache.max_bytes
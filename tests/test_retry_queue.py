@@ -0,0 +1,113 @@
+import pytest
+import requests
+
+from retry_queue import RetryQueue, failure_reason, retry_delay
+
+FRIEREN = {'id': 1, 'tvdbId': 100, 'title': 'Frieren'}
+MUSHISHI = {'id': 2, 'tvdbId': 200, 'title': 'Mushishi'}
+
+
+@pytest.fixture
+def queue(tmp_path):
+    retries = RetryQueue(str(tmp_path / 'retry_queue.db'), max_attempts=3, base_delay=0)
+    yield retries
+    retries.close()
+
+
+@pytest.mark.parametrize('error, reason', [
+    (429, 'throttled'),
+    (503, 'throttled'),
+    (502, 'server_error'),
+    (400, None),
+    (404, None),
+    (requests.exceptions.ReadTimeout(), 'timeout'),
+    (requests.exceptions.ConnectionError(), 'connection'),
+    (ValueError('bad data'), None),
+])
+def test_failure_reason(error, reason):
+    assert failure_reason(error) == reason
+
+
+def test_retry_delay_doubles_up_to_the_limit():
+    assert [retry_delay(attempts, base=60, limit=300) for attempts in range(1, 6)] == [60, 120, 240, 300, 300]
+
+
+def test_push_queues_retryable_failures(queue):
+    assert queue.push(FRIEREN, 'update', 503, mal_id=52991, mal_title='Sousou no Frieren',
+                      mal_status='watching') == 'queued'
+    [entry] = queue.due()
+    assert entry['series'] == FRIEREN
+    assert (entry['stage'], entry['mal_id'], entry['mal_status']) == ('update', 52991, 'watching')
+    assert (entry['attempts'], entry['reason']) == (1, 'throttled')
+    assert queue.stats()['pending'] == 1
+
+
+def test_push_schedules_the_next_attempt_with_backoff(tmp_path):
+    retries = RetryQueue(str(tmp_path / 'retry_queue.db'), base_delay=60)
+    retries.push(FRIEREN, 'search', 503)
+    assert retries.due() == []
+    assert retries.stats()['due'] == 0
+    retries.close()
+
+
+def test_permanent_failure_is_dead_lettered_at_once(queue):
+    assert queue.push(FRIEREN, 'update', 400) == 'dead'
+    assert queue.due() == []
+    [letter] = queue.dead_letters()
+    assert letter['reason'] == 'permanent'
+
+
+def test_repeated_failures_are_dead_lettered_after_max_attempts(queue):
+    assert [queue.push(FRIEREN, 'search', 503) for _ in range(3)] == ['queued', 'queued', 'dead']
+    [letter] = queue.dead_letters()
+    assert letter['attempts'] == 3
+    assert queue.stats()['dead_lettered'] == 1
+
+
+def test_drain_resolves_recovered_items_and_requeues_failures(queue):
+    queue.push(FRIEREN, 'search', 503)
+    queue.push(MUSHISHI, 'search', 503)
+    results = {'Frieren': None, 'Mushishi': requests.exceptions.ReadTimeout()}
+    counts = queue.drain(lambda entry: results[entry['series']['title']], workers=2)
+    assert counts == {'retried': 2, 'recovered': 1, 'requeued': 1, 'dead_lettered': 0}
+    [entry] = queue.pending()
+    assert (entry['series']['title'], entry['attempts'], entry['reason']) == ('Mushishi', 2, 'timeout')
+
+
+def test_drain_dead_letters_items_that_keep_failing(queue):
+    queue.push(FRIEREN, 'search', 503)
+    queue.drain(lambda entry: 503)
+    counts = queue.drain(lambda entry: 503)
+    assert counts['dead_lettered'] == 1
+    assert queue.pending() == []
+    assert queue.drain(lambda entry: None)['retried'] == 0
+
+
+def test_drain_treats_exceptions_as_failures(queue):
+    queue.push(FRIEREN, 'search', 503)
+
+    def process(entry):
+        raise requests.exceptions.ConnectionError()
+
+    assert queue.drain(process)['requeued'] == 1
+    assert queue.pending()[0]['reason'] == 'connection'
+
+
+def test_resolve_clears_queued_items_and_dead_letters(queue):
+    queue.push(FRIEREN, 'search', 503)
+    queue.push(MUSHISHI, 'update', 400)
+    assert queue.resolve(FRIEREN)
+    assert queue.resolve(MUSHISHI)
+    assert not queue.resolve(FRIEREN)
+    assert queue.stats()['pending'] == queue.stats()['dead_letters'] == 0
+
+
+def test_requeue_and_discard_dead_letters(queue):
+    queue.push(FRIEREN, 'update', 400)
+    queue.push(MUSHISHI, 'update', 400)
+    key = queue.dead_letters()[0]['item_key']
+    assert queue.requeue(key) == 1
+    [entry] = queue.due()
+    assert (entry['item_key'], entry['attempts']) == (key, 0)
+    assert queue.discard() == 1
+    assert queue.dead_letters() == []
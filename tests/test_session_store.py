@@ -0,0 +1,76 @@
+import session_store
+from session_store import SessionStore
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+def finish(store, session_id, results):
+    store.create(session_id, {'status': 'running', 'results': list(results)})
+    store[session_id]['status'] = 'completed'
+    store.finish(session_id)
+
+
+def disk_ids(store):
+    return {row[0] for row in store._conn.execute("SELECT session_id FROM sessions")}
+
+
+def test_finished_results_move_to_disk(tmp_path):
+    store = SessionStore(str(tmp_path / 'sessions.db'))
+    finish(store, 'a', [{'title': 'Frieren'}, {'title': 'Mushishi'}])
+    assert 'results' not in store['a']
+    status = store.status('a', since=1)
+    assert status['results'] == [{'title': 'Mushishi'}]
+    assert (status['cursor'], status['status']) == (2, 'completed')
+
+
+def test_sessions_over_the_cap_are_deleted_from_disk(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(session_store.time, 'time', clock.time)
+    store = SessionStore(str(tmp_path / 'sessions.db'), max_sessions=2)
+    for session_id in 'abcd':
+        clock.now += 1
+        finish(store, session_id, [{'title': session_id}])
+    assert disk_ids(store) == {'c', 'd'}
+    assert store.status('a') is None
+    assert store.status('d')['results'] == [{'title': 'd'}]
+    assert store.stats()['sessions_on_disk'] == 2
+
+
+def test_sessions_past_the_ttl_are_deleted_from_memory_and_disk(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(session_store.time, 'time', clock.time)
+    store = SessionStore(str(tmp_path / 'sessions.db'), ttl_hours=1)
+    finish(store, 'old', [])
+    clock.now += 1800
+    finish(store, 'new', [])
+    clock.now += 2000
+    stats = store.stats()
+    assert 'old' not in store and 'new' in store
+    assert disk_ids(store) == {'new'}
+    assert stats['evictions'] == 1
+
+
+def test_rows_left_by_an_earlier_process_expire_too(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(session_store.time, 'time', clock.time)
+    path = str(tmp_path / 'sessions.db')
+    earlier = SessionStore(path, ttl_hours=1)
+    finish(earlier, 'a', [])
+    earlier.close()
+    clock.now += 7200
+    store = SessionStore(path, ttl_hours=1)
+    store.create('b', {'status': 'running', 'results': []})
+    assert disk_ids(store) == set()
+
+
+def test_running_sessions_are_never_evicted(tmp_path):
+    store = SessionStore(str(tmp_path / 'sessions.db'), max_sessions=1)
+    store.create('a', {'status': 'running', 'results': []})
+    store.create('b', {'status': 'running', 'results': []})
+    assert 'a' in store and 'b' in store
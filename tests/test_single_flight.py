@@ -0,0 +1,148 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from single_flight import AsyncSingleFlight, SingleFlight, search_key
+
+
+def test_search_key_folds_the_query():
+    assert search_key('Attack  on TITAN', 10) == search_key('attack on titan', 10)
+    assert search_key('Frieren', 10) != search_key('Frieren', 5)
+
+
+def test_concurrent_callers_share_one_call():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def search():
+        calls.append(1)
+        release.wait(5)
+        return ['result']
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.do('key', search))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    while flights.counters['sent'] + flights.counters['coalesced'] < 8:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert calls == [1]
+    assert results == [['result']] * 8
+    assert flights.do('key', lambda: pytest.fail('not called again')) == ['result']
+    assert flights.stats() == {'sent': 1, 'coalesced': 8, 'unique': 1, 'saved_ratio': 0.889}
+
+
+def test_a_failure_reaches_every_waiter_and_is_not_remembered():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise TimeoutError('MAL timed out')
+
+    errors = []
+
+    def call():
+        try:
+            flights.do('key', failing)
+        except TimeoutError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    while flights.counters['sent'] + flights.counters['coalesced'] < 3:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 3
+    assert flights.do('key', lambda: 'retried') == 'retried'
+
+
+def test_async_callers_share_one_call():
+    async def scenario():
+        flights = AsyncSingleFlight()
+        calls = []
+
+        async def search():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return ['result']
+
+        results = await asyncio.gather(*(flights.do('key', search) for _ in range(5)))
+        return calls, results, await flights.do('key', search)
+
+    calls, results, later = asyncio.run(scenario())
+    assert calls == [1]
+    assert results == [['result']] * 5
+    assert later == ['result']
+
+
+def test_async_failure_reaches_every_waiter_and_is_not_remembered():
+    async def scenario():
+        flights = AsyncSingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise ConnectionError('reset')
+
+        async def working():
+            return 'retried'
+
+        outcomes = await asyncio.gather(*(flights.do('key', failing) for _ in range(3)),
+                                        return_exceptions=True)
+        return outcomes, await flights.do('key', working)
+
+    outcomes, retried = asyncio.run(scenario())
+    assert all(isinstance(outcome, ConnectionError) for outcome in outcomes)
+    assert retried == 'retried'
+
+
+def test_cancelling_a_waiter_leaves_the_shared_search_running():
+    async def scenario():
+        flights = AsyncSingleFlight()
+
+        async def search():
+            await asyncio.sleep(0.05)
+            return 'result'
+
+        leader = asyncio.ensure_future(flights.do('key', search))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(flights.do('key', search))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        return await leader, waiter
+
+    result, waiter = asyncio.run(scenario())
+    assert result == 'result'
+    assert waiter.cancelled()
+
+
+def test_cancelling_the_leader_cancels_its_waiters_and_allows_a_new_search():
+    async def scenario():
+        flights = AsyncSingleFlight()
+
+        async def search():
+            await asyncio.sleep(1)
+            return 'never'
+
+        leader = asyncio.ensure_future(flights.do('key', search))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(flights.do('key', search))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        async def quick():
+            return 'fresh'
+
+        return await flights.do('key', quick)
+
+    assert asyncio.run(scenario()) == 'fresh'
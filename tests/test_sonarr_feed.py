@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from sonarr_feed import JsonArrayParser, StreamStats, iter_json_array
+
+SERIES = [
+    {'id': 1, 'title': 'Frieren', 'tags': [1, 2]},
+    {'id': 2, 'title': 'Ｄｒ．ＳＴＯＮＥ', 'year': 2019},
+    {'id': 3, 'title': 'Escaped \\"quote\\" ]', 'tags': []},
+    12345,
+    'text, with ] and [',
+    None,
+]
+
+
+def parse_in_chunks(text, size):
+    parser = JsonArrayParser()
+    values = []
+    for start in range(0, len(text), size):
+        values.extend(parser.feed(text[start:start + size]))
+    values.extend(parser.close())
+    return values
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 64, 10000])
+def test_chunk_boundaries_do_not_change_the_result(size):
+    text = json.dumps(SERIES, ensure_ascii=False, indent=1)
+    assert parse_in_chunks(text, size) == SERIES
+
+
+def test_number_split_across_chunks_is_not_cut_short():
+    parser = JsonArrayParser()
+    assert parser.feed('[12') == []
+    assert parser.feed('34, 5') == [1234]
+    assert parser.feed(']') == [5]
+    assert parser.done
+
+
+def test_empty_array():
+    assert parse_in_chunks(' [ ] ', 1) == []
+
+
+def test_truncated_array_raises():
+    parser = JsonArrayParser()
+    parser.feed('[{"id": 1}, {"id"')
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+def test_non_array_raises():
+    with pytest.raises(ValueError):
+        JsonArrayParser().feed('{"id": 1}')
+
+
+def test_iter_json_array_counts_elements():
+    stats = StreamStats()
+    text = json.dumps(SERIES)
+    chunks = [text[i:i + 5] for i in range(0, len(text), 5)]
+    assert list(iter_json_array(chunks, stats)) == SERIES
+    assert stats.series_seen == len(SERIES)
+    assert stats.peak_buffer_bytes < len(text)
@@ -0,0 +1,92 @@
+import pytest
+
+import sync_plan
+from sync_plan import PlanStore, library_fingerprint, list_fingerprint, unapplied_list_fingerprint
+
+LIBRARY = [
+    {'id': 1, 'tvdbId': 100, 'title': 'Frieren', 'status': 'continuing', 'seriesType': 'anime', 'tags': [1]},
+    {'id': 2, 'tvdbId': 200, 'title': 'Mushishi', 'status': 'ended', 'seriesType': 'anime', 'tags': []},
+]
+LIST = {52991: 'watching', 457: 'completed'}
+
+
+@pytest.fixture
+def plans(tmp_path):
+    store = PlanStore(str(tmp_path / 'plans.db'))
+    yield store
+    store.close()
+
+
+def make_plan(plans, library=LIBRARY, list_index=LIST):
+    items = [{'anime': anime, 'result': {'title': anime['title']}, 'mal_status': None} for anime in library]
+    plan_id = plans.create(items, library_fingerprint(library), list_fingerprint(list_index),
+                           {'default_status': 'completed'})
+    return plans.get(plan_id)
+
+
+def test_fingerprints_ignore_order():
+    assert library_fingerprint(LIBRARY) == library_fingerprint(list(reversed(LIBRARY)))
+    assert list_fingerprint(LIST) == list_fingerprint(dict(reversed(list(LIST.items()))))
+
+
+def test_plan_round_trip(plans):
+    plan = make_plan(plans)
+    assert plan['status'] == 'ready'
+    assert plan['item_count'] == 2
+    assert plan['items'][0]['anime']['title'] == 'Frieren'
+    assert plan['options'] == {'default_status': 'completed'}
+    assert 'items' not in plans.get(plan['plan_id'], with_items=False)
+
+
+def test_unchanged_plan_is_not_stale(plans):
+    plan = make_plan(plans)
+    assert plans.stale_reasons(plan, library_fingerprint(LIBRARY), list_fingerprint(LIST)) == []
+
+
+def test_changed_series_makes_the_plan_stale(plans):
+    plan = make_plan(plans)
+    library = [dict(LIBRARY[0], status='ended'), LIBRARY[1]]
+    assert plans.stale_reasons(plan, library_fingerprint(library), list_fingerprint(LIST)) == ['sonarr']
+
+
+def test_ignored_series_fields_do_not_make_the_plan_stale(plans):
+    plan = make_plan(plans)
+    library = [dict(LIBRARY[0], path='/anime/Frieren'), LIBRARY[1]]
+    assert plans.stale_reasons(plan, library_fingerprint(library), list_fingerprint(LIST)) == []
+
+
+def test_changed_list_makes_the_plan_stale(plans):
+    plan = make_plan(plans)
+    list_index = {**LIST, 457: 'dropped'}
+    assert plans.stale_reasons(plan, library_fingerprint(LIBRARY), list_fingerprint(list_index)) == ['mal_list']
+    list_index = {**LIST, 1: 'plan_to_watch'}
+    assert plans.stale_reasons(plan, library_fingerprint(LIBRARY), list_fingerprint(list_index)) == ['mal_list']
+
+
+def test_plan_of_another_version_is_stale(plans, monkeypatch):
+    plan = make_plan(plans)
+    monkeypatch.setattr(sync_plan, 'PLAN_VERSION', sync_plan.PLAN_VERSION + 1)
+    assert plans.stale_reasons(plan, library_fingerprint(LIBRARY), list_fingerprint(LIST)) == ['version']
+
+
+def test_update_status_keeps_applied_by(plans):
+    plan_id = make_plan(plans)['plan_id']
+    plans.update_status(plan_id, 'applying', applied_by='job-1')
+    plans.update_status(plan_id, 'failed')
+    plan = plans.get(plan_id, with_items=False)
+    assert (plan['status'], plan['applied_by']) == ('failed', 'job-1')
+
+
+def test_entries_the_plan_added_do_not_make_it_stale():
+    plan = {'items': [
+        {'anime': LIBRARY[0], 'result': {'mal_id': 52991}, 'mal_status': None},
+        {'anime': LIBRARY[1], 'result': {'mal_id': 457}, 'mal_status': None},
+        {'anime': {'id': 3}, 'result': {'mal_id': 1}, 'mal_status': 'watching'},
+        {'anime': {'id': 4}, 'result': {'mal_id': 2}, 'mal_status': 'completed'},
+    ]}
+    half_applied = {**LIST, 1: {'status': 'watching', 'num_episodes_watched': 0}}
+    assert unapplied_list_fingerprint(plan, half_applied) == list_fingerprint(LIST)
+    assert unapplied_list_fingerprint(plan, {**LIST, 1: 'watching', 2: 'completed'}) == list_fingerprint(LIST)
+    # Someone else added a planned title with another status, or changed an entry the plan left alone
+    assert unapplied_list_fingerprint(plan, {**LIST, 1: 'dropped'}) != list_fingerprint(LIST)
+    assert unapplied_list_fingerprint(plan, {**LIST, 457: 'dropped'}) != list_fingerprint(LIST)
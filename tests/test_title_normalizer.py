@@ -0,0 +1,31 @@
+import pytest
+
+from title_normalizer import clean_title, title_key
+
+
+@pytest.mark.parametrize('title, expected', [
+    ('Attack on Titan Season 2', 'Attack on Titan'),
+    ('Mob Psycho 100 2nd Season', 'Mob Psycho 100'),
+    ('Title: Part II', 'Title'),
+    ('Title Cour 2', 'Title'),
+    ('Kaguya-sama S3', 'Kaguya-sama'),
+    ('Re:Zero OVA', 'Re:Zero'),
+    ('Gintama [TV]', 'Gintama'),
+    ('Ｄｒ．ＳＴＯＮＥ (2019)', 'Dr.STONE'),
+])
+def test_clean_title_strips_markers(title, expected):
+    assert clean_title(title) == expected
+
+
+@pytest.mark.parametrize('title', ['86', 'Steins;Gate 0'])
+def test_clean_title_keeps_bare_numbers(title):
+    assert clean_title(title) == title
+
+
+def test_clean_title_handles_missing_title():
+    assert clean_title('') == ''
+    assert clean_title(None) == ''
+
+
+def test_title_key_ignores_case_width_and_markers():
+    assert title_key('ATTACK ON TITAN Season 3') == title_key('Ａttack on Titan (2013)') == 'attack on titan'
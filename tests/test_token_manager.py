@@ -0,0 +1,122 @@
+import threading
+import time
+
+import pytest
+
+import token_manager
+from token_manager import MAX_REFRESH_FAILURES, TokenManager, expiry_timestamp
+
+
+class FakeOAuth:
+    """Stands in for MAL's token endpoint; `gate` holds requests until set."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.requests = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, refresh_token):
+        self.requests.append(refresh_token)
+        self.gate.wait(5)
+        if self.fail:
+            raise ConnectionError('token endpoint down')
+        n = len(self.requests)
+        return {'access_token': f'access-{n}', 'refresh_token': f'refresh-{n}', 'expires_in': 3600}
+
+
+def expiring_tokens():
+    return {'access_token': 'old', 'refresh_token': 'refresh-0', 'expires_at': time.time() + 10}
+
+
+def test_expiry_timestamp_accepts_both_stored_forms():
+    assert expiry_timestamp(None) is None
+    assert expiry_timestamp(1700000000) == 1700000000.0
+    assert expiry_timestamp('2024-01-01T00:00:00') > 0
+    assert expiry_timestamp('garbage') == 0.0
+
+
+def test_concurrent_refreshes_make_one_request():
+    oauth = FakeOAuth()
+    oauth.gate.clear()
+    saved = []
+    manager = TokenManager(expiring_tokens(), oauth, on_refresh=saved.append)
+    tokens = []
+    workers = [threading.Thread(target=lambda: tokens.append(manager.access_token())) for _ in range(6)]
+    for worker in workers:
+        worker.start()
+    while manager.coalesced < 5:
+        time.sleep(0.01)
+    oauth.gate.set()
+    for worker in workers:
+        worker.join()
+
+    assert oauth.requests == ['refresh-0']
+    assert tokens == ['access-1'] * 6
+    assert [t['access_token'] for t in saved] == ['access-1']
+    assert manager.stats()['refreshes'] == 1
+    assert manager.stats()['coalesced'] == 5
+
+
+def test_a_stale_401_does_not_refresh_again():
+    oauth = FakeOAuth()
+    manager = TokenManager(expiring_tokens(), oauth)
+    assert manager.refresh(stale='old') == 'access-1'
+    # A worker that saw the old token rejected reuses the replacement
+    assert manager.refresh(stale='old') == 'access-1'
+    assert oauth.requests == ['refresh-0']
+
+
+def test_fresh_tokens_are_not_refreshed():
+    oauth = FakeOAuth()
+    manager = TokenManager({'access_token': 'ok', 'refresh_token': 'r',
+                            'expires_at': time.time() + 3600}, oauth)
+    assert manager.access_token() == 'ok'
+    assert oauth.requests == []
+
+
+class TestFailures:
+    def test_expired_token_without_a_refresh_is_unusable(self):
+        manager = TokenManager({'access_token': 'old', 'refresh_token': 'r',
+                                'expires_at': time.time() - 1}, FakeOAuth(fail=True))
+        assert manager.access_token() is None
+
+    def test_expiring_token_is_still_used_while_refresh_fails(self):
+        manager = TokenManager(expiring_tokens(), FakeOAuth(fail=True))
+        assert manager.access_token() == 'old'
+        assert manager.stats()['failures'] == 1
+
+    def test_repeated_failures_ask_for_reauth_until_new_tokens_are_set(self):
+        manager = TokenManager(expiring_tokens(), FakeOAuth(fail=True))
+        for _ in range(MAX_REFRESH_FAILURES - 1):
+            assert manager.refresh() is None
+        assert not manager.needs_reauth
+        manager.refresh()
+        assert manager.needs_reauth
+        assert manager.stats()['needs_reauth'] is True
+
+        manager.set_tokens({'access_token': 'new', 'refresh_token': 'r2',
+                            'expires_at': time.time() + 3600})
+        assert not manager.needs_reauth
+        assert manager.access_token() == 'new'
+
+    def test_a_success_resets_the_failure_streak(self):
+        oauth = FakeOAuth(fail=True)
+        manager = TokenManager(expiring_tokens(), oauth)
+        manager.refresh()
+        manager.refresh()
+        oauth.fail = False
+        assert manager.refresh() == 'access-3'
+        assert manager.failures_in_row == 0
+
+
+def test_background_thread_refreshes_ahead_of_expiry(monkeypatch):
+    monkeypatch.setattr(token_manager, 'REFRESH_RETRY_SECONDS', 0.01)
+    oauth = FakeOAuth()
+    manager = TokenManager(expiring_tokens(), oauth, margin=60)
+    manager.start()
+    deadline = time.time() + 5
+    while manager.current() == 'old' and time.time() < deadline:
+        time.sleep(0.01)
+    assert manager.current() == 'access-1'
+    assert manager.stats()['expires_in_seconds'] == pytest.approx(3600, abs=5)
@@ -0,0 +1,68 @@
+"""
+Title normalization shared by the CLI, the web app, the catalog and the caches.
+
+clean_title() NFKC-folds a title and strips season, part and cour markers,
+bracketed annotations (years, "[TV]") and OVA/ONA/OAD tags with a few
+precompiled patterns. fold_title() reduces any title to lowercase words
+separated by single spaces, and title_key() combines the two into the
+canonical key of the show a title names. fold_query() keys identical search
+queries for the response cache and search coalescing. Results are memoized in bounded LRU
+caches, so each distinct title is processed once per process.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+
+NORMALIZE_CACHE_SIZE = 65536
+
+# Bracketed annotations: "(2019)", "[TV]", "【Dub】"
+_BRACKETS = re.compile(r'\s*(?:\([^)]*\)|\[[^\]]*\]|【[^】]*】)')
+# Season/part/cour markers ("Season 2", "2nd Season", "Part II", "Cour 2", "S3") and
+# release-type tags. Bare numbers are kept: they are often part of the title ("86", "Steins;Gate 0")
+_MARKERS = re.compile(
+    r'\s*\b(?:(?:season|part|cour)\s+(?:\d+|[ivx]+)|\d+(?:st|nd|rd|th)\s+season|s\d+|ova|ona|oad)\b',
+    re.IGNORECASE
+)
+# Separators left dangling once a marker is gone ("Title: Season 2" -> "Title:")
+_TRAILING = re.compile(r'[\s:\-–~]+$')
+_SPACES = re.compile(r'\s+')
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def clean_title(title):
+    """Return title NFKC-folded, without season/part/cour markers or bracketed annotations.
+
+    Case is kept, so the result can be sent as a search query.
+    """
+    title = unicodedata.normalize('NFKC', title or '')
+    title = _MARKERS.sub('', _BRACKETS.sub('', title))
+    return _TRAILING.sub('', _SPACES.sub(' ', title)).strip()
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def fold_title(title):
+    """Lowercase, NFKC-fold and collapse punctuation/spacing of a title."""
+    title = unicodedata.normalize('NFKC', title or '').lower()
+    return _NON_WORD.sub(' ', title).strip()
+
+
+def fold_query(query):
+    """A search query as MAL matches it: NFKC-folded, case-folded, single-spaced."""
+    return ' '.join(unicodedata.normalize('NFKC', query or '').split()).casefold()
+
+
+def title_key(title):
+    """Canonical key of the show a title names: cleaned, then folded.
+
+    Titles that differ only in case, width, punctuation or season markers
+    share a key (and so would get the same search results).
+    """
+    return fold_title(clean_title(title))
+
+
+def cache_info():
+    """Hit/miss statistics of the clean_title and fold_title memos."""
+    return {'clean_title': clean_title.cache_info()._asdict(),
+            'fold_title': fold_title.cache_info()._asdict()}
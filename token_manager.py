@@ -0,0 +1,179 @@
+"""
+MyAnimeList access token management shared by every worker.
+
+TokenManager keeps the current token in memory, refreshes it ahead of
+expiry (on a background thread once started) and collapses concurrent
+refresh attempts into a single request: workers that find the token
+expiring or get a 401 at the same moment all wait for, and then use, the
+same new token. After MAX_REFRESH_FAILURES failed refreshes in a row the
+background thread stops retrying until new tokens are set.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+# Refresh this long before the token expires
+DEFAULT_REFRESH_MARGIN = 300
+# Wait before retrying a failed background refresh
+REFRESH_RETRY_SECONDS = 60
+# Failed refreshes in a row after which the user has to authenticate again
+MAX_REFRESH_FAILURES = 5
+
+
+def expiry_timestamp(value):
+    """Return a token's `expires_at` (UNIX time or ISO string, as the CLI stores it) as UNIX time."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            return 0.0
+    return float(value)
+
+
+class TokenManager:
+    """Current MAL tokens with single-flight, ahead-of-expiry refreshing.
+
+    `refresh(refresh_token)` requests new tokens and returns the token
+    response (raising on failure); `on_refresh(tokens)` persists them.
+    """
+
+    def __init__(self, tokens, refresh, on_refresh=None, margin=DEFAULT_REFRESH_MARGIN):
+        self._refresh = refresh
+        self._on_refresh = on_refresh
+        self.margin = margin
+        self._lock = threading.Lock()
+        self._changed = threading.Event()
+        self._inflight = None
+        self._thread = None
+        self.refreshes = 0
+        self.failures = 0
+        self.coalesced = 0
+        self.failures_in_row = 0
+        self._set(tokens or {})
+
+    def _set(self, tokens):
+        self._tokens = dict(tokens)
+        self._expires_at = expiry_timestamp(self._tokens.get('expires_at'))
+
+    def set_tokens(self, tokens):
+        """Replace the tokens, e.g. after a new authorization."""
+        with self._lock:
+            self._set(tokens)
+            self.failures_in_row = 0
+        self._changed.set()
+
+    @property
+    def needs_reauth(self):
+        """True once MAX_REFRESH_FAILURES refreshes in a row have failed."""
+        return self.failures_in_row >= MAX_REFRESH_FAILURES
+
+    def current(self):
+        """Return the access token held in memory, without refreshing it."""
+        with self._lock:
+            return self._tokens.get('access_token')
+
+    def _expiring(self):
+        return self._expires_at is not None and time.time() >= self._expires_at - self.margin
+
+    def access_token(self):
+        """Return a usable access token, refreshing first if it is about to expire.
+
+        Returns None if there is no token or it has expired and cannot be refreshed.
+        """
+        with self._lock:
+            token = self._tokens.get('access_token')
+            expiring = self._expiring()
+            can_refresh = bool(self._tokens.get('refresh_token'))
+        if token and expiring and can_refresh:
+            token = self.refresh(stale=token) or token
+        with self._lock:
+            if self._expires_at is not None and time.time() >= self._expires_at:
+                return None
+            return self._tokens.get('access_token')
+
+    def refresh(self, stale=None):
+        """Refresh the tokens once for all callers; returns the new access token or None.
+
+        With `stale`, the token a caller found expired or rejected, nothing is
+        requested if the tokens were already replaced since.
+        """
+        with self._lock:
+            if stale is not None and self._tokens.get('access_token') not in (None, stale):
+                return self._tokens['access_token']
+            inflight = self._inflight
+            if inflight is None:
+                self._inflight = threading.Event()
+                refresh_token = self._tokens.get('refresh_token')
+            else:
+                self.coalesced += 1
+        if inflight is not None:
+            # Another caller is already refreshing; use its result
+            inflight.wait()
+            with self._lock:
+                token = self._tokens.get('access_token')
+            return token if token != stale else None
+
+        tokens = None
+        try:
+            if refresh_token:
+                tokens = dict(self._refresh(refresh_token))
+                if 'expires_in' in tokens:
+                    tokens['expires_at'] = time.time() + tokens['expires_in']
+                tokens.setdefault('refresh_token', refresh_token)
+                if self._on_refresh:
+                    self._on_refresh(dict(tokens))
+        except Exception as e:
+            print(f"Token refresh failed: {e}")
+            tokens = None
+        with self._lock:
+            if tokens:
+                self._set(tokens)
+                self.refreshes += 1
+                self.failures_in_row = 0
+            else:
+                self.failures += 1
+                self.failures_in_row += 1
+            done, self._inflight = self._inflight, None
+            done.set()
+        if tokens:
+            # Wakes the background thread if it gave up
+            self._changed.set()
+        return tokens['access_token'] if tokens else None
+
+    def _refresh_ahead(self):
+        while True:
+            # Cleared before reading the expiry, so a set_tokens from here on still wakes the wait
+            self._changed.clear()
+            with self._lock:
+                due = None
+                if self._expires_at is not None and self._tokens.get('refresh_token'):
+                    due = self._expires_at - self.margin
+            if self.needs_reauth:
+                print(f"❌ Token refresh failed {self.failures_in_row} times in a row; "
+                      "re-authenticate with MyAnimeList")
+                self._changed.wait()
+            elif due is not None and time.time() >= due:
+                if self.refresh() is None:
+                    self._changed.wait(REFRESH_RETRY_SECONDS)
+            else:
+                self._changed.wait(None if due is None else due - time.time())
+
+    def start(self):
+        """Keep refreshing the token ahead of expiry on a daemon thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._refresh_ahead, daemon=True)
+            self._thread.start()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'refreshes': self.refreshes,
+                'failures': self.failures,
+                'coalesced': self.coalesced,
+                'needs_reauth': self.needs_reauth,
+                'expires_in_seconds': (round(self._expires_at - time.time())
+                                       if self._expires_at is not None else None)
+            }